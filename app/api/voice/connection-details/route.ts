@@ -4,6 +4,7 @@ import { AccessToken, type AccessTokenOptions, type VideoGrant, RoomServiceClien
 import { verifySession } from '@/lib/auth/session';
 import { connectToDatabase } from '@/database/mongoose';
 import Student from '@/database/models/Student';
+import { createAgentRoom, getRoomPool } from '@/lib/voice/roomPool';
 
 // Fee structure (mirrored from lib/data/feeStructure.ts for agent context)
 const FEE_STRUCTURE = [
@@ -42,6 +43,13 @@ export async function POST(req: Request) {
       throw new Error('LIVEKIT_API_SECRET is not configured. Please add it to .env.local');
     }
 
+    // Voice language chosen in the UI ('auto' to detect it from the first utterance), else a
+    // Hindi/Kannada browser; otherwise the agent starts in English
+    // (an English browser says little about the language a student wants to speak)
+    const body = await req.json().catch(() => ({}));
+    const browserLanguage = req.headers.get('accept-language')?.split(',')[0]?.split(';')[0];
+    const language: string | undefined = body?.language || (browserLanguage && /^(hi|kn)\b/i.test(browserLanguage) ? browserLanguage : undefined);
+
     // Get authenticated student data
     let studentName = 'Student';
     let studentUsn = 'unknown';
@@ -74,8 +82,6 @@ export async function POST(req: Request) {
     const totalPending = pendingFees.reduce((sum, f) => sum + f.total, 0);
     const totalPaid = paidFeesData.reduce((sum, f) => sum + f.total, 0);
 
-    // Generate unique room and participant identifiers
-    const roomName = `billdesk_voice_${Date.now()}`;
     const participantIdentity = `student_${studentUsn}_${Math.floor(Math.random() * 10000)}`;
 
     // Room metadata with full student context for agent
@@ -89,6 +95,7 @@ export async function POST(req: Request) {
       paidFeesData: paidFeesData.map(f => ({ id: f.id, name: f.name, amount: f.total })),
       totalPending,
       totalPaid,
+      language,
     };
 
     // Create the room with agent dispatch using RoomServiceClient
@@ -98,25 +105,26 @@ export async function POST(req: Request) {
       API_SECRET
     );
 
-    // Create room with agent dispatch
+    // Prefer a warm room whose agent is already waiting; the agent picks up the student data from its metadata
+    let roomName: string | null = null;
     try {
-      await roomService.createRoom({
-        name: roomName,
-        emptyTimeout: 60 * 5, // 5 minutes
-        maxParticipants: 2,
-        metadata: JSON.stringify(roomMetadata),
-        // Request agent dispatch
-        agentConfig: {
-          agents: [
-            {
-              agentName: '', // Empty string to match any agent
-            }
-          ]
-        }
-      });
-      console.log('Room created with student data:', roomName, { studentName, studentUsn, pendingCount: pendingFees.length });
+      roomName = await getRoomPool(roomService)?.acquire(JSON.stringify(roomMetadata)) ?? null;
+      if (roomName) {
+        console.log('Warm room assigned with student data:', roomName, { studentName, studentUsn, pendingCount: pendingFees.length });
+      }
     } catch (e) {
-      console.log('Room may already exist or agent config not supported:', e);
+      console.log('Warm room pool unavailable:', e);
+    }
+
+    // Cold path: create a room with agent dispatch
+    if (!roomName) {
+      roomName = `billdesk_voice_${Date.now()}`;
+      try {
+        await createAgentRoom(roomService, roomName, JSON.stringify(roomMetadata));
+        console.log('Room created with student data:', roomName, { studentName, studentUsn, pendingCount: pendingFees.length });
+      } catch (e) {
+        console.log('Room may already exist or agent config not supported:', e);
+      }
     }
 
     // Create participant token
@@ -0,0 +1,30 @@
+import { NextResponse } from 'next/server';
+import { RoomServiceClient } from 'livekit-server-sdk';
+import { getRoomPool } from '@/lib/voice/roomPool';
+
+const API_KEY = process.env.LIVEKIT_API_KEY;
+const API_SECRET = process.env.LIVEKIT_API_SECRET;
+const LIVEKIT_URL = process.env.LIVEKIT_URL;
+
+// Disable caching
+export const revalidate = 0;
+
+// Warm room pool hit/miss metrics (also starts warming the pool)
+export async function GET() {
+  if (!LIVEKIT_URL || !API_KEY || !API_SECRET) {
+    return NextResponse.json({ error: 'LiveKit is not configured' }, { status: 500 });
+  }
+
+  const roomService = new RoomServiceClient(LIVEKIT_URL.replace('wss://', 'https://'), API_KEY, API_SECRET);
+  const pool = getRoomPool(roomService);
+  if (!pool) {
+    return NextResponse.json({ enabled: false });
+  }
+
+  pool.start();
+  return NextResponse.json({ enabled: true, ...pool.snapshot() }, {
+    headers: {
+      'Cache-Control': 'no-store',
+    },
+  });
+}
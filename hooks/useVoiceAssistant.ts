@@ -14,11 +14,13 @@ interface ConnectionDetails {
 interface UseVoiceAssistantOptions {
     studentName?: string;
     studentUsn?: string;
-    onAction?: (action: { type: string; payload: any }) => void;
+    // Voice language ('en', 'hi', 'kn', or 'auto' to detect it from the first utterance); English when omitted
+    language?: string;
+    onAction?: (action: { type: string; payload: any }) => void | Promise<void>;
 }
 
 export function useVoiceAssistant(options: UseVoiceAssistantOptions = {}) {
-    const { studentName = 'Student', studentUsn = 'unknown', onAction } = options;
+    const { studentName = 'Student', studentUsn = 'unknown', language, onAction } = options;
 
     const [room] = useState(() => new Room());
     const [isConnected, setIsConnected] = useState(false);
@@ -28,12 +30,15 @@ export function useVoiceAssistant(options: UseVoiceAssistantOptions = {}) {
     const [userSpeaking, setUserSpeaking] = useState(false);
     const [transcript, setTranscript] = useState<string[]>([]);
 
+    // Agent actions applied or being applied, by idempotency key (retries are acked, not re-applied)
+    const appliedActions = useRef<Map<string, Promise<void>>>(new Map());
+
     // Fetch connection details from API
     const fetchConnectionDetails = useCallback(async (): Promise<ConnectionDetails> => {
         const response = await fetch('/api/voice/connection-details', {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ studentName, studentUsn }),
+            body: JSON.stringify({ studentName, studentUsn, language }),
         });
 
         if (!response.ok) {
@@ -42,7 +47,7 @@ export function useVoiceAssistant(options: UseVoiceAssistantOptions = {}) {
         }
 
         return response.json();
-    }, [studentName, studentUsn]);
+    }, [studentName, studentUsn, language]);
 
     // Connect to voice session
     const connect = useCallback(async () => {
@@ -108,6 +113,59 @@ export function useVoiceAssistant(options: UseVoiceAssistantOptions = {}) {
             setUserSpeaking(false);
         };
 
+        // Tell the agent whether an action took effect (sequenced actions only)
+        const ackAction = async (message: any, ok: boolean, error?: string) => {
+            if (message.seq === undefined || !message.key) return;
+            const ack = { type: 'VOICE_ACTION_ACK', seq: message.seq, key: message.key, ok, error };
+            const encoder = new TextEncoder();
+            await room.localParticipant.publishData(encoder.encode(JSON.stringify(ack)), { reliable: true });
+        };
+
+        const applyAction = async (message: any) => {
+            const action = {
+                type: message.action,
+                payload: message.payload || {},
+            };
+
+            // A retry (possibly of an action still being applied) gets the first attempt's outcome
+            const existing = message.key ? appliedActions.current.get(message.key) : undefined;
+            if (existing) {
+                try {
+                    await existing;
+                    await ackAction(message, true);
+                } catch (err) {
+                    await ackAction(message, false, err instanceof Error ? err.message : String(err));
+                }
+                return;
+            }
+
+            const apply = (async () => {
+                console.log('🎯 [VOICE] Dispatching action to window:', action);
+
+                // Dispatch as window custom event (for any listening component)
+                window.dispatchEvent(new CustomEvent('voiceAction', { detail: action }));
+                console.log('✅ [VOICE] Window event dispatched!');
+
+                // Also call onAction callback if provided
+                if (onAction) {
+                    await onAction(action);
+                    console.log('✅ [VOICE] onAction callback called!');
+                }
+            })();
+            // Recorded before onAction resolves, so a retry during a slow apply doesn't apply it twice
+            if (message.key) appliedActions.current.set(message.key, apply);
+
+            try {
+                await apply;
+                await ackAction(message, true);
+            } catch (err) {
+                console.error('Voice action failed:', err);
+                // Forget failed attempts so the agent's retry applies the action again
+                if (message.key) appliedActions.current.delete(message.key);
+                await ackAction(message, false, err instanceof Error ? err.message : String(err));
+            }
+        };
+
         const handleDataReceived = (
             payload: Uint8Array,
             participant?: RemoteParticipant
@@ -118,24 +176,9 @@ export function useVoiceAssistant(options: UseVoiceAssistantOptions = {}) {
 
                 console.log('📩 [VOICE] Received message from agent:', message);
 
-                // Handle voice action from agent
+                // Handle voice action from agent (applied and acked asynchronously)
                 if (message.type === 'VOICE_ACTION') {
-                    const action = {
-                        type: message.action,
-                        payload: message.payload || {},
-                    };
-
-                    console.log('🎯 [VOICE] Dispatching action to window:', action);
-
-                    // Dispatch as window custom event (for any listening component)
-                    window.dispatchEvent(new CustomEvent('voiceAction', { detail: action }));
-                    console.log('✅ [VOICE] Window event dispatched!');
-
-                    // Also call onAction callback if provided
-                    if (onAction) {
-                        onAction(action);
-                        console.log('✅ [VOICE] onAction callback called!');
-                    }
+                    applyAction(message).catch((err) => console.error('Error acking voice action:', err));
                 }
 
                 // Handle transcript updates
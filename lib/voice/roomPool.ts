@@ -0,0 +1,212 @@
+import { RoomServiceClient, ParticipantInfo_Kind } from 'livekit-server-sdk';
+
+// Placeholder metadata of a pooled room; the agent waits for the student's data to replace it
+export const WARM_ROOM_METADATA = JSON.stringify({ warm: true });
+
+// Warm rooms kept ready (0 disables the pool)
+const POOL_SIZE = Number(process.env.VOICE_POOL_SIZE ?? 2);
+// Idle warm rooms are recycled so their agents don't sit on a stale worker forever
+const MAX_IDLE_MS = Number(process.env.VOICE_POOL_MAX_IDLE_SECONDS ?? 600) * 1000;
+// How long a new room may take to get its agent before it is given up
+const AGENT_JOIN_TIMEOUT_MS = 20_000;
+const AGENT_POLL_MS = 500;
+const SWEEP_INTERVAL_MS = 15_000;
+// A waiting agent refreshes its warmHeartbeat attribute every 10s (voice-agent/agent.py)
+const HEARTBEAT_TIMEOUT_MS = 30_000;
+
+type WarmRoom = {
+  name: string;
+  readyAt: number;
+};
+
+export type RoomPoolStats = {
+  size: number;
+  ready: number;
+  warming: number;
+  hits: number;
+  misses: number;
+  hitRate: number;
+  created: number;
+  failed: number;
+  expired: number;
+};
+
+/**
+ * Create a room and dispatch an agent to it.
+ */
+export async function createAgentRoom(roomService: RoomServiceClient, roomName: string, metadata: string) {
+  await roomService.createRoom({
+    name: roomName,
+    emptyTimeout: 60 * 5, // 5 minutes
+    maxParticipants: 2,
+    metadata,
+    // Request agent dispatch
+    agentConfig: {
+      agents: [
+        {
+          agentName: '', // Empty string to match any agent
+        }
+      ]
+    }
+  });
+}
+
+/**
+ * Pool of pre-created rooms whose agents have already joined and are idle.
+ *
+ * A student is handed a ready room and their data is pushed into its metadata,
+ * which the waiting agent builds its session from; the pool refills in the background.
+ * Agents are checked by the background sweep (their heartbeat attribute), never on the
+ * acquire path; an agent that shuts down while waiting deletes its room.
+ */
+class RoomPool {
+  private ready: WarmRoom[] = [];
+  private warming = 0;
+  private stats = { hits: 0, misses: 0, created: 0, failed: 0, expired: 0 };
+  private sweeper: ReturnType<typeof setInterval> | null = null;
+
+  constructor(private roomService: RoomServiceClient, readonly size: number) {}
+
+  /**
+   * Hand out a warm room with `metadata` applied, or null if none is ready.
+   */
+  async acquire(metadata: string): Promise<string | null> {
+    this.start();
+    try {
+      while (this.ready.length > 0) {
+        const room = this.ready.shift()!;
+        if (Date.now() - room.readyAt > MAX_IDLE_MS) {
+          this.retire(room);
+          continue;
+        }
+        try {
+          await this.roomService.updateRoomMetadata(room.name, metadata);
+        } catch {
+          // Deleted by its agent on shutdown (worker restart) since the last sweep
+          this.retire(room);
+          continue;
+        }
+        this.stats.hits++;
+        return room.name;
+      }
+      this.stats.misses++;
+      return null;
+    } finally {
+      this.refill();
+      console.log('🔥 Voice room pool:', this.snapshot());
+    }
+  }
+
+  snapshot(): RoomPoolStats {
+    const served = this.stats.hits + this.stats.misses;
+    return {
+      size: this.size,
+      ready: this.ready.length,
+      warming: this.warming,
+      ...this.stats,
+      hitRate: served ? this.stats.hits / served : 0,
+    };
+  }
+
+  /**
+   * Start refilling and periodically recycling idle rooms.
+   */
+  start() {
+    if (this.sweeper) return;
+    this.sweeper = setInterval(() => {
+      this.sweep().catch((e) => console.log('Voice room pool sweep failed:', e));
+    }, SWEEP_INTERVAL_MS);
+    // Don't keep the server process alive just for the pool
+    this.sweeper.unref?.();
+    this.refill();
+  }
+
+  private refill() {
+    const missing = this.size - this.ready.length - this.warming;
+    for (let i = 0; i < missing; i++) {
+      this.warming++;
+      this.warmOne()
+        .catch((e) => {
+          this.stats.failed++;
+          console.log('Could not warm voice room:', e);
+        })
+        .finally(() => {
+          this.warming--;
+        });
+    }
+  }
+
+  private async sweep() {
+    const now = Date.now();
+    const expired = this.ready.filter((room) => now - room.readyAt > MAX_IDLE_MS);
+    this.ready = this.ready.filter((room) => now - room.readyAt <= MAX_IDLE_MS);
+    expired.forEach((room) => this.retire(room));
+    // Drop rooms whose agent stopped heartbeating (crashed without deleting its room)
+    const alive = await Promise.all(this.ready.map((room) => this.agentHeartbeat(room.name)));
+    const stale = this.ready.filter((_, i) => alive[i] === null || now - alive[i]! > HEARTBEAT_TIMEOUT_MS);
+    this.ready = this.ready.filter((room) => !stale.includes(room));
+    stale.forEach((room) => this.retire(room));
+    this.refill();
+  }
+
+  private retire(room: WarmRoom) {
+    this.stats.expired++;
+    this.roomService.deleteRoom(room.name).catch(() => {});
+  }
+
+  private async warmOne() {
+    const name = `billdesk_voice_warm_${Date.now()}_${Math.floor(Math.random() * 10000)}`;
+    await createAgentRoom(this.roomService, name, WARM_ROOM_METADATA);
+    this.stats.created++;
+
+    const deadline = Date.now() + AGENT_JOIN_TIMEOUT_MS;
+    while (Date.now() < deadline) {
+      if ((await this.agentHeartbeat(name)) !== null) {
+        this.ready.push({ name, readyAt: Date.now() });
+        return;
+      }
+      await new Promise((resolve) => setTimeout(resolve, AGENT_POLL_MS));
+    }
+    this.roomService.deleteRoom(name).catch(() => {});
+    throw new Error(`No agent joined ${name} within ${AGENT_JOIN_TIMEOUT_MS / 1000}s`);
+  }
+
+  /**
+   * Time (ms) of the waiting agent's last heartbeat, or null if it has none (not ready, or gone).
+   */
+  private async agentHeartbeat(roomName: string): Promise<number | null> {
+    try {
+      const participants = await this.roomService.listParticipants(roomName);
+      const agent = participants.find((p) => p.kind === ParticipantInfo_Kind.AGENT);
+      const heartbeat = Number(agent?.attributes?.warmHeartbeat);
+      return heartbeat ? heartbeat * 1000 : null;
+    } catch {
+      return null;
+    }
+  }
+}
+
+// Cached across hot reloads in development, like the database connection
+const globalForPool = globalThis as typeof globalThis & { voiceRoomPool?: RoomPool };
+
+/**
+ * The server's warm room pool, or null when VOICE_POOL_SIZE is 0.
+ */
+export function getRoomPool(roomService: RoomServiceClient): RoomPool | null {
+  if (POOL_SIZE <= 0) return null;
+  if (!globalForPool.voiceRoomPool) {
+    globalForPool.voiceRoomPool = new RoomPool(roomService, POOL_SIZE);
+  }
+  return globalForPool.voiceRoomPool;
+}
+
+/**
+ * Start warming the pool when the server boots (instrumentation.ts), so the first
+ * student is served from it too.
+ */
+export function startRoomPool() {
+  const { LIVEKIT_URL, LIVEKIT_API_KEY, LIVEKIT_API_SECRET } = process.env;
+  if (!LIVEKIT_URL || !LIVEKIT_API_KEY || !LIVEKIT_API_SECRET) return;
+  const roomService = new RoomServiceClient(LIVEKIT_URL.replace('wss://', 'https://'), LIVEKIT_API_KEY, LIVEKIT_API_SECRET);
+  getRoomPool(roomService)?.start();
+}
@@ -10,6 +10,10 @@ const nextConfig = {
   typescript: {
     ignoreBuildErrors: false,
   },
+  experimental: {
+    // instrumentation.ts starts the voice room pool at server boot
+    instrumentationHook: true,
+  },
 }
 
 module.exports = nextConfig
@@ -0,0 +1,178 @@
+"""
+BEC BillDesk Voice Agent - Acknowledged UI Actions
+
+Actions (SELECT_FEE, INITIATE_PAYMENT, ...) go to the frontend over the
+data channel without blocking speech. Each carries a sequence number and
+an idempotency key, and hooks/useVoiceAssistant.ts acks it once the UI
+has applied it, so many actions can be outstanding at once:
+
+- an action that is rejected or not acked within ACK_TIMEOUT is resent
+  with the same key (the UI applies each key at most once)
+- a retry is dropped if a newer action for the same target (e.g. the
+  same fee) has been sent since
+- after MAX_ATTEMPTS the action is reported to `on_failure`, so the
+  caller can reconcile its own state
+
+Round-trip latency (publish → ack) is tracked per action.
+"""
+
+import asyncio
+import json
+import logging
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+from livekit import rtc
+
+logger = logging.getLogger("billdesk-agent")
+
+ACK_TYPE = "VOICE_ACTION_ACK"
+ACK_TIMEOUT = 2.0
+MAX_ATTEMPTS = 3
+
+
+@dataclass
+class PendingAction:
+    seq: int
+    key: str
+    action: str
+    payload: dict
+    target: str
+    done: asyncio.Future
+    attempts: int = 0
+    last_sent: float = 0.0
+
+
+@dataclass
+class ActionStats:
+    sent: int = 0
+    acked: int = 0
+    retried: int = 0
+    superseded: int = 0
+    failed: int = 0
+    rtt_ms: list[float] = field(default_factory=list)
+
+    def summary(self) -> dict:
+        rtt = sorted(self.rtt_ms)
+        return {
+            "sent": self.sent,
+            "acked": self.acked,
+            "retried": self.retried,
+            "superseded": self.superseded,
+            "failed": self.failed,
+            "rtt_p50_ms": rtt[len(rtt) // 2] if rtt else 0.0,
+            "rtt_p99_ms": rtt[int(len(rtt) * 0.99)] if rtt else 0.0,
+        }
+
+
+def _target(action: str, payload: dict) -> str:
+    """What an action changes; newer actions on the same target supersede older ones"""
+    if "feeId" in payload:
+        return f"fee:{payload['feeId']}"
+    return action
+
+
+class ActionChannel:
+    """Sequenced, acknowledged VOICE_ACTION messages to the frontend"""
+
+    def __init__(self, room: rtc.Room, on_failure: Optional[Callable[[PendingAction, str], None]] = None):
+        self.room = room
+        self.on_failure = on_failure
+        self.pending: dict[int, PendingAction] = {}
+        self.stats = ActionStats()
+        self._seq = 0
+        self._latest: dict[str, int] = {}
+        self._watcher: Optional[asyncio.Task] = None
+        room.on("data_received", self._on_data)
+
+    def send(self, action: str, payload: Optional[dict] = None) -> PendingAction:
+        """Publish an action in the background; await `.done` for the outcome"""
+        self._seq += 1
+        payload = payload or {}
+        pending = PendingAction(
+            self._seq, uuid.uuid4().hex, action, payload, _target(action, payload),
+            asyncio.get_running_loop().create_future(),
+        )
+        self.pending[pending.seq] = pending
+        self._latest[pending.target] = pending.seq
+        self.stats.sent += 1
+        self._publish(pending)
+        if self._watcher is None or self._watcher.done():
+            self._watcher = asyncio.create_task(self._watch_timeouts())
+        return pending
+
+    async def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait up to `timeout` for every outstanding action; False if any failed or is still pending"""
+        waiting = [p.done for p in self.pending.values()]
+        if not waiting:
+            return True
+        # asyncio.wait leaves the futures alone on timeout; retries carry on in the background
+        done, still_pending = await asyncio.wait(waiting, timeout=timeout)
+        return not still_pending and all(f.result() for f in done)
+
+    def _publish(self, pending: PendingAction):
+        pending.attempts += 1
+        pending.last_sent = time.monotonic()
+        message = {
+            "type": "VOICE_ACTION",
+            "action": pending.action,
+            "payload": pending.payload,
+            "seq": pending.seq,
+            "key": pending.key,
+        }
+        data = json.dumps(message).encode('utf-8')
+        task = asyncio.create_task(self.room.local_participant.publish_data(data, reliable=True))
+
+        def _published(t: asyncio.Task):
+            if not t.cancelled() and t.exception() is not None:
+                self._attempt_failed(pending, f"publish failed: {t.exception()}")
+
+        task.add_done_callback(_published)
+
+    def _on_data(self, packet: rtc.DataPacket):
+        try:
+            message = json.loads(packet.data)
+        except ValueError:
+            return
+        if not isinstance(message, dict) or message.get("type") != ACK_TYPE:
+            return
+        pending = self.pending.get(message.get("seq"))
+        if pending is None or pending.key != message.get("key"):
+            return  # Ack for a retry that was already settled
+        if message.get("ok", True):
+            del self.pending[pending.seq]
+            self.stats.acked += 1
+            self.stats.rtt_ms.append((time.monotonic() - pending.last_sent) * 1000)
+            pending.done.set_result(True)
+        else:
+            self._attempt_failed(pending, message.get("error") or "rejected by UI")
+
+    def _attempt_failed(self, pending: PendingAction, error: str):
+        if pending.seq not in self.pending:
+            return
+        if self._latest.get(pending.target) != pending.seq:
+            # A newer action decides this target's state; don't replay the old one
+            del self.pending[pending.seq]
+            self.stats.superseded += 1
+            pending.done.set_result(True)
+        elif pending.attempts < MAX_ATTEMPTS:
+            logger.info("🔁 Retrying %s #%d (%s)", pending.action, pending.seq, error)
+            self.stats.retried += 1
+            self._publish(pending)
+        else:
+            del self.pending[pending.seq]
+            self.stats.failed += 1
+            logger.warning("⚠️ Action %s #%d failed after %d attempts: %s", pending.action, pending.seq, pending.attempts, error)
+            pending.done.set_result(False)
+            if self.on_failure:
+                self.on_failure(pending, error)
+
+    async def _watch_timeouts(self):
+        while self.pending:
+            await asyncio.sleep(ACK_TIMEOUT / 4)
+            now = time.monotonic()
+            for pending in list(self.pending.values()):
+                if now - pending.last_sent > ACK_TIMEOUT:
+                    self._attempt_failed(pending, "ack timeout")
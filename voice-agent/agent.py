@@ -5,45 +5,112 @@ AI-powered voice assistant that serves as a friendly guide for the
 BEC BillDesk college fee payment portal. Provides helpful information
 about fees, the platform, and even some witty college humor!
 
-Uses: LiveKit, Deepgram STT, Cerebras LLM, Cartesia TTS
+Uses: LiveKit, Deepgram STT (local Whisper fallback), Cerebras LLM, Cartesia TTS
+Speaks English, Hindi and Kannada (languages.py)
 
 Run with: python agent.py dev
+Profile cold start with: python agent.py dev --profile-startup
+
+Rooms from the web app's warm pool (lib/voice/roomPool.ts) are dispatched
+before any student is assigned: the job connects and waits, heartbeating
+in its participant attributes, and everything that depends on the
+student (STT vocabulary, experiment arm, language, prompt, session) is
+built once the student's data arrives as room metadata. No provider
+connection is held open while the room is idle.
+
+Provider plugins (and Silero, via audio_pool) are imported by
+load_plugins() rather than at module import: job processes re-import
+this module, and the plugins are the bulk of its import time. The
+worker imports them once before starting (so they register on the main
+thread and are preloaded into job processes) and prewarm imports them
+in each job process before any job is assigned.
 """
 
+import startup_profile
+startup_profile.mark("interpreter start")
+
 import asyncio
+import contextlib
 import json
 import os
-import logging
-from dotenv import load_dotenv
+import pathlib
+import threading
+import time
+from typing import Optional
 
 from livekit import agents, rtc
-from livekit.agents import AgentSession, Agent, RoomInputOptions
-from livekit.plugins import (
-    cartesia,
-    deepgram,
-    silero,
-    openai,
-)
-
-# Load environment variables from parent directory
-import pathlib
-script_dir = pathlib.Path(__file__).parent.absolute()
-env_path = script_dir.parent / ".env.local"
-load_dotenv(str(env_path))
+from livekit.agents import AgentSession, Agent, ChatContext, RoomInputOptions, ModelSettings, StopResponse
+from livekit.agents import stt as agents_stt
+
+from agent_logging import bind_session, setup_logging
+from bargein import BargeInAccounting
+from experiments import CONTROL, Arm, ExperimentSession, load_experiment, save_result
+from functions import BillDeskFunctions, build_tools, fixed_replies
+from intent_router import IntentRouter
+import languages
+from languages import DEFAULT_LANGUAGE, DETECT, DETECT_STT_MODEL, LANGUAGES, LanguageSelector, MultilingualSTT
+import local_stt
+from memory_accounting import SessionMemory, accountant, deep_size, start_tracing, worker_load
+from payment_history import get_payment_index
+from quality_tiers import QualityController
+from quota import Priority, estimate_tokens, get_scheduler
+from recorder import SessionRecorder, recording_dir
+from response_budget import ResponseBudget
+from startup import StartupGraph, prefetch
+from tts_cache import TTSCache
+from vocabulary import build_keywords
+
+# Enable structured logging (written from a background thread)
+logger = setup_logging()
+
+startup_profile.mark("module imports")
+
+
+def load_config():
+    """Load environment variables from the parent directory and verify API keys
+
+    Runs once in the worker; job processes inherit its environment.
+    """
+    from dotenv import load_dotenv
+    
+    env_path = pathlib.Path(__file__).parent.absolute().parent / ".env.local"
+    load_dotenv(str(env_path))
+    
+    logger.info("LIVEKIT_URL: %s", os.getenv('LIVEKIT_URL', 'NOT SET'))
+    for key in ("DEEPGRAM_API_KEY", "CEREBRAS_API_KEY", "CARTESIA_API_KEY"):
+        logger.info("%s: %s", key, 'SET' if os.getenv(key) else 'NOT SET')
+
+
+def load_plugins():
+    """Import the provider plugins; must run on the main thread, where plugins register"""
+    import audio_pool  # noqa: F401 (Silero)
+    from livekit.plugins import cartesia, deepgram, openai  # noqa: F401
+
+
+# Completion budget assumed for quota purposes when no quality tier sets one
+DEFAULT_MAX_TOKENS = 300
 
-# Enable logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger("billdesk-agent")
+# Chat items kept when a session over its memory budget trims its context
+TRIMMED_CONTEXT_ITEMS = 12
 
-# Verify API keys
-logger.info(f"LIVEKIT_URL: {os.getenv('LIVEKIT_URL', 'NOT SET')}")
-logger.info(f"DEEPGRAM_API_KEY: {'SET' if os.getenv('DEEPGRAM_API_KEY') else 'NOT SET'}")
-logger.info(f"CEREBRAS_API_KEY: {'SET' if os.getenv('CEREBRAS_API_KEY') else 'NOT SET'}")
-logger.info(f"CARTESIA_API_KEY: {'SET' if os.getenv('CARTESIA_API_KEY') else 'NOT SET'}")
+# A warm room's agent refreshes its heartbeat attribute this often while waiting for a student
+WARM_HEARTBEAT_SECONDS = 10
 
 
-def get_system_instructions(student_data: dict) -> str:
-    """Generate system instructions for the friendly guide persona"""
+def cached_phrases(language: str = DEFAULT_LANGUAGE) -> list[str]:
+    """Replies spoken verbatim in a language, kept in the TTS cache"""
+    # The continue offer is spoken as part of an LLM reply, so it goes through Cartesia with it
+    return fixed_replies(language)
+
+
+def tts_settings(language: str, arm: Arm) -> tuple[str, str]:
+    """Cartesia (model, voice) for a session language in an experiment arm"""
+    config = LANGUAGES[language]
+    return config.tts_model or arm.tts_model, config.tts_voice or arm.tts_voice
+
+
+def get_system_instructions(student_data: dict, language: Optional[str] = DEFAULT_LANGUAGE) -> str:
+    """Generate system instructions for the friendly guide persona (language None: not yet detected)"""
     
     student_name = student_data.get('studentName', 'Student')
     pending_fees = student_data.get('pendingFees', [])
@@ -135,93 +202,618 @@ GUIDELINES:
 - Be helpful but don't be pushy
 - Add humor occasionally, not in every response
 - If asked about something you don't know, admit it honestly
+
+{languages.prompt_instructions(language)}
 """
 
 
 class BillDeskGuide(Agent):
     """ARIA - The friendly BEC BillDesk guide"""
     
-    def __init__(self, student_data: dict):
-        instructions = get_system_instructions(student_data)
-        super().__init__(instructions=instructions)
+    def __init__(self, student_data: dict, room: rtc.Room, tts_caches: Optional[dict[str, TTSCache]] = None, language: Optional[str] = None):
+        instructions = get_system_instructions(student_data, language)
+        self.functions = BillDeskFunctions(
+            room, usn=student_data.get('studentUsn'), payments=get_payment_index(), language=language or DEFAULT_LANGUAGE,
+        )
+        super().__init__(instructions=instructions, tools=build_tools(self.functions))
         self.student_data = student_data
-
-
-async def entrypoint(ctx: agents.JobContext):
-    """Main entry point for the voice agent"""
+        # Session language (None until the first utterance is heard) and the phrase cache of each
+        self.language = LanguageSelector(current=language)
+        self.tts_caches = tts_caches or {}
+        self.tts_cache = self.tts_caches.get(language or DEFAULT_LANGUAGE)
+        self._warmed_caches: set[str] = set()
+        self._heard_language: Optional[str] = None
+        self.router = IntentRouter()
+        # Per-turn max_tokens and spoken length, by intent
+        self.budget = ResponseBudget(router=self.router, language=language or DEFAULT_LANGUAGE)
+        self.barge_in = BargeInAccounting()
+        self.recorder: SessionRecorder = None
+        self.quality: QualityController = None
+        self.experiment: ExperimentSession = None
+        # Provider calls queue on the worker's shared quota; the greeting yields to live turns
+        self.quota = get_scheduler()
+        self.priority = Priority.GREETING
     
-    logger.info("🚀 ARIA Guide starting up!")
+    async def set_language(self, language: str):
+        """Move the running session's STT, TTS, replies and prompt to another language"""
+        config = LANGUAGES[language]
+        self.functions.language = language
+        self.budget.language = language
+        if isinstance(self.session.stt, MultilingualSTT):
+            self.session.stt.select(language)
+        model, voice = tts_settings(language, self.experiment.arm)
+        self.session.tts.update_options(voice=voice, language=config.tts_language)
+        self.quality.use_tts_model(model, degradable=config.degrade_tts)
+        self.tts_cache = self.tts_caches.get(language)
+        await self.update_instructions(get_system_instructions(self.student_data, language))
+        self.warm_tts_cache()
+        logger.info("🌐 Session language: %s", config.name)
     
-    # Connect to room
-    await ctx.connect()
-    logger.info(f"✅ Connected to room: {ctx.room.name}")
+    def warm_tts_cache(self):
+        """Fill any missing fixed-reply audio of the current language in the background"""
+        language = self.language.current or DEFAULT_LANGUAGE
+        if self.tts_cache is None or language in self._warmed_caches:
+            return
+        self._warmed_caches.add(language)
+        asyncio.create_task(self._warm_tts_cache(self.tts_cache, language))
     
-    # Parse student data from room metadata
-    student_data = {}
-    try:
-        if ctx.room.metadata:
-            student_data = json.loads(ctx.room.metadata)
-            logger.info(f"📋 Student connected: {student_data.get('studentUsn', 'Unknown')}")
-    except Exception as e:
-        logger.warning(f"Could not parse room metadata: {e}")
+    async def _warm_tts_cache(self, cache: TTSCache, language: str):
+        # A TTS of the cache's own voice and model: the session's follows the quality tier and arm
+        from livekit.plugins import cartesia
+        
+        tts = cartesia.TTS(model=cache.model, voice=cache.voice, language=LANGUAGES[language].tts_language)
+        try:
+            await cache.warm(tts, cached_phrases(language), quota=self.quota)
+        finally:
+            await tts.aclose()
+    
+    async def on_user_turn_completed(self, turn_ctx, new_message):
+        """Run clear-cut commands locally instead of asking the LLM, and budget the rest"""
+        language = self.language.observe(new_message.text_content or "", self._heard_language)
+        if language is not None:
+            await self.set_language(language)
+            # The instructions update applies from the next turn; this reply is already in the new language
+            turn_ctx.add_message(role="system", content=languages.prompt_instructions(language))
+        budget = self.budget.begin_turn(new_message.text_content or "", turn_ctx)
+        logger.debug("Response budget: %s", budget)
+        match = self.router.route(new_message.text_content or "")
+        if match is None:
+            return
+        logger.info("🧭 Routed locally: %s %s (%.2f)", match.name, match.arguments, match.confidence)
+        reply = await self.functions.call(match.name, match.arguments)
+        self.session.say(reply)
+        raise StopResponse()
+    
+    def _current_speech_id(self):
+        speech = getattr(self.session, "current_speech", None)
+        return speech.id if speech else None
+    
+    async def stt_node(self, audio, model_settings: ModelSettings):
+        """Session STT (Deepgram, Cartesia or local), with input audio captured when recording"""
+        if self.recorder:
+            audio = self.recorder.tee_audio(audio)
+        # Charged to the provider about to hear the audio (Cartesia for Kannada); local STT has no quota
+        provider = self.session.stt.provider.lower()
+        if provider in self.quota.store.limits:
+            await self.quota.acquire(provider, priority=Priority.TURN)
+        async for event in Agent.default.stt_node(self, audio, model_settings):
+            if self.language.detecting and getattr(event, "type", None) == agents_stt.SpeechEventType.FINAL_TRANSCRIPT:
+                # The language the multilingual model heard, for detection
+                self._heard_language = event.alternatives[0].language if event.alternatives else None
+            yield event
+    
+    def _max_tokens(self) -> int:
+        # The turn's budget, capped by the quality tier
+        ceiling = self.quality.tier.llm_max_tokens if self.quality else DEFAULT_MAX_TOKENS
+        return self.budget.max_tokens(ceiling)
     
+    async def _llm_stream(self, chat_ctx, tools, model_settings: ModelSettings):
+        # Same as the default llm_node, with the turn's token limit applied
+        async with self.session.llm.chat(
+            chat_ctx=chat_ctx,
+            tools=tools,
+            tool_choice=model_settings.tool_choice,
+            conn_options=self.session.conn_options.llm_conn_options,
+            extra_kwargs={"max_completion_tokens": self._max_tokens()},
+        ) as stream:
+            async for chunk in stream:
+                yield chunk
+    
+    async def _metered_llm(self, chat_ctx, stream):
+        # Queue on the Cerebras quota, then settle the estimate against the real usage
+        estimate = chat_tokens(chat_ctx) + self._max_tokens()
+        await self.quota.acquire("cerebras", estimate, self.priority)
+        used = None
+        async with contextlib.aclosing(stream):
+            async for chunk in stream:
+                if getattr(chunk, "usage", None):
+                    used = chunk.usage.total_tokens
+                yield chunk
+        if used is not None:
+            self.quota.charge("cerebras", used - estimate)
+    
+    async def llm_node(self, chat_ctx, tools, model_settings: ModelSettings):
+        """Cerebras stream within the turn's budget, closed immediately if the student barges in"""
+        stream = self._metered_llm(chat_ctx, self._llm_stream(chat_ctx, tools, model_settings))
+        stream = self.budget.limit(self._current_speech_id(), stream)
+        if self.recorder:
+            stream = self.recorder.tee_llm(chat_ctx, stream)
+        async for chunk in self.barge_in.track_llm(self._current_speech_id(), stream):
+            yield chunk
+    
+    async def _synthesize(self, text, model_settings: ModelSettings):
+        # Cartesia is metered in characters, charged once the utterance is done
+        characters = 0
+        
+        async def counted():
+            nonlocal characters
+            async for chunk in text:
+                characters += len(chunk)
+                yield chunk
+        
+        await self.quota.acquire("cartesia", priority=self.priority)
+        frames = Agent.default.tts_node(self, counted(), model_settings)
+        try:
+            async with contextlib.aclosing(frames):
+                async for frame in frames:
+                    yield frame
+        finally:
+            self.quota.charge("cartesia", characters)
+    
+    async def tts_node(self, text, model_settings: ModelSettings):
+        """Cartesia synthesis (or cached audio), closed immediately if the student barges in"""
+        if self.tts_cache:
+            frames = self.tts_cache.speak(text, lambda stream: self._synthesize(stream, model_settings))
+        else:
+            frames = self._synthesize(text, model_settings)
+        frames = self.budget.track_tts(self._current_speech_id(), frames)
+        async for frame in self.barge_in.track_tts(self._current_speech_id(), frames):
+            yield frame
+
+
+def chat_tokens(chat_ctx: ChatContext) -> int:
+    """Estimated prompt tokens of a chat context"""
+    return estimate_tokens("".join(
+        item.text_content or "" for item in chat_ctx.items if item.type == "message"
+    ))
+
+
+def get_greeting_instructions(student_data: dict, language: Optional[str] = DEFAULT_LANGUAGE) -> str:
+    """Instructions for the opening greeting (without using the name)"""
     pending_count = len(student_data.get('pendingFees', []))
     total_pending = student_data.get('totalPending', 0)
     
-    # Initialize the guide agent
-    agent = BillDeskGuide(student_data)
-    
-    # Set up LLM with Cerebras
-    llm_instance = openai.LLM(
-        base_url="https://api.cerebras.ai/v1",
-        api_key=os.getenv("CEREBRAS_API_KEY"),
-        model="llama3.1-8b"
-    )
-    
-    # Create agent session with Cartesia TTS (great voice quality!)
-    logger.info("📦 Creating ARIA session with Cartesia TTS...")
-    session = AgentSession(
-        stt=deepgram.STT(model="nova-2", language="en"),
-        llm=llm_instance,
-        tts=cartesia.TTS(
-            model="sonic-2",
-            voice="f786b574-daa5-4673-aa0c-cbe3e8534c02",  # Professional female voice
-        ),
-        vad=silero.VAD.load(),
-    )
-    
-    logger.info("▶️ Starting ARIA...")
-    
-    await session.start(
-        room=ctx.room,
-        agent=agent,
-        room_input_options=RoomInputOptions(
-            noise_cancellation=True,
-        ),
-    )
-    
-    logger.info("🎤 ARIA is live!")
-    
-    # Generate warm greeting (without using the name)
+    if language not in (None, DEFAULT_LANGUAGE):
+        # The examples below are English; the greeting itself is spoken in the session language
+        return f"Give the greeting in {LANGUAGES[language].name}.\n" + get_greeting_instructions(student_data)
     if pending_count > 0:
-        greeting = f"""Give a warm greeting WITHOUT using any names. Say something like:
+        return f"""Give a warm greeting WITHOUT using any names. Say something like:
         "Hey there! Welcome to BEC BillDesk! I'm ARIA, your friendly guide. 
         I can see you've got {pending_count} pending fees totaling around ₹{total_pending:,}. 
         How can I help you today? Need info about payments, or just want to chat about how this cool platform works?"""
-    else:
-        greeting = """Give a warm greeting WITHOUT using any names. Say:
+    return """Give a warm greeting WITHOUT using any names. Say:
         "Hey there! Welcome to BEC BillDesk! I'm ARIA, your friendly guide.
         Great news - looks like all your fees are paid! You're all set.
         Is there anything I can help you with? Maybe explain how this platform works, or just have a chat?"""
+
+
+def parse_student_data(metadata: str) -> dict:
+    """Parse student data from room metadata"""
+    student_data = {}
+    try:
+        if metadata:
+            student_data = json.loads(metadata)
+            if student_data.get('warm'):
+                return student_data
+            bind_session(usn=student_data.get('studentUsn'))
+            logger.info("📋 Student connected: %s", student_data.get('studentUsn', 'Unknown'))
+    except Exception as e:
+        logger.warning("Could not parse room metadata: %s", e)
+    return student_data
+
+
+def is_warm_room(metadata: str) -> bool:
+    """Whether a room was created by the warm pool and has no student yet"""
+    try:
+        return bool(metadata) and json.loads(metadata).get('warm') is True
+    except ValueError:
+        return False
+
+
+async def _greeting_text(llm_instance, chat_ctx: ChatContext):
+    # Queue on the Cerebras quota first: creating the stream already sends the request
+    quota = get_scheduler()
+    estimate = chat_tokens(chat_ctx) + DEFAULT_MAX_TOKENS
+    await quota.acquire("cerebras", estimate, Priority.GREETING)
+    used = None
+    async with llm_instance.chat(chat_ctx=chat_ctx) as stream:
+        async for chunk in stream:
+            if getattr(chunk, "usage", None):
+                used = chunk.usage.total_tokens
+            if chunk.delta and chunk.delta.content:
+                yield chunk.delta.content
+    if used is not None:
+        quota.charge("cerebras", used - estimate)
+
+
+def prewarm(proc: agents.JobProcess):
+    """Load per-process resources before any job is assigned"""
+    from audio_pool import execution_mode, load_vad
+    
+    start_tracing()
+    accountant.process_per_session = execution_mode() != "pooled"
+    load_plugins()
+    startup_profile.mark("plugin imports")
+    # One phrase cache per language (control voice), so switching language finds its audio in memory
+    tts_caches = {}
+    loaded = 0
+    for language in LANGUAGES:
+        model, voice = tts_settings(language, CONTROL)
+        tts_caches[language] = TTSCache(voice=voice, model=model)
+        loaded += tts_caches[language].load_disk(cached_phrases(language))
+    logger.info("🔊 TTS cache: %d phrases in %d languages loaded from disk", loaded, len(tts_caches))
+    proc.userdata["tts_caches"] = tts_caches
+    proc.userdata["vad"] = load_vad()
+    if local_stt.configured_engine() != "deepgram":
+        # Load the fallback model now so a failover never waits on it
+        try:
+            local_stt.get_decoder()
+        except Exception as e:
+            logger.warning("Could not load local STT model: %s", e)
+    startup_profile.mark("prewarm")
+    if startup_profile.enabled():
+        logger.info("%s", startup_profile.report("Job process ready"))
+
+
+async def entrypoint(ctx: agents.JobContext):
+    """Main entry point for the voice agent
+    
+    Startup runs as a dependency graph: plugin construction and the
+    greeting LLM call overlap the room connect, and the greeting is
+    spoken as soon as the session has started.
+    """
+    
+    logger.info("🚀 ARIA Guide starting up!")
+    bind_session(room=ctx.job.room.name)
+    experiment = load_experiment()
+    
+    async def connect():
+        await ctx.connect()
+        logger.info("✅ Connected to room: %s", ctx.room.name)
+    
+    async def wait_for_student(student_data: dict, *_connected) -> dict:
+        # A warm (pooled) room is assigned to a student later by a room metadata update
+        if not student_data.get('warm'):
+            return student_data
+        logger.info("🔥 Warm agent ready, waiting for a student")
+        assigned = asyncio.get_running_loop().create_future()
+        heartbeat = asyncio.create_task(warm_heartbeat())
+        
+        async def delete_unassigned_room():
+            # The pool must not hand out a room whose agent has gone
+            if not assigned.done():
+                await ctx.delete_room()
+        
+        ctx.add_shutdown_callback(delete_unassigned_room)
+        
+        def _on_metadata(_old, new):
+            data = parse_student_data(new)
+            if data and not data.get('warm') and not assigned.done():
+                assigned.set_result(data)
+        
+        ctx.room.on("room_metadata_changed", _on_metadata)
+        # The student may have been assigned before we connected
+        _on_metadata(None, ctx.room.metadata)
+        try:
+            return await assigned
+        finally:
+            ctx.room.off("room_metadata_changed", _on_metadata)
+            heartbeat.cancel()
+    
+    async def warm_heartbeat():
+        # Read by the pool's sweep (roomPool.ts) to recycle rooms whose agent went away
+        while True:
+            try:
+                await ctx.room.local_participant.set_attributes({"warmHeartbeat": str(int(time.time()))})
+            except Exception as e:
+                logger.warning("Could not update warm heartbeat: %s", e)
+            await asyncio.sleep(WARM_HEARTBEAT_SECONDS)
     
-    await session.generate_reply(instructions=greeting)
+    def assign_arm(student_data: dict) -> Arm:
+        arm = experiment.assign(ctx.job.room.name, forced=student_data.get('experimentArm'))
+        if experiment.name != "none":
+            logger.info("🧪 Experiment %s: arm %s", experiment.name, arm.name)
+        return arm
     
-    logger.info("✅ ARIA greeted the user!")
+    def create_tts_caches(arm: Arm) -> dict[str, TTSCache]:
+        # The prewarmed caches hold the control voice; other voices get their own
+        prewarmed = ctx.proc.userdata.get("tts_caches", {})
+        tts_caches = {}
+        for language in LANGUAGES:
+            model, voice = tts_settings(language, arm)
+            cached = prewarmed.get(language)
+            if cached is None or (cached.voice, cached.model) != (voice, model):
+                cached = TTSCache(voice=voice, model=model)
+                cached.load_disk(cached_phrases(language))
+            tts_caches[language] = cached
+        return tts_caches
+    
+    def pick_language(student_data: dict) -> Optional[str]:
+        language = languages.session_language(student_data)
+        logger.info("🌐 Session language: %s", LANGUAGES[language].name if language else "detect from first utterance")
+        return language
+    
+    def create_agent(student_data: dict, quality: QualityController, arm: Arm, tts_caches: dict, language: Optional[str]) -> BillDeskGuide:
+        agent = BillDeskGuide(student_data, ctx.room, tts_caches=tts_caches, language=language)
+        agent.quality = quality
+        agent.experiment = ExperimentSession(experiment, arm, ctx.job.room.name)
+        
+        # Opt-in session recording for offline replay (RECORD_SESSIONS_DIR)
+        record_dir = recording_dir()
+        if record_dir:
+            agent.recorder = SessionRecorder(record_dir / f"{ctx.job.room.name}.zip")
+            agent.recorder.record_metadata(ctx.job.room.name, json.dumps(student_data))
+        return agent
+    
+    def create_llm(arm: Arm):
+        # Set up LLM with Cerebras
+        from livekit.plugins import openai
+        
+        return openai.LLM(
+            base_url="https://api.cerebras.ai/v1",
+            api_key=os.getenv("CEREBRAS_API_KEY"),
+            model=arm.llm_model
+        )
+    
+    def deepgram_stt(model: str, language: str):
+        from livekit.plugins import deepgram
+        
+        return lambda keywords: deepgram.STT(model=model, language=language, **languages.deepgram_keywords(model, keywords))
+    
+    def cartesia_stt(model: str, language: str):
+        from livekit.plugins import cartesia
+        
+        return lambda _keywords: cartesia.STT(model=model, language=language)
+    
+    def create_stt(student_data: dict, vad, arm: Arm, language: Optional[str]):
+        # Boost domain words (fees, payment methods, department) for this student
+        keywords = build_keywords(student_data)
+        logger.info("🔤 STT vocabulary: %d boosted keywords", len(keywords))
+        english = create_english_stt(student_data, keywords, vad, arm)
+        
+        # One recognizer per language (created on first use), plus the multilingual one for detection
+        factories = {DETECT: deepgram_stt(DETECT_STT_MODEL, DETECT), DEFAULT_LANGUAGE: lambda _keywords: english}
+        for code, config in LANGUAGES.items():
+            if code != DEFAULT_LANGUAGE:
+                make = deepgram_stt if config.stt_provider == "deepgram" else cartesia_stt
+                factories[code] = make(config.stt_model, config.stt_language)
+        return MultilingualSTT(factories, language or DETECT, keywords)
+    
+    def create_english_stt(student_data: dict, keywords, vad, arm: Arm):
+        engine = local_stt.configured_engine(student_data)
+        if engine == "deepgram":
+            return deepgram_stt(arm.stt_model, "en")(keywords)
+        local = local_stt.WhisperSTT(language="en", keywords=keywords)
+        # Only a failed recent probe starts on local STT; the probe itself runs in the background
+        if engine == "local" or local_stt.deepgram_health() is False:
+            logger.info("🗣️ STT engine: local %s (requested %s)", local.model, engine)
+            return agents_stt.StreamAdapter(stt=local, vad=vad)
+        
+        # Deepgram first; the adapter moves to local STT when it errors and probes it for recovery
+        adapter = agents_stt.FallbackAdapter(
+            [deepgram_stt(arm.stt_model, "en")(keywords), local],
+            vad=vad,
+            attempt_timeout=5.0,
+        )
+        
+        @adapter.on("stt_availability_changed")
+        def _on_availability(ev):
+            logger.warning("🗣️ STT %s %s", ev.stt.label, "available again" if ev.available else "unavailable, failing over")
+        
+        return adapter
+    
+    async def prefetch_greeting(student_data: dict, llm_instance):
+        # Start the greeting LLM call before the session exists
+        language = languages.session_language(student_data)
+        chat_ctx = ChatContext.empty()
+        chat_ctx.add_message(role="system", content=get_system_instructions(student_data, language))
+        chat_ctx.add_message(role="system", content=get_greeting_instructions(student_data, language))
+        return await prefetch(_greeting_text(llm_instance, chat_ctx))
+    
+    def create_vad(arm: Arm):
+        from audio_pool import load_vad
+        
+        vad = ctx.proc.userdata.get("vad") or load_vad()
+        # Per-session detection options share the process's model
+        return vad.with_options(**arm.vad) if arm.vad else vad
+    
+    async def load_payments(student_data: dict):
+        # Read the student's payment history into the worker index before the first question
+        index = get_payment_index()
+        usn = student_data.get('studentUsn')
+        if index is None or not usn:
+            return
+        index.watch(usn)
+        
+        async def release_payments():
+            index.release(usn)
+        
+        ctx.add_shutdown_callback(release_payments)
+        try:
+            payments = await index.history(usn)
+            logger.info("💳 Payment history: %d records", len(payments))
+        except Exception as e:
+            logger.warning("Could not load payment history: %s", e)
+    
+    def create_tts(quality: QualityController, arm: Arm, language: Optional[str]):
+        # Sample rate is fixed per connection, so it follows the tier at startup
+        from livekit.plugins import cartesia
+        
+        config = LANGUAGES[language or DEFAULT_LANGUAGE]
+        model, voice = tts_settings(config.code, arm)
+        quality.tts_model = model
+        quality.degrade_tts = config.degrade_tts
+        return cartesia.TTS(model=model, voice=voice, language=config.tts_language, sample_rate=quality.tier.tts_sample_rate)
+    
+    def track_memory(agent, session) -> SessionMemory:
+        # Components in trim order (only the LLM context can be trimmed; recorded audio is spooled to disk)
+        memory = SessionMemory(ctx.job.room.name)
+        
+        async def trim_context():
+            chat_ctx = agent.chat_ctx.copy()
+            chat_ctx.truncate(max_items=TRIMMED_CONTEXT_ITEMS)
+            await agent.update_chat_ctx(chat_ctx)
+        
+        memory.track("chat_context", lambda: deep_size(agent.chat_ctx.items), trim=trim_context)
+        memory.track("session_history", lambda: deep_size(session.history.items))
+        memory.track("student_data", lambda: deep_size(agent.student_data))
+        if agent.recorder:
+            memory.track("recorder", lambda: deep_size(agent.recorder.events))
+        memory.track("ui_actions", lambda: deep_size(agent.functions.actions.pending))
+        memory.track("stats", lambda: deep_size([agent.barge_in.speeches, agent.router.stats, agent.quality.latency]))
+        memory.start()
+        return memory
+    
+    def create_session(agent, llm_instance, stt_instance, tts_instance, vad):
+        # Create agent session with Cartesia TTS (great voice quality!)
+        logger.info("📦 Creating ARIA session with Cartesia TTS...")
+        session = AgentSession(
+            stt=stt_instance,
+            llm=llm_instance,
+            tts=tts_instance,
+            vad=vad,
+            # Cut ARIA off as soon as the student talks over her
+            allow_interruptions=True,
+            min_interruption_duration=0.5,
+        )
+        agent.barge_in.attach(session)
+        agent.experiment.attach(session)
+        
+        # Degrade model/VAD/token settings under load instead of dropping calls
+        agent.quality.bind(tts_instance, vad)
+        agent.quality.attach(session)
+        
+        # A 429 on any session pauses that provider for the whole worker
+        agent.quota.watch("cerebras", llm_instance)
+        agent.quota.watch("deepgram", stt_instance)
+        agent.quota.watch("cartesia", tts_instance)
+        
+        # Tear the job down when the session ends (e.g. the student leaves) so its memory is freed
+        session.on("close", lambda _: ctx.shutdown(reason="session closed"))
+        memory = track_memory(agent, session)
+        
+        @session.on("metrics_collected")
+        def _log_metrics(ev):
+            # Fires several times per turn, so only every 20th is logged
+            logger.info("📈 Metrics %s: %s", type(ev.metrics).__name__, ev.metrics, extra={"sample_every": 20})
+        
+        async def log_barge_in_summary():
+            logger.info("📊 Barge-in summary: %s", agent.barge_in.summary())
+            logger.info("🧭 Intent router: %s", agent.router.stats.summary())
+            logger.info("✂️ Response budgets: %s", agent.budget.summary())
+            logger.info("🌐 Language: %s", agent.language.summary())
+            logger.info("🎚️ Latency by quality tier: %s", agent.quality.summary())
+            logger.info("🚦 Provider quotas: %s", agent.quota.summary())
+            logger.info("📨 UI actions: %s", agent.functions.actions.stats.summary())
+            from audio_pool import pool_stats
+            
+            if pool_stats():
+                logger.info("🧵 Pooled VAD: %s", pool_stats())
+            if local_stt.decoder_stats():
+                logger.info("🗣️ Local STT decoder: %s", local_stt.decoder_stats())
+            await memory.stop()
+            logger.info("🧠 Session memory: %s (sessions per pod: %s)", memory.summary(), accountant.sessions_per_pod())
+            if agent.experiment.recording:
+                logger.info("🧪 Experiment: %s", agent.experiment.summary())
+                save_result(agent.experiment.result())
+        
+        ctx.add_shutdown_callback(log_barge_in_summary)
+        
+        if agent.recorder:
+            agent.recorder.attach(session)
+            
+            async def save_recording():
+                await asyncio.to_thread(agent.recorder.save)
+            
+            ctx.add_shutdown_callback(save_recording)
+        
+        return session
+    
+    async def start_session(_connected, session, agent):
+        from audio_pool import noise_cancellation_options
+        
+        logger.info("▶️ Starting ARIA (quality tier: %s)...", agent.quality.tier.name)
+        await session.start(
+            room=ctx.room,
+            agent=agent,
+            room_input_options=RoomInputOptions(
+                # Runs natively in the FFI layer, not on this event loop; off in the minimal tier
+                noise_cancellation=noise_cancellation_options() if agent.quality.tier.noise_cancellation else None,
+            ),
+        )
+        logger.info("🎤 ARIA is live!")
+    
+    async def greet(_started, session, agent, student_data, greeting_text):
+        if greeting_text is not None:
+            session.say(greeting_text)
+        else:
+            await session.generate_reply(instructions=get_greeting_instructions(student_data, agent.language.current))
+        logger.info("✅ ARIA greeted the user!")
+        # Fill any missing fixed-reply audio in the background
+        agent.warm_tts_cache()
+        agent.priority = Priority.TURN
+    
+    graph = StartupGraph()
+    graph.add("connect", connect)
+    graph.add("metadata", lambda: parse_student_data(ctx.job.room.metadata))
+    # Only a warm room has to connect before it knows its student; everything below waits for the student
+    graph.add("student", wait_for_student, deps=("metadata", "connect") if is_warm_room(ctx.job.room.metadata) else ("metadata",))
+    graph.add("arm", assign_arm, deps=("student",))
+    graph.add("quality", QualityController)
+    graph.add("language", pick_language, deps=("student",))
+    graph.add("llm", create_llm, deps=("arm",))
+    graph.add("tts", create_tts, deps=("quality", "arm", "language"))
+    graph.add("tts_caches", create_tts_caches, deps=("arm",))
+    graph.add("vad", create_vad, deps=("arm",))
+    graph.add("stt", create_stt, deps=("student", "vad", "arm", "language"))
+    graph.add("agent", create_agent, deps=("student", "quality", "arm", "tts_caches", "language"))
+    graph.add("payments", load_payments, deps=("student",))
+    graph.add("greeting", prefetch_greeting, deps=("student", "llm"))
+    graph.add("session", create_session, deps=("agent", "llm", "stt", "tts", "vad"))
+    graph.add("start", start_session, deps=("connect", "session", "agent"))
+    graph.add("greet", greet, deps=("start", "session", "agent", "student", "greeting"))
+    await graph.run()
     
     # Keep agent running
     await asyncio.Future()
 
 
+def _profile_worker(worker_options) -> "agents.AgentServer":
+    """Report the worker's startup phases once it is registered and ready for dispatch"""
+    server = agents.AgentServer.from_server_options(worker_options)
+    
+    @server.on("worker_registered")
+    def _on_registered(*_):
+        startup_profile.mark("worker registration")
+        logger.info("%s", startup_profile.report("Worker ready for dispatch"))
+        # Re-measuring imports takes a few seconds, so keep it off the worker's loop
+        threading.Thread(target=lambda: logger.info("%s", startup_profile.import_report()), daemon=True).start()
+    
+    return server
+
+
 if __name__ == "__main__":
+    from audio_pool import execution_mode
+    
+    profiling = startup_profile.enable_from_argv()
     logger.info("🏁 Starting ARIA - BEC BillDesk Voice Guide...")
-    agents.cli.run_app(agents.WorkerOptions(entrypoint_fnc=entrypoint))
+    load_config()
+    startup_profile.mark("config")
+    load_plugins()
+    startup_profile.mark("plugin imports")
+    # Reported load covers memory too, so a worker near its memory budget stops taking jobs
+    worker_options = agents.WorkerOptions(entrypoint_fnc=entrypoint, prewarm_fnc=prewarm, load_fnc=worker_load)
+    if execution_mode() == "pooled":
+        # Jobs share one process so their VAD inference can be batched together
+        worker_options.job_executor_type = agents.JobExecutorType.THREAD
+    agents.cli.run_app(_profile_worker(worker_options) if profiling else worker_options)
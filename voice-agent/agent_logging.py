@@ -0,0 +1,148 @@
+"""
+BEC BillDesk Voice Agent - Structured Logging
+
+Keeps logging off the audio hot path:
+- records are pushed onto a queue and written by a background thread
+  (QueueHandler/QueueListener), so the event loop never blocks on I/O
+- messages use lazy %-style arguments, so records dropped by level or
+  sampling are never formatted; the rest are rendered before enqueueing
+  (arguments may change after the call returns), while JSON/text
+  formatting and I/O stay on the writer thread
+- every record carries the session's correlation ids (room, USN) from
+  a contextvar set once in the entrypoint
+- high-frequency events can be sampled with extra={"sample_every": N};
+  sampling runs after the level check, so it only thins records at a
+  level the logger emits (INFO and up by default)
+
+Output is one JSON object per line; set LOG_FORMAT=text for plain
+human-readable lines during local development.
+"""
+
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+from collections import defaultdict
+from typing import Optional
+
+LOGGER_NAME = "billdesk-agent"
+
+# Correlation ids for the session running in the current task (and tasks it spawns)
+session_context: contextvars.ContextVar[dict] = contextvars.ContextVar("session_context")
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def bind_session(**ids):
+    """Attach correlation ids (e.g. room, usn) to all logs from the current task
+
+    The first call creates the id dict; later calls update it in place so
+    ids bound from a child task are also seen by the parent and siblings.
+    """
+    ids = {k: v for k, v in ids.items() if v}
+    current = session_context.get(None)
+    if current is None:
+        session_context.set(ids)
+    else:
+        current.update(ids)
+
+
+class SessionContextFilter(logging.Filter):
+    """Copies the session correlation ids onto each record"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.session = dict(session_context.get({}))
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps 1 in N records that set extra={"sample_every": N}"""
+
+    def __init__(self):
+        super().__init__()
+        self._counts: dict[tuple, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        every = getattr(record, "sample_every", None)
+        if not every or every <= 1:
+            return True
+        key = (record.name, record.msg)
+        with self._lock:
+            count = self._counts[key]
+            self._counts[key] = count + 1
+        return count % every == 0
+
+
+class SnapshotQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that renders the message on the calling thread but keeps exc_info for the writer"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+class JSONFormatter(logging.Formatter):
+    _RESERVED = set(vars(logging.makeLogRecord({}))) | {"message", "session", "sample_every", "asctime"}
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            **getattr(record, "session", {}),
+        }
+        for key, value in vars(record).items():
+            if key not in self._RESERVED and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        session = getattr(record, "session", {})
+        if session:
+            line += " [" + " ".join(f"{k}={v}" for k, v in session.items()) + "]"
+        return line
+
+
+def setup_logging(level: int = logging.INFO) -> logging.Logger:
+    """Configure the agent logger with a queue-backed, background-thread writer"""
+    global _listener
+
+    logger = logging.getLogger(LOGGER_NAME)
+    if _listener is not None:
+        return logger
+
+    if os.getenv("LOG_FORMAT", "json") == "text":
+        formatter = TextFormatter("%(asctime)s %(levelname)s %(name)s: %(message)s")
+    else:
+        formatter = JSONFormatter()
+
+    stream_handler = logging.StreamHandler(sys.stderr)
+    stream_handler.setFormatter(formatter)
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = SnapshotQueueHandler(log_queue)
+    # Sampling and correlation ids are resolved on the calling task, before enqueueing
+    queue_handler.addFilter(SamplingFilter())
+    queue_handler.addFilter(SessionContextFilter())
+
+    logger.setLevel(level)
+    logger.addHandler(queue_handler)
+    logger.propagate = False
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+    return logger
@@ -0,0 +1,275 @@
+"""
+BEC BillDesk Voice Agent - Pooled Audio Inference
+
+Execution mode that takes Silero VAD inference for every session on a
+worker off the sessions' event loops and runs it in one dedicated
+inference thread, batched across sessions:
+
+- each session's VAD stream gets a slot holding its RNN state/context
+- windows submitted by all sessions within MAX_WAIT_MS are copied into
+  one preallocated (shared) input buffer and run as a single ONNX batch
+- per-window queueing latency, batch sizes and inference time are tracked
+
+Enable with AUDIO_EXECUTION_MODE=pooled. In that mode jobs run as
+threads of one worker process (JobExecutorType.THREAD) so that all
+sessions share the pool; the default "inline" mode keeps one process
+per job with per-stream Silero inference. Both modes support a window
+stride (see StridedModel) that the quality tiers raise under load.
+
+Noise cancellation is not done here: RoomInputOptions only honours a
+NoiseCancellationOptions module (e.g. LiveKit's BVC) or a FrameProcessor,
+and the module form runs inside the native FFI layer, off the Python
+event loop. noise_cancellation_options() returns it when the optional
+livekit-plugins-noise-cancellation package is installed.
+"""
+
+import concurrent.futures
+import dataclasses
+import logging
+import os
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+import numpy as np
+from livekit.plugins import silero
+from livekit.plugins.silero import onnx_model, vad as silero_vad
+
+try:
+    from livekit.plugins import noise_cancellation
+except ImportError:
+    noise_cancellation = None
+
+logger = logging.getLogger("billdesk-agent")
+
+MAX_BATCH = 64
+MAX_WAIT_MS = 2.0
+STATE_SIZE = 128
+
+# Silero window/context sizes per sample rate
+_WINDOWS = {8000: (256, 32), 16000: (512, 64)}
+
+
+def execution_mode() -> str:
+    return os.getenv("AUDIO_EXECUTION_MODE", "inline")
+
+
+def noise_cancellation_options():
+    """Native (FFI-side) noise cancellation if available, else None"""
+    if noise_cancellation is None:
+        return None
+    return noise_cancellation.BVC()
+
+
+@dataclass
+class InferenceStats:
+    windows: int = 0
+    batches: int = 0
+    queue_ms: list[float] = field(default_factory=list)
+    inference_ms: list[float] = field(default_factory=list)
+    max_samples: int = 10_000
+
+    def add(self, queue_ms: list[float], inference_ms: float):
+        self.windows += len(queue_ms)
+        self.batches += 1
+        self.queue_ms.extend(queue_ms)
+        self.inference_ms.append(inference_ms)
+        # Keep a bounded window of recent samples
+        del self.queue_ms[:-self.max_samples]
+        del self.inference_ms[:-self.max_samples]
+
+    def summary(self) -> dict:
+        q = sorted(self.queue_ms)
+        return {
+            "windows": self.windows,
+            "batches": self.batches,
+            "avg_batch": self.windows / self.batches if self.batches else 0.0,
+            "queue_p50_ms": q[len(q) // 2] if q else 0.0,
+            "queue_p99_ms": q[int(len(q) * 0.99)] if q else 0.0,
+            "inference_avg_ms": sum(self.inference_ms) / len(self.inference_ms) if self.inference_ms else 0.0,
+        }
+
+
+class _Slot:
+    """Recurrent state for one VAD stream"""
+
+    def __init__(self, context_size: int):
+        self.state = np.zeros((2, STATE_SIZE), dtype=np.float32)
+        self.context = np.zeros(context_size, dtype=np.float32)
+
+
+class BatchedVADInference:
+    """One inference thread serving Silero windows from every session in the process"""
+
+    def __init__(self, onnx_session, sample_rate: int = 16000, max_batch: int = MAX_BATCH, max_wait_ms: float = MAX_WAIT_MS):
+        self._sess = onnx_session
+        self.sample_rate = sample_rate
+        self.window_size, self.context_size = _WINDOWS[sample_rate]
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.stats = InferenceStats()
+
+        # Preallocated buffers shared by all sessions; rows are filled in place per batch
+        self._input = np.zeros((max_batch, self.context_size + self.window_size), dtype=np.float32)
+        self._state = np.zeros((2, max_batch, STATE_SIZE), dtype=np.float32)
+        self._sr = np.array(sample_rate, dtype=np.int64)
+
+        self._requests: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="vad-inference", daemon=True)
+        self._thread.start()
+
+    def new_slot(self) -> _Slot:
+        return _Slot(self.context_size)
+
+    def submit(self, slot: _Slot, window: np.ndarray) -> concurrent.futures.Future:
+        future: concurrent.futures.Future = concurrent.futures.Future()
+        self._requests.put((slot, window.copy(), future, time.perf_counter()))
+        return future
+
+    def _collect(self) -> list:
+        batch = [self._requests.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._requests.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            n = len(batch)
+            for i, (slot, window, _, _) in enumerate(batch):
+                self._input[i, :self.context_size] = slot.context
+                self._input[i, self.context_size:] = window
+                self._state[:, i] = slot.state
+            try:
+                out, state = self._sess.run(None, {"input": self._input[:n], "state": self._state[:, :n], "sr": self._sr})
+            except Exception as e:
+                for _, _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            for i, (slot, _, future, _) in enumerate(batch):
+                slot.state[:] = state[:, i]
+                slot.context[:] = self._input[i, -self.context_size:]
+                future.set_result(float(out[i].item()))
+            self.stats.add(
+                [(started - submitted) * 1000 for _, _, _, submitted in batch],
+                (time.perf_counter() - started) * 1000,
+            )
+
+
+class PooledOnnxModel:
+    """Drop-in for silero's OnnxModel that runs inference on the shared pool"""
+
+    def __init__(self, pool: BatchedVADInference):
+        self._pool = pool
+        self._slot = pool.new_slot()
+
+    @property
+    def sample_rate(self) -> int:
+        return self._pool.sample_rate
+
+    @property
+    def window_size_samples(self) -> int:
+        return self._pool.window_size
+
+    @property
+    def context_size(self) -> int:
+        return self._pool.context_size
+
+    def reset(self) -> None:
+        self._slot = self._pool.new_slot()
+
+    def __call__(self, x: np.ndarray) -> float:
+        # Called from VADStream via run_in_executor, so blocking here is off the event loop
+        return self._pool.submit(self._slot, x).result()
+
+
+class StridedModel:
+    """Runs inference on every Nth window only, reusing the last probability in between
+
+    Used by the quality tiers to lower VAD cost under load.
+    """
+
+    def __init__(self, vad: "AdaptiveSileroVAD", model):
+        self._vad = vad
+        self._model = model
+        self._count = 0
+        self._last = 0.0
+
+    @property
+    def sample_rate(self) -> int:
+        return self._model.sample_rate
+
+    @property
+    def window_size_samples(self) -> int:
+        return self._model.window_size_samples
+
+    @property
+    def context_size(self) -> int:
+        return self._model.context_size
+
+    def reset(self) -> None:
+        self._model.reset()
+        self._count = 0
+        self._last = 0.0
+
+    def __call__(self, x: np.ndarray) -> float:
+        if self._count % max(self._vad.stride, 1) == 0:
+            self._last = self._model(x)
+        self._count += 1
+        return self._last
+
+
+class AdaptiveSileroVAD(silero.VAD):
+    """Silero VAD with optional pooled inference and an adjustable window stride"""
+
+    def __init__(self, vad: silero.VAD, pool: Optional[BatchedVADInference] = None):
+        # Reuses the loaded model session and options of a regular silero.VAD
+        super().__init__(session=vad._onnx_session, opts=vad._opts)
+        self._pool = pool
+        self.stride = 1
+
+    def with_options(self, **options) -> "AdaptiveSileroVAD":
+        """A copy with different detection options (e.g. for one session), sharing the model and pool"""
+        vad = AdaptiveSileroVAD(self, self._pool)
+        vad._opts = dataclasses.replace(self._opts, **options)
+        return vad
+
+    def stream(self) -> silero_vad.VADStream:
+        if self._pool is not None:
+            model = PooledOnnxModel(self._pool)
+        else:
+            model = onnx_model.OnnxModel(onnx_session=self._onnx_session, sample_rate=self._opts.sample_rate)
+        stream = silero_vad.VADStream(self, self._opts, StridedModel(self, model))
+        self._streams.add(stream)
+        return stream
+
+
+_pool: Optional[BatchedVADInference] = None
+_pool_lock = threading.Lock()
+
+
+def load_vad():
+    """Silero VAD for the configured execution mode"""
+    global _pool
+    vad = silero.VAD.load()
+    if execution_mode() != "pooled":
+        return AdaptiveSileroVAD(vad)
+    with _pool_lock:
+        if _pool is None:
+            _pool = BatchedVADInference(vad._onnx_session, sample_rate=vad._opts.sample_rate)
+            logger.info("🧵 Pooled VAD inference thread started")
+    return AdaptiveSileroVAD(vad, _pool)
+
+
+def pool_stats() -> Optional[dict]:
+    return _pool.stats.summary() if _pool else None
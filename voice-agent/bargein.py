@@ -0,0 +1,119 @@
+"""
+BEC BillDesk Voice Agent - Barge-in Accounting
+
+Tracks what happens when a student interrupts ARIA mid-sentence:
+the LLM and TTS streams are closed as soon as the speech is cancelled
+(instead of draining in the background) and we account for how much
+was generated but never played.
+
+Metrics per session:
+- interruptions: number of agent speeches cut off by the student
+- tts_bytes_total / tts_bytes_interrupted: synthesized PCM bytes, and
+  the share of them that belonged to the unspoken part of a speech
+- llm_tokens_total / llm_tokens_wasted: completion tokens, and the
+  estimated share that was never spoken
+"""
+
+import logging
+from contextlib import aclosing
+from dataclasses import dataclass, field
+from typing import AsyncIterable, Optional
+
+logger = logging.getLogger("billdesk-agent")
+
+# Rough chars-per-token ratio used when the provider doesn't report usage
+CHARS_PER_TOKEN = 4
+
+
+@dataclass
+class SpeechRecord:
+    """Generated vs spoken output for a single agent speech"""
+    generated_chars: int = 0
+    completion_tokens: int = 0
+    tts_bytes: int = 0
+    spoken_chars: Optional[int] = None
+    interrupted: bool = False
+
+    @property
+    def spoken_fraction(self) -> float:
+        if not self.interrupted:
+            return 1.0
+        if not self.generated_chars or self.spoken_chars is None:
+            return 0.0
+        return min(self.spoken_chars / self.generated_chars, 1.0)
+
+    @property
+    def tokens(self) -> int:
+        return self.completion_tokens or self.generated_chars // CHARS_PER_TOKEN
+
+
+@dataclass
+class BargeInAccounting:
+    """Per-session interruption accounting"""
+    speeches: dict[str, SpeechRecord] = field(default_factory=dict)
+
+    def _record(self, speech_id: Optional[str]) -> SpeechRecord:
+        return self.speeches.setdefault(speech_id or "unknown", SpeechRecord())
+
+    def attach(self, session):
+        """Subscribe to AgentSession events"""
+        session.on("speech_created", self._on_speech_created)
+        session.on("conversation_item_added", self._on_item_added)
+        session.on("metrics_collected", self._on_metrics)
+
+    def _on_speech_created(self, ev):
+        handle = ev.speech_handle
+        self._record(handle.id)
+        handle.add_done_callback(self._on_speech_done)
+
+    def _on_speech_done(self, handle):
+        if handle.interrupted:
+            record = self._record(handle.id)
+            record.interrupted = True
+            logger.info("✋ Speech %s interrupted by student", handle.id)
+
+    def _on_item_added(self, ev):
+        item = ev.item
+        if getattr(item, "role", None) != "assistant" or not getattr(item, "interrupted", False):
+            return
+        # The framework truncates interrupted messages to the text actually played out,
+        # so attribute it to the latest interrupted speech still missing its spoken length
+        pending = [r for r in self.speeches.values() if r.interrupted and r.spoken_chars is None]
+        record = pending[-1] if pending else self._record(None)
+        record.interrupted = True
+        record.spoken_chars = len(item.text_content or "")
+
+    def _on_metrics(self, ev):
+        m = ev.metrics
+        kind = type(m).__name__
+        if kind == "LLMMetrics":
+            self._record(getattr(m, "speech_id", None)).completion_tokens += m.completion_tokens
+
+    async def track_llm(self, speech_id: Optional[str], stream: AsyncIterable):
+        """Pass LLM chunks through, counting generated text; closes upstream on cancel"""
+        record = self._record(speech_id)
+        async with aclosing(stream) as chunks:
+            async for chunk in chunks:
+                text = chunk if isinstance(chunk, str) else getattr(getattr(chunk, "delta", None), "content", None)
+                if text:
+                    record.generated_chars += len(text)
+                yield chunk
+
+    async def track_tts(self, speech_id: Optional[str], frames: AsyncIterable):
+        """Pass TTS frames through, counting PCM bytes; closes upstream on cancel"""
+        record = self._record(speech_id)
+        async with aclosing(frames) as stream:
+            async for frame in stream:
+                record.tts_bytes += len(frame.data) * 2  # int16 samples
+                yield frame
+
+    def summary(self) -> dict:
+        interrupted = [r for r in self.speeches.values() if r.interrupted]
+        return {
+            "speeches": len(self.speeches),
+            "interruptions": len(interrupted),
+            "tts_bytes_total": sum(r.tts_bytes for r in self.speeches.values()),
+            "tts_bytes_interrupted": int(sum(r.tts_bytes * (1 - r.spoken_fraction) for r in interrupted)),
+            "llm_tokens_total": sum(r.tokens for r in self.speeches.values()),
+            "llm_tokens_wasted": int(sum(r.tokens * (1 - r.spoken_fraction) for r in interrupted)),
+        }
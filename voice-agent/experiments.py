@@ -0,0 +1,388 @@
+"""
+BEC BillDesk Voice Agent - Config-driven Experiments
+
+Assigns each session to an arm of the experiment in experiments.json
+(EXPERIMENTS_FILE to use another file; see experiments.example.json)
+instead of editing the provider settings in agent.py by hand. Without a
+config every session runs the control settings and nothing is recorded.
+An arm overrides any of:
+
+    {"name": "nova3-turbo", "weight": 1,
+     "llm_model": "llama3.1-8b", "stt_model": "nova-3",
+     "tts_model": "sonic-turbo", "tts_voice": "<cartesia voice id>",
+     "vad": {"min_silence_duration": 0.4, "activation_threshold": 0.5}}
+
+Unset fields keep the defaults (the current production settings).
+Sessions are assigned by a hash of the room name, weighted, so the same
+room always lands in the same arm; "experimentArm" in the room metadata
+forces an arm.
+
+Each session appends one JSON line to EXPERIMENT_RESULTS (default
+.experiments/results.jsonl) with its arm and per-turn metrics: latency
+(end of utterance delay + LLM TTFT + TTS TTFB), provider cost from the
+"prices" table, and whether the student interrupted the reply.
+
+Compare arms with: python experiments.py results.jsonl [--experiment NAME]
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import math
+import os
+import pathlib
+import statistics
+import threading
+from dataclasses import asdict, dataclass, field, fields
+from typing import Optional
+
+logger = logging.getLogger("billdesk-agent")
+
+CONFIG_PATH = pathlib.Path(__file__).parent / "experiments.json"
+RESULTS_PATH = pathlib.Path(__file__).parent / ".experiments" / "results.jsonl"
+
+# Approximate USD list prices, used when the config has no "prices" table
+DEFAULT_PRICES = {
+    "llm_per_1k_tokens": 0.0001,
+    "stt_per_minute": 0.0058,
+    "tts_per_1k_chars": 0.038,
+}
+
+
+@dataclass(frozen=True)
+class Arm:
+    name: str = "control"
+    weight: float = 1.0
+    llm_model: str = "llama3.1-8b"
+    stt_model: str = "nova-2"
+    tts_model: str = "sonic-2"
+    tts_voice: str = "f786b574-daa5-4673-aa0c-cbe3e8534c02"  # Professional female voice
+    vad: dict = field(default_factory=dict)
+
+    @classmethod
+    def from_config(cls, config: dict) -> "Arm":
+        known = {f.name for f in fields(cls)}
+        unknown = set(config) - known
+        if unknown:
+            logger.warning("Experiment arm %s: ignoring unknown settings %s", config.get("name"), sorted(unknown))
+        return cls(**{k: v for k, v in config.items() if k in known})
+
+
+CONTROL = Arm()
+
+
+@dataclass(frozen=True)
+class Experiment:
+    name: str
+    arms: tuple[Arm, ...]
+    prices: dict
+
+    def assign(self, room_name: str, forced: Optional[str] = None) -> Arm:
+        """Weighted, deterministic arm for a session"""
+        by_name = {arm.name: arm for arm in self.arms}
+        if forced in by_name:
+            return by_name[forced]
+        total = sum(arm.weight for arm in self.arms)
+        digest = hashlib.sha256(f"{self.name}:{room_name}".encode("utf-8")).digest()
+        point = int.from_bytes(digest[:8], "big") / 2 ** 64 * total
+        for arm in self.arms:
+            point -= arm.weight
+            if point < 0:
+                return arm
+        return self.arms[-1]
+
+
+def load_experiment() -> Experiment:
+    """The configured experiment, or a single control arm if there is none"""
+    path = pathlib.Path(os.getenv("EXPERIMENTS_FILE", CONFIG_PATH))
+    try:
+        config = json.loads(path.read_text(encoding="utf-8"))
+        arms = tuple(Arm.from_config(arm) for arm in config.get("arms", []) if arm.get("weight", 1) > 0)
+    except FileNotFoundError:
+        config, arms = {}, ()
+    except (ValueError, TypeError) as e:
+        logger.warning("Invalid experiment config %s: %s", path, e)
+        config, arms = {}, ()
+    return Experiment(
+        name=config.get("experiment", "none"),
+        arms=arms or (CONTROL,),
+        prices={**DEFAULT_PRICES, **config.get("prices", {})},
+    )
+
+
+@dataclass
+class TurnMetrics:
+    speech_id: str
+    eou_delay: Optional[float] = None
+    llm_ttft: Optional[float] = None
+    tts_ttfb: Optional[float] = None
+    llm_tokens: int = 0
+    tts_chars: int = 0
+    interrupted: bool = False
+
+    @property
+    def latency(self) -> Optional[float]:
+        """Student stops talking → first audio out; None unless every stage was measured"""
+        if None in (self.eou_delay, self.llm_ttft, self.tts_ttfb):
+            return None
+        return self.eou_delay + self.llm_ttft + self.tts_ttfb
+
+
+class ExperimentSession:
+    """Collects one session's per-turn metrics for its arm"""
+
+    def __init__(self, experiment: Experiment, arm: Arm, room_name: str):
+        self.experiment = experiment
+        self.arm = arm
+        self.room_name = room_name
+        self.turns: dict[str, TurnMetrics] = {}
+        self.stt_seconds = 0.0
+
+    def _turn(self, speech_id: Optional[str]) -> Optional[TurnMetrics]:
+        if not speech_id:
+            return None
+        return self.turns.setdefault(speech_id, TurnMetrics(speech_id))
+
+    def attach(self, session):
+        """Subscribe to AgentSession events"""
+
+        @session.on("metrics_collected")
+        def _on_metrics(ev):
+            m = ev.metrics
+            kind = type(m).__name__
+            if kind == "STTMetrics":
+                self.stt_seconds += m.audio_duration
+                return
+            turn = self._turn(getattr(m, "speech_id", None))
+            if turn is None:
+                return
+            if kind == "EOUMetrics":
+                turn.eou_delay = m.end_of_utterance_delay
+            elif kind == "LLMMetrics":
+                turn.llm_tokens += m.prompt_tokens + m.completion_tokens
+                if turn.llm_ttft is None and m.ttft >= 0:
+                    turn.llm_ttft = m.ttft
+            elif kind == "TTSMetrics":
+                turn.tts_chars += m.characters_count
+                if turn.tts_ttfb is None and m.ttfb >= 0:
+                    turn.tts_ttfb = m.ttfb
+
+        @session.on("speech_created")
+        def _on_speech(ev):
+            self._turn(ev.speech_handle.id)
+            ev.speech_handle.add_done_callback(
+                lambda handle: setattr(self._turn(handle.id), "interrupted", handle.interrupted)
+            )
+
+    def turn_cost(self, turn: TurnMetrics) -> float:
+        prices = self.experiment.prices
+        return turn.llm_tokens / 1000 * prices["llm_per_1k_tokens"] + turn.tts_chars / 1000 * prices["tts_per_1k_chars"]
+
+    @property
+    def recording(self) -> bool:
+        return self.experiment.name != "none"
+
+    def result(self) -> dict:
+        turns = [t for t in self.turns.values() if t.llm_tokens or t.tts_chars]
+        stt_cost = self.stt_seconds / 60 * self.experiment.prices["stt_per_minute"]
+        return {
+            "experiment": self.experiment.name,
+            "arm": self.arm.name,
+            "config": asdict(self.arm),
+            "room": self.room_name,
+            "stt_seconds": round(self.stt_seconds, 2),
+            "cost": round(sum(self.turn_cost(t) for t in turns) + stt_cost, 6),
+            "turns": [
+                {**asdict(t), "latency": t.latency, "cost": round(self.turn_cost(t), 6)}
+                for t in turns
+            ],
+        }
+
+    def summary(self) -> dict:
+        latencies = [t.latency for t in self.turns.values() if t.latency is not None]
+        return {
+            "experiment": self.experiment.name,
+            "arm": self.arm.name,
+            "turns": len(self.turns),
+            "avg_latency": round(statistics.fmean(latencies), 3) if latencies else None,
+            "interruptions": sum(t.interrupted for t in self.turns.values()),
+        }
+
+
+_results_lock = threading.Lock()
+
+
+def save_result(result: dict, path: Optional[pathlib.Path] = None):
+    """Append one session's result (a single write, so job processes don't interleave)"""
+    path = pathlib.Path(path or os.getenv("EXPERIMENT_RESULTS", RESULTS_PATH))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with _results_lock, open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(result, default=str) + "\n")
+
+
+# --- Report ------------------------------------------------------------------
+
+
+def _normal_p(z: float) -> float:
+    """Two-sided p-value of a standard normal statistic"""
+    return math.erfc(abs(z) / math.sqrt(2))
+
+
+def _betacf(a: float, b: float, x: float) -> float:
+    """Continued fraction for the regularized incomplete beta function (modified Lentz)"""
+    tiny = 1e-300
+    c, d = 1.0, 1 - (a + b) * x / (a + 1)
+    d = 1 / (d if abs(d) > tiny else tiny)
+    h = d
+    for m in range(1, 300):
+        for numerator in (
+            m * (b - m) * x / ((a + 2 * m - 1) * (a + 2 * m)),
+            -(a + m) * (a + b + m) * x / ((a + 2 * m) * (a + 2 * m + 1)),
+        ):
+            d = 1 + numerator * d
+            d = 1 / (d if abs(d) > tiny else tiny)
+            c = 1 + numerator / c
+            c = c if abs(c) > tiny else tiny
+            h *= d * c
+        if abs(d * c - 1) < 1e-12:
+            break
+    return h
+
+
+def _incomplete_beta(a: float, b: float, x: float) -> float:
+    if x <= 0:
+        return 0.0
+    if x >= 1:
+        return 1.0
+    front = math.exp(math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b) + a * math.log(x) + b * math.log(1 - x))
+    if x < (a + 1) / (a + b + 2):
+        return front * _betacf(a, b, x) / a
+    return 1 - front * _betacf(b, a, 1 - x) / b
+
+
+def _t_p(t: float, df: float) -> float:
+    """Two-sided p-value of a Student t statistic with df degrees of freedom"""
+    return _incomplete_beta(df / 2, 0.5, df / (df + t * t))
+
+
+def mann_whitney_p(a: list[float], b: list[float]) -> Optional[float]:
+    """Two-sided Mann-Whitney U test (normal approximation, tie-corrected)"""
+    n1, n2 = len(a), len(b)
+    if n1 < 2 or n2 < 2:
+        return None
+    ranked = sorted([(v, 0) for v in a] + [(v, 1) for v in b])
+    ranks = [0.0] * len(ranked)
+    ties = 0.0
+    i = 0
+    while i < len(ranked):
+        j = i
+        while j + 1 < len(ranked) and ranked[j + 1][0] == ranked[i][0]:
+            j += 1
+        for k in range(i, j + 1):
+            ranks[k] = (i + j) / 2 + 1
+        t = j - i + 1
+        ties += t ** 3 - t
+        i = j + 1
+    u = sum(r for r, (_, group) in zip(ranks, ranked) if group == 0) - n1 * (n1 + 1) / 2
+    n = n1 + n2
+    variance = n1 * n2 / 12 * ((n + 1) - ties / (n * (n - 1)))
+    if variance <= 0:
+        return None
+    return _normal_p((u - n1 * n2 / 2) / math.sqrt(variance))
+
+
+def welch_p(a: list[float], b: list[float]) -> Optional[float]:
+    """Two-sided Welch's t-test (t distribution, Welch-Satterthwaite degrees of freedom)"""
+    if len(a) < 2 or len(b) < 2:
+        return None
+    va, vb = statistics.variance(a) / len(a), statistics.variance(b) / len(b)
+    if va + vb == 0:
+        return None
+    t = (statistics.fmean(a) - statistics.fmean(b)) / math.sqrt(va + vb)
+    df = (va + vb) ** 2 / (va ** 2 / (len(a) - 1) + vb ** 2 / (len(b) - 1))
+    return _t_p(t, df)
+
+
+def proportion_p(hits_a: int, n_a: int, hits_b: int, n_b: int) -> Optional[float]:
+    """Two-sided two-proportion z-test"""
+    if not n_a or not n_b:
+        return None
+    pooled = (hits_a + hits_b) / (n_a + n_b)
+    se = math.sqrt(pooled * (1 - pooled) * (1 / n_a + 1 / n_b))
+    if se == 0:
+        return None
+    return _normal_p((hits_a / n_a - hits_b / n_b) / se)
+
+
+def _percentile(values: list[float], p: float) -> float:
+    values = sorted(values)
+    return values[min(int(len(values) * p), len(values) - 1)]
+
+
+def _p(value: Optional[float]) -> str:
+    return "   n/a" if value is None else f"{value:6.3f}"
+
+
+def report(path: str, experiment: Optional[str] = None):
+    sessions = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                sessions.append(json.loads(line))
+    if experiment is None and sessions:
+        # Default to the most recent experiment in the file
+        experiment = sessions[-1]["experiment"]
+    sessions = [s for s in sessions if s["experiment"] == experiment]
+    if not sessions:
+        print(f"No sessions for experiment {experiment!r}")
+        return
+
+    arms: dict[str, dict] = {}
+    for s in sessions:
+        arm = arms.setdefault(
+            s["arm"],
+            {"sessions": 0, "latency": [], "session_latency": [], "session_cost": [], "turns": 0, "interrupted": 0},
+        )
+        arm["sessions"] += 1
+        arm["session_cost"].append(s["cost"])
+        arm["turns"] += len(s["turns"])
+        arm["interrupted"] += sum(t["interrupted"] for t in s["turns"])
+        latencies = [t["latency"] for t in s["turns"] if t["latency"] is not None]
+        arm["latency"].extend(latencies)
+        # Turns of one session aren't independent, so the test compares per-session medians
+        if latencies:
+            arm["session_latency"].append(statistics.median(latencies))
+
+    print(f"Experiment {experiment}: {len(sessions)} sessions")
+    print(f"{'arm':<16}{'sessions':>9}{'turns':>7}{'lat p50':>9}{'lat p95':>9}{'cost/sess':>11}{'interrupt':>11}")
+    for name, arm in arms.items():
+        p50 = f"{_percentile(arm['latency'], 0.5):8.2f}s" if arm["latency"] else "      n/a"
+        p95 = f"{_percentile(arm['latency'], 0.95):8.2f}s" if arm["latency"] else "      n/a"
+        rate = arm["interrupted"] / arm["turns"] if arm["turns"] else 0.0
+        print(f"{name:<16}{arm['sessions']:>9}{arm['turns']:>7}{p50}{p95}{statistics.fmean(arm['session_cost']):>11.4f}{rate:>10.1%}")
+
+    # Every arm against the control (the first arm seen if none is named "control")
+    control = CONTROL.name if CONTROL.name in arms else next(iter(arms))
+    baseline = arms[control]
+    others = [name for name in arms if name != control]
+    if others:
+        print(
+            f"\np-values vs {control} (latency: Mann-Whitney on per-session medians;"
+            " cost: Welch per session; interruptions: two-proportion z)"
+        )
+    for name in others:
+        arm = arms[name]
+        print(
+            f"{name:<16} latency {_p(mann_whitney_p(arm['session_latency'], baseline['session_latency']))}"
+            f"  cost {_p(welch_p(arm['session_cost'], baseline['session_cost']))}"
+            f"  interruptions {_p(proportion_p(arm['interrupted'], arm['turns'], baseline['interrupted'], baseline['turns']))}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare experiment arms")
+    parser.add_argument("results", nargs="?", default=str(RESULTS_PATH))
+    parser.add_argument("--experiment", help="experiment name (default: the latest in the file)")
+    args = parser.parse_args()
+    report(args.results, args.experiment)
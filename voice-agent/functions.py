@@ -6,9 +6,19 @@ BEC BillDesk application. These functions send action messages to the
 frontend via LiveKit data channels.
 """
 
-from typing import Optional
-import json
+from datetime import date
+from typing import Iterable, Optional
+import inspect
 from livekit import rtc
+from livekit.agents import RunContext, function_tool
+
+from actions import ActionChannel, PendingAction
+from languages import text
+from payment_history import PaymentIndex, PaymentRecord
+
+# How long initiate_payment waits for outstanding UI actions before ARIA answers
+# (a full retry cycle is MAX_ATTEMPTS × ACK_TIMEOUT)
+PAYMENT_FLUSH_TIMEOUT = 1.0
 
 # Fee structure data (mirrors lib/data/feeStructure.ts)
 FEE_STRUCTURE = [
@@ -64,37 +74,119 @@ FEE_STRUCTURE = [
     }
 ]
 
+# Spoken aliases accepted by select_payment_method (keys have spaces removed)
+PAYMENT_METHOD_ALIASES = {
+    "crypto": "crypto",
+    "cryptocurrency": "crypto",
+    "eth": "crypto",
+    "ethereum": "crypto",
+    "metamask": "crypto",
+    "upi": "upi",
+    "netbanking": "netbanking",
+    "net banking": "netbanking",
+    "bank": "netbanking",
+    "cash": "cash"
+}
+
+PAYMENT_METHOD_NAMES = {"crypto": "Cryptocurrency (Sepolia ETH)", "upi": "UPI", "netbanking": "Net Banking", "cash": "Cash"}
+
+# Fixed replies (spoken verbatim often enough to be worth pre-synthesizing), by catalog key
+FIXED_REPLY_KEYS = [
+    "available_fees",
+    "payment_methods",
+    "select_fee_first",
+    "select_fee_before_wallet",
+    "connect_wallet_first",
+    "no_payment_records",
+    "no_fees_selected",
+    "wallet_popup",
+]
+
+
+def fixed_replies(language: str = "en") -> list[str]:
+    return [text(key, language) for key in FIXED_REPLY_KEYS]
+
+
+FIXED_REPLIES = fixed_replies()
+
+
+def unpaid_fees(paid_fee_ids: Iterable[str] = (), due_date: Optional[str] = None) -> list[dict]:
+    """Fees a student hasn't paid (the pendingFees of the room metadata), optionally only those due on a date"""
+    paid = set(paid_fee_ids)
+    return [f for f in FEE_STRUCTURE if f["id"] not in paid and due_date in (None, f["dueDate"])]
+
+
+def reminder_text(fees: list[dict], language: str = "en") -> str:
+    """Due-date reminder for fees that share a due date ("You have 2 pending fees totaling ₹90,000 due on 30 January...")"""
+    total = sum(f["total"] for f in fees)
+    due = date.fromisoformat(fees[0]["dueDate"])
+    key = "reminder_one" if len(fees) == 1 else "reminder"
+    return text(key, language, count=len(fees), total=f"₹{total:,}", date=f"{due.day} {due:%B}")
+
 
 class BillDeskFunctions:
     """Functions for interacting with BEC BillDesk"""
     
-    def __init__(self, room: rtc.Room):
+    def __init__(self, room: rtc.Room, usn: Optional[str] = None, payments: Optional[PaymentIndex] = None, language: str = "en"):
         self.room = room
+        self.usn = usn
+        self.payments = payments
+        # Replies are spoken in the session's language (languages.MESSAGES)
+        self.language = language
+        self.actions = ActionChannel(room, on_failure=self._reconcile)
         self.selected_fees: list[str] = []
         self.current_payment_method: str = "crypto"
         self.wallet_connected: bool = False
+        self._notices: list[str] = []
     
-    async def _send_action(self, action_type: str, payload: dict = None):
-        """Send an action to the frontend via data channel"""
-        message = {
-            "type": "VOICE_ACTION",
-            "action": action_type,
-            "payload": payload or {}
-        }
-        data = json.dumps(message).encode('utf-8')
-        await self.room.local_participant.publish_data(data, reliable=True)
+    def _text(self, key: str, **values) -> str:
+        return text(key, self.language, **values)
+    
+    async def call(self, name: str, arguments: Optional[dict] = None) -> str:
+        """Invoke a function by name (used by the LLM tools and the intent router)"""
+        result = getattr(self, name)(**(arguments or {}))
+        if inspect.isawaitable(result):
+            result = await result
+        if self._notices:
+            # Tell the student about earlier actions the UI never applied
+            result = " ".join(self._notices + [result])
+            self._notices.clear()
+        return result
+    
+    def _send_action(self, action_type: str, payload: dict = None) -> PendingAction:
+        """Send an action to the frontend via data channel (acked asynchronously)"""
+        return self.actions.send(action_type, payload)
+    
+    def _reconcile(self, action: PendingAction, error: str):
+        """Undo local state for an action the UI never applied"""
+        fee = next((f for f in FEE_STRUCTURE if f["id"] == action.payload.get("feeId")), None)
+        if action.action == "SELECT_FEE" and fee:
+            if fee["id"] in self.selected_fees:
+                self.selected_fees.remove(fee["id"])
+            self._notices.append(self._text("notice_select_failed", fee=fee['name']))
+        elif action.action == "DESELECT_FEE" and fee:
+            if fee["id"] not in self.selected_fees:
+                self.selected_fees.append(fee["id"])
+            self._notices.append(self._text("notice_still_selected", fee=fee['name']))
+        elif action.action == "SELECT_PAYMENT_METHOD":
+            self._notices.append(self._text("notice_method_failed"))
+        elif action.action == "INITIATE_PAYMENT":
+            self._notices.append(self._text("notice_payment_failed"))
+    
+    def _fee_not_found(self, fee_name: str) -> str:
+        return f"{self._text('fee_not_found', name=fee_name)} {self._text('available_fees')}"
     
     def get_pending_fees(self) -> str:
         """Get list of all pending fees with amounts"""
         pending = [f for f in FEE_STRUCTURE if f["status"] == "pending"]
         
         if not pending:
-            return "Great news! You have no pending fees. All your fees have been paid."
+            return self._text("no_pending_fees")
         
         total = sum(f["total"] for f in pending)
-        fee_list = ", ".join([f'{f["name"]} of ₹{f["total"]:,}' for f in pending])
+        fee_list = ", ".join([self._text("fee_amount", fee=f["name"], amount=f'₹{f["total"]:,}') for f in pending])
         
-        return f"You have {len(pending)} pending fees: {fee_list}. The total pending amount is ₹{total:,}."
+        return self._text("pending_fees", count=len(pending), fees=fee_list, total=f"₹{total:,}")
     
     def get_fee_details(self, fee_name: str) -> str:
         """Get detailed breakdown of a specific fee"""
@@ -103,21 +195,53 @@ class BillDeskFunctions:
         for fee in FEE_STRUCTURE:
             if fee_name_lower in fee["name"].lower() or fee_name_lower in fee["id"]:
                 breakdown = ", ".join([f'{b["category"]}: ₹{b["amount"]:,}' for b in fee["breakdown"]])
-                return f"The {fee['name']} is ₹{fee['total']:,} due on {fee['dueDate']}. The breakdown is: {breakdown}."
+                return self._text("fee_details", fee=fee['name'], amount=f"₹{fee['total']:,}", due=fee['dueDate'], breakdown=breakdown)
         
-        return f"I couldn't find a fee called '{fee_name}'. Available fees are: Tuition, Development, Hostel, and Examination."
+        return self._fee_not_found(fee_name)
+    
+    async def _payment_history(self) -> Optional[list[PaymentRecord]]:
+        """The student's payments from the worker's index (None if unavailable)"""
+        if self.payments is None or not self.usn:
+            return None
+        return await self.payments.history(self.usn)
     
-    def get_paid_fees(self) -> str:
+    async def get_paid_fees(self) -> str:
         """Get list of paid fees"""
-        paid = [f for f in FEE_STRUCTURE if f["status"] == "paid"]
+        history = await self._payment_history()
+        if history is None:
+            paid = [f for f in FEE_STRUCTURE if f["status"] == "paid"]
+        else:
+            paid_ids = {fee_id for p in history if p.status == "completed" for fee_id in p.fee_ids}
+            paid = [f for f in FEE_STRUCTURE if f["id"] in paid_ids]
         
         if not paid:
-            return "You haven't paid any fees yet. Would you like to pay any pending fees?"
+            return self._text("no_paid_fees")
         
         total = sum(f["total"] for f in paid)
-        fee_list = ", ".join([f['f["name"]'] for f in paid])
+        fee_list = ", ".join([f["name"] for f in paid])
+        
+        return self._text("paid_fees", count=len(paid), fees=fee_list, total=f"₹{total:,}")
+    
+    async def get_payment_history(self, fee_name: str = "") -> str:
+        """When fees were paid, how, and their receipt ids"""
+        history = await self._payment_history()
+        if history is None:
+            return self._text("no_payment_records")
+        
+        subject = self._text("any_payments")
+        if fee_name:
+            fee_name_lower = fee_name.lower()
+            fee = next((f for f in FEE_STRUCTURE if fee_name_lower in f["name"].lower() or fee_name_lower in f["id"]), None)
+            if fee is None:
+                return self._fee_not_found(fee_name)
+            history = [p for p in history if fee["id"] in p.fee_ids]
+            subject = self._text("fee_payment", fee=fee['name'])
+        
+        if not history:
+            return self._text("no_payments", subject=subject)
         
-        return f"You have paid {len(paid)} fees: {fee_list}. The total paid amount is ₹{total:,}."
+        # Most recent first, at most three to keep it short
+        return " ".join(_describe_payment(p, self.language) for p in reversed(history[-3:]))
     
     async def select_fee(self, fee_name: str) -> str:
         """Select a fee for payment"""
@@ -128,10 +252,10 @@ class BillDeskFunctions:
                 if fee["id"] not in self.selected_fees:
                     self.selected_fees.append(fee["id"])
                 
-                await self._send_action("SELECT_FEE", {"feeId": fee["id"]})
-                return f"I've selected the {fee['name']} for payment. The amount is ₹{fee['total']:,}. Would you like to select any other fees or proceed to payment?"
+                self._send_action("SELECT_FEE", {"feeId": fee["id"]})
+                return self._text("fee_selected", fee=fee['name'], amount=f"₹{fee['total']:,}")
         
-        return f"I couldn't find a fee called '{fee_name}'. Available fees are: Tuition, Development, Hostel, and Examination."
+        return self._fee_not_found(fee_name)
     
     async def deselect_fee(self, fee_name: str) -> str:
         """Deselect a fee from payment"""
@@ -142,10 +266,10 @@ class BillDeskFunctions:
                 if fee["id"] in self.selected_fees:
                     self.selected_fees.remove(fee["id"])
                 
-                await self._send_action("DESELECT_FEE", {"feeId": fee["id"]})
-                return f"I've deselected the {fee['name']}."
+                self._send_action("DESELECT_FEE", {"feeId": fee["id"]})
+                return self._text("fee_deselected", fee=fee['name'])
         
-        return f"I couldn't find a fee called '{fee_name}'."
+        return self._text("fee_not_found", name=fee_name)
     
     async def select_all_fees(self) -> str:
         """Select all pending fees for payment"""
@@ -154,60 +278,51 @@ class BillDeskFunctions:
         self.selected_fees = [f["id"] for f in pending]
         
         for fee_id in self.selected_fees:
-            await self._send_action("SELECT_FEE", {"feeId": fee_id})
+            self._send_action("SELECT_FEE", {"feeId": fee_id})
         
         total = sum(f["total"] for f in pending)
-        return f"I've selected all {len(pending)} pending fees. The total amount is ₹{total:,}. How would you like to pay? You can choose Crypto, UPI, Net Banking, or Cash."
+        return self._text("all_fees_selected", count=len(pending), total=f"₹{total:,}")
     
     async def select_payment_method(self, method: str) -> str:
         """Select payment method (crypto, upi, netbanking, cash)"""
         method_lower = method.lower().replace(" ", "")
-        valid_methods = {
-            "crypto": "crypto",
-            "cryptocurrency": "crypto",
-            "eth": "crypto",
-            "ethereum": "crypto",
-            "metamask": "crypto",
-            "upi": "upi",
-            "netbanking": "netbanking",
-            "net banking": "netbanking",
-            "bank": "netbanking",
-            "cash": "cash"
-        }
-        
-        normalized_method = valid_methods.get(method_lower)
+        normalized_method = PAYMENT_METHOD_ALIASES.get(method_lower)
         
         if normalized_method:
             self.current_payment_method = normalized_method
-            await self._send_action("SELECT_PAYMENT_METHOD", {"method": normalized_method})
+            self._send_action("SELECT_PAYMENT_METHOD", {"method": normalized_method})
             
-            method_names = {"crypto": "Cryptocurrency (Sepolia ETH)", "upi": "UPI", "netbanking": "Net Banking", "cash": "Cash"}
-            return f"I've switched to {method_names[normalized_method]}. {'Would you like me to connect your wallet?' if normalized_method == 'crypto' else 'Ready to proceed when you are.'}"
+            follow_up = self._text("offer_wallet" if normalized_method == "crypto" else "ready_to_proceed")
+            return f"{self._text('method_selected', method=PAYMENT_METHOD_NAMES[normalized_method])} {follow_up}"
         
-        return "I support these payment methods: Crypto, UPI, Net Banking, and Cash. Which one would you prefer?"
+        return self._text("payment_methods")
     
     async def connect_wallet(self) -> str:
         """Trigger wallet connection (MetaMask, WalletConnect, etc)"""
         if not self.selected_fees:
-            return "Please select at least one fee to pay before connecting your wallet."
+            return self._text("select_fee_before_wallet")
         
         if self.current_payment_method != "crypto":
             self.current_payment_method = "crypto"
-            await self._send_action("SELECT_PAYMENT_METHOD", {"method": "crypto"})
+            self._send_action("SELECT_PAYMENT_METHOD", {"method": "crypto"})
         
-        await self._send_action("CONNECT_WALLET", {})
-        return "I've opened the wallet connection popup. Please connect your MetaMask or other wallet. You can also scan the QR code with a mobile wallet. Let me know once you're connected."
+        self._send_action("CONNECT_WALLET", {})
+        return self._text("wallet_popup")
     
     async def initiate_payment(self) -> str:
         """Initiate the payment transaction"""
         if not self.selected_fees:
-            return "Please select at least one fee to pay first."
+            return self._text("select_fee_first")
         
         if self.current_payment_method == "crypto" and not self.wallet_connected:
             await self.connect_wallet()
-            return "Please connect your wallet first. I've opened the connection popup for you."
+            return self._text("connect_wallet_first")
+        
+        # Only pay for what the UI has actually selected; late failures still reconcile selected_fees
+        if not await self.actions.flush(timeout=PAYMENT_FLUSH_TIMEOUT) and not self.selected_fees:
+            return self._text("select_fee_first")
         
-        await self._send_action("INITIATE_PAYMENT", {
+        self._send_action("INITIATE_PAYMENT", {
             "feeIds": self.selected_fees,
             "method": self.current_payment_method
         })
@@ -215,26 +330,45 @@ class BillDeskFunctions:
         total = sum(f["total"] for f in FEE_STRUCTURE if f["id"] in self.selected_fees)
         
         if self.current_payment_method == "crypto":
-            return f"I'm initiating the payment of ₹{total:,} using Sepolia ETH. Please confirm the transaction in your wallet when the popup appears."
+            return self._text("paying_crypto", total=f"₹{total:,}")
         else:
-            return f"I'm initiating the payment of ₹{total:,} using {self.current_payment_method.upper()}. Please follow the instructions on screen."
+            return self._text("paying_other", total=f"₹{total:,}", method=self.current_payment_method.upper())
     
     def get_total_selected(self) -> str:
         """Get total amount of selected fees"""
         if not self.selected_fees:
-            return "You haven't selected any fees yet. Would you like me to help you select some fees to pay?"
+            return self._text("no_fees_selected")
         
         selected = [f for f in FEE_STRUCTURE if f["id"] in self.selected_fees]
         total = sum(f["total"] for f in selected)
         fee_names = ", ".join([f["name"] for f in selected])
         
-        return f"You have selected {len(selected)} fees: {fee_names}. The total amount is ₹{total:,}."
+        return self._text("selected_total", count=len(selected), fees=fee_names, total=f"₹{total:,}")
     
     def set_wallet_connected(self, connected: bool):
         """Update wallet connection status (called from frontend)"""
         self.wallet_connected = connected
 
 
+def _describe_payment(payment: PaymentRecord, language: str = "en") -> str:
+    names = [f["name"] for f in FEE_STRUCTURE if f["id"] in payment.fee_ids] or ["fees"]
+    method = PAYMENT_METHOD_NAMES.get(payment.method, payment.method)
+    # A failed payment gets its own sentence rather than "You paid ..." followed by a correction
+    parts = [text(
+        "payment_failed" if payment.status == "failed" else "paid_on", language,
+        fees=text("and", language).join(names), amount=f"₹{payment.amount:,.0f}",
+        date=f"{payment.created_at:%d %B %Y}", method=method,
+    )]
+    if payment.status not in ("completed", "failed"):
+        parts.append(text("payment_status", language, status=payment.status.replace('_', ' ')))
+    if payment.receipt_id:
+        if payment.method == "crypto":
+            parts.append(text("tx_hash", language, suffix=payment.receipt_id[-6:]))
+        else:
+            parts.append(text("receipt", language, receipt=payment.receipt_id))
+    return " ".join(parts)
+
+
 # Function definitions for Gemini function calling
 FUNCTION_DEFINITIONS = [
     {
@@ -261,6 +395,20 @@ FUNCTION_DEFINITIONS = [
         "description": "Get list of fees that have already been paid by the student",
         "parameters": {"type": "object", "properties": {}, "required": []}
     },
+    {
+        "name": "get_payment_history",
+        "description": "Look up when the student paid their fees, the amount, payment method and receipt or transaction id",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "fee_name": {
+                    "type": "string",
+                    "description": "Optional fee to look up (tuition, hostel, development, examination); omit for the latest payments"
+                }
+            },
+            "required": []
+        }
+    },
     {
         "name": "select_fee",
         "description": "Select a specific fee for payment by clicking its checkbox in the UI",
@@ -324,3 +472,13 @@ FUNCTION_DEFINITIONS = [
         "parameters": {"type": "object", "properties": {}, "required": []}
     }
 ]
+
+
+def build_tools(functions: BillDeskFunctions) -> list:
+    """Expose FUNCTION_DEFINITIONS as LLM tools bound to a BillDeskFunctions instance"""
+    def make_tool(definition: dict):
+        async def handler(raw_arguments: dict[str, object], context: RunContext):
+            return await functions.call(definition["name"], raw_arguments)
+        return function_tool(handler, raw_schema=definition)
+    
+    return [make_tool(d) for d in FUNCTION_DEFINITIONS]
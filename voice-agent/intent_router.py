@@ -0,0 +1,245 @@
+"""
+BEC BillDesk Voice Agent - Local Intent Router
+
+Handles common, unambiguous commands ("select all fees", "pay with UPI",
+"deselect hostel", "what's my total") without a Cerebras round trip.
+Commands that change the selection or payment only match in imperative
+form, one fee at a time; questions, negations and anything mentioning a
+deselect verb alongside a select command fall through.
+The grammar is built from FUNCTION_DEFINITIONS, the fee catalog and the
+payment method aliases; fee and method names are fuzzy-matched so small
+STT errors ("hostal", "net banking") still resolve.
+
+Only matches above CONFIDENCE_THRESHOLD are routed; everything else falls
+through to the LLM. An optional classifier (any object with
+predict(text) -> (function_name, arguments, confidence)) can be plugged in
+for utterances the grammar doesn't cover.
+
+Evaluate against recorded sessions with:
+python intent_router.py recording.zip [recording.zip ...]
+"""
+
+import difflib
+import re
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+from functions import FEE_STRUCTURE, FUNCTION_DEFINITIONS, PAYMENT_METHOD_ALIASES
+
+CONFIDENCE_THRESHOLD = 0.85
+FUZZY_CUTOFF = 0.8
+
+# Start of an imperative ("select ...", "please select ...", "can you select ...");
+# commands must start this way, so questions and statements that merely
+# mention a command ("are all my fees paid", "I already paid the hostel fee") go to the LLM
+_DO = r"^((please|ok|okay|so|now|and|then|can you|could you|i want to|i'd like to|i would like to|let's|lets|i'll|i will) )*"
+
+# The selection total, not a question about what is owed ("what is the total pending amount",
+# "what's the total of all my fees" are left to the pending-fee lookup or the LLM)
+_SELECTION = r"^(?!.*\b(pending|due|outstanding|owe|fees?)\b)"
+
+# Trigger phrases per function; {fee} / {method} mark a required slot
+GRAMMAR = {
+    # Before the selection rules, which would read "when did I pay the hostel fee" as a command
+    "get_payment_history": [r"\b(when did i pay|receipt (id|number))\b.*{fee}", r"\bwhen did i pay\b", r"\breceipt (id|number)\b"],
+    "deselect_fee": [_DO + r"(deselect|unselect|remove|uncheck|drop)\b.*{fee}"],
+    "select_all_fees": [_DO + r"(select|choose|pay|add) (all|every|everything)\b"],
+    "select_fee": [_DO + r"(select|choose|pick|add)\b.*{fee}", _DO + r"pay (the |my |for )*{fee}"],
+    "select_payment_method": [_DO + r"(pay|paying) (with|via|using|by)\b.*{method}", _DO + r"(switch|change) to\b.*{method}", _DO + r"use\b.*{method}"],
+    "get_total_selected": [_SELECTION + r".*\b(what'?s|what is|tell me) (my |the )?total\b", _SELECTION + r".*\btotal (selected|amount)\b"],
+    "get_pending_fees": [r"\b(pending|due|outstanding) fees\b", r"\bwhat (do|fees do) i (owe|have to pay)\b"],
+    "get_fee_details": [r"\b(details|breakdown)\b.*{fee}"],
+    "get_paid_fees": [r"\b(paid|already paid) fees\b", r"\bwhat (have|did) i (already )?(paid|pay)\b"],
+    "connect_wallet": [_DO + r"connect (my |the )?(wallet|metamask)\b"],
+    "initiate_payment": [_DO + r"(make|start|complete) (the )?payment\b", _DO + r"pay now\b", _DO + r"proceed to pay(ment)?\b"],
+}
+
+# Commands that change the selection or payment, as opposed to lookups
+ACTIONS = {"deselect_fee", "select_all_fees", "select_fee", "select_payment_method", "connect_wallet", "initiate_payment"}
+_DESELECT = re.compile(r"\b(deselect|unselect|remove|uncheck|drop|cancel|undo)\b")
+
+# Short spoken names not derivable from the catalog
+SHORT_FEE_NAMES = {"exam": "examination", "exams": "examination", "dev": "development"}
+
+# Phrases that make a command ambiguous enough to leave to the LLM
+_HEDGES = re.compile(r"\b(how|why|should|can you explain|what if|don'?t|didn'?t|haven'?t|not|never)\b")
+
+
+@dataclass
+class IntentMatch:
+    name: str
+    arguments: dict
+    confidence: float
+    source: str = "grammar"
+
+
+@dataclass
+class RouterStats:
+    routed: int = 0
+    fallthrough: int = 0
+    latencies_ms: list[float] = field(default_factory=list)
+    by_intent: dict[str, int] = field(default_factory=dict)
+
+    def summary(self) -> dict:
+        latencies = sorted(self.latencies_ms)
+        total = self.routed + self.fallthrough
+        return {
+            "utterances": total,
+            "routed": self.routed,
+            "route_rate": self.routed / total if total else 0.0,
+            "p50_ms": latencies[len(latencies) // 2] if latencies else 0.0,
+            "p99_ms": latencies[int(len(latencies) * 0.99)] if latencies else 0.0,
+            "by_intent": dict(self.by_intent),
+        }
+
+
+def _fee_vocabulary() -> dict[str, str]:
+    vocab = {}
+    for fee in FEE_STRUCTURE:
+        vocab[fee["id"]] = fee["id"]
+        vocab[fee["name"].lower()] = fee["id"]
+        vocab[fee["name"].lower().replace(" fee", "")] = fee["id"]
+    vocab.update(SHORT_FEE_NAMES)
+    return vocab
+
+
+class IntentRouter:
+    """Keyword/fuzzy grammar over BillDeskFunctions"""
+
+    def __init__(self, classifier=None, threshold: float = CONFIDENCE_THRESHOLD):
+        known = {d["name"] for d in FUNCTION_DEFINITIONS}
+        self.grammar = {name: patterns for name, patterns in GRAMMAR.items() if name in known}
+        self.fees = _fee_vocabulary()
+        self.methods = dict(PAYMENT_METHOD_ALIASES)
+        self.classifier = classifier
+        self.threshold = threshold
+        self.stats = RouterStats()
+
+    def _find_slot(self, words: list[str], vocab: dict[str, str]) -> Optional[tuple[str, float]]:
+        """Find a vocabulary entry in the utterance; returns (value, confidence)"""
+        text = " ".join(words)
+        for phrase in sorted(vocab, key=len, reverse=True):
+            if re.search(rf"\b{re.escape(phrase)}\b", text):
+                return vocab[phrase], 1.0
+        # Fuzzy single/double word match for STT slips
+        candidates = words + [f"{a}{b}" for a, b in zip(words, words[1:])]
+        best = None
+        for candidate in candidates:
+            for phrase in difflib.get_close_matches(candidate, vocab, n=1, cutoff=FUZZY_CUTOFF):
+                ratio = difflib.SequenceMatcher(None, candidate, phrase).ratio()
+                if best is None or ratio > best[1]:
+                    best = (vocab[phrase], ratio)
+        # A near miss is still much better evidence than no slot at all
+        return (best[0], (1 + best[1]) / 2) if best else None
+
+    def _fee_mentions(self, text: str) -> set[str]:
+        """Distinct fees named outright in the utterance"""
+        return {fee for phrase, fee in self.fees.items() if re.search(rf"\b{re.escape(phrase)}\b", text)}
+
+    def _match_grammar(self, text: str) -> Optional[IntentMatch]:
+        words = re.findall(r"[a-z']+", text)
+        normalized = " ".join(words)
+        has_fee = self._find_slot(words, self.fees) is not None
+        has_method = self._find_slot(words, self.methods) is not None
+        fees = self._fee_mentions(normalized)
+        deselecting = _DESELECT.search(normalized) is not None
+        for name, patterns in self.grammar.items():
+            if name in ACTIONS and deselecting and name != "deselect_fee":
+                continue
+            # One fee per command; "select tuition and hostel" is left to the LLM
+            if name in ("select_fee", "deselect_fee") and len(fees) > 1:
+                continue
+            for pattern in patterns:
+                arguments, confidence = {}, 0.95
+                if "{fee}" in pattern or "{method}" in pattern:
+                    slot, vocab, arg = ("{fee}", self.fees, "fee_name") if "{fee}" in pattern else ("{method}", self.methods, "method")
+                    found = self._find_slot(words, vocab)
+                    if found is None:
+                        continue
+                    value, slot_confidence = found
+                    pattern = pattern.replace(slot, "")
+                    arguments[arg] = value
+                    confidence *= slot_confidence
+                if re.search(pattern, normalized):
+                    # Compound commands ("pay all fees with UPI") are left to the LLM
+                    if has_method and name not in ("select_payment_method", "connect_wallet"):
+                        return None
+                    if has_fee and name == "select_payment_method":
+                        return None
+                    return IntentMatch(name, arguments, confidence)
+        return None
+
+    def classify(self, text: str) -> Optional[str]:
+        """Grammar intent of an utterance, ignoring hedges and the threshold (not counted in stats)"""
+        match = self._match_grammar(text.lower().strip())
+        return match.name if match else None
+
+    def route(self, text: str) -> Optional[IntentMatch]:
+        """Return a match to execute locally, or None to fall through to the LLM"""
+        started = time.perf_counter()
+        text = text.lower().strip()
+        match = None
+        if text and not _HEDGES.search(text):
+            match = self._match_grammar(text)
+            if match is None and self.classifier is not None:
+                name, arguments, confidence = self.classifier.predict(text)
+                if name:
+                    match = IntentMatch(name, arguments, confidence, source="classifier")
+        if match is not None and match.confidence < self.threshold:
+            match = None
+
+        self.stats.latencies_ms.append((time.perf_counter() - started) * 1000)
+        if match is None:
+            self.stats.fallthrough += 1
+        else:
+            self.stats.routed += 1
+            self.stats.by_intent[match.name] = self.stats.by_intent.get(match.name, 0) + 1
+        return match
+
+
+def evaluate(router: IntentRouter, labelled: list[tuple[str, Optional[str]]]) -> dict:
+    """Precision/recall of routed intents against labels (the LLM's tool call, or None)"""
+    true_positive = false_positive = missed = 0
+    for text, expected in labelled:
+        match = router.route(text)
+        if match is None:
+            missed += expected is not None
+        elif match.name == expected:
+            true_positive += 1
+        else:
+            false_positive += 1
+    routed = true_positive + false_positive
+    labelled_calls = sum(1 for _, expected in labelled if expected)
+    return {
+        "precision": true_positive / routed if routed else 1.0,
+        "recall": true_positive / labelled_calls if labelled_calls else 0.0,
+        "routed": routed,
+        "false_positives": false_positive,
+        "missed": missed,
+        **router.stats.summary(),
+    }
+
+
+def _labels_from_recordings(paths: list[str]) -> list[tuple[str, Optional[str]]]:
+    from recorder import load_recording
+
+    labelled = []
+    for path in paths:
+        events, _ = load_recording(path)
+        for event in events:
+            if event["kind"] == "transcript":
+                labelled.append([event["text"], None])
+            elif event["kind"] == "tool_call" and labelled and labelled[-1][1] is None:
+                labelled[-1][1] = event["name"]
+    return [tuple(pair) for pair in labelled]
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python intent_router.py <recording.zip> [...]")
+        sys.exit(1)
+    result = evaluate(IntentRouter(), _labels_from_recordings(sys.argv[1:]))
+    for key, value in result.items():
+        print(f"{key}: {value:.3f}" if isinstance(value, float) else f"{key}: {value}")
@@ -0,0 +1,495 @@
+"""
+BEC BillDesk Voice Agent - Languages
+
+ARIA speaks English, Hindi and Kannada. Each language has its own STT,
+TTS and prompt configuration (LANGUAGES), and everything ARIA says
+verbatim - BillDeskFunctions replies, fixed replies, the offer to go on -
+comes from the message catalog below, so a language is added in one place.
+
+A session's language comes from "language" in the room metadata when the
+web app knows it (e.g. "hi", "kn-IN", "Kannada"), and is English
+otherwise, so a session normally starts on the regular English STT
+(with its local fallback and the experiment arm's model). Only when the
+metadata asks for "auto" (or LANGUAGE_DETECTION=1) is the first utterance
+transcribed with Deepgram's multilingual model and the language taken
+from its script (Devanagari, Kannada) or the language Deepgram reports.
+A student can also switch at any time with a short request such as
+"Kannada please" or "हिंदी में बोलो".
+
+Switching never creates a session: the session STT is a MultilingualSTT
+whose recognizers are all created up front, and it moves its audio
+stream to the selected language's recognizer. The new stream connects
+while ARIA answers the request, before the student speaks again. The
+Cartesia TTS is updated in place, and the phrase audio of every language
+is loaded in prewarm.
+"""
+
+import asyncio
+import contextlib
+import logging
+import os
+import re
+import unicodedata
+import weakref
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+from livekit.agents import APIConnectOptions, stt, utils
+from livekit.agents.types import DEFAULT_API_CONNECT_OPTIONS, NOT_GIVEN, NotGivenOr
+
+logger = logging.getLogger("billdesk-agent")
+
+# Language of the detection turn (Deepgram code-switching model: English, Hindi and others)
+DETECT = "multi"
+# Metadata "language" asking for detection
+AUTO = "auto"
+DETECT_STT_MODEL = "nova-3"
+DEFAULT_LANGUAGE = "en"
+# Key terms are prompt tokens on Nova-3, so only the strongest boosts are sent
+MAX_KEYTERMS = 100
+# Longer utterances that mention a language are about it, not requests to switch
+MAX_REQUEST_WORDS = 6
+
+
+@dataclass(frozen=True)
+class Language:
+    code: str
+    name: str
+    stt_provider: str  # "deepgram" or "cartesia"
+    stt_language: str
+    stt_model: Optional[str] = None  # None: the experiment arm's model
+    tts_language: str = "en"
+    tts_model: Optional[str] = None  # None: the experiment arm's model
+    tts_voice: Optional[str] = None  # None: the experiment arm's voice (Cartesia voices are multilingual)
+    # Lighter quality-tier TTS models only cover English
+    degrade_tts: bool = False
+
+
+LANGUAGES = {
+    "en": Language("en", "English", "deepgram", "en", degrade_tts=True),
+    "hi": Language(
+        "hi", "Hindi", "deepgram", "hi", stt_model="nova-2",
+        tts_language="hi", tts_model="sonic-2", tts_voice=os.getenv("CARTESIA_VOICE_HI") or None,
+    ),
+    # Deepgram has no Kannada model; Cartesia's ink-whisper transcribes it
+    "kn": Language(
+        "kn", "Kannada", "cartesia", "kn", stt_model="ink-whisper",
+        tts_language="kn", tts_model="sonic-3", tts_voice=os.getenv("CARTESIA_VOICE_KN") or None,
+    ),
+}
+
+# How students name each language (requests to switch)
+_NAMES = {
+    "en": ("english", "angrezi", "अंग्रेज़ी", "अंग्रेजी", "ಇಂಗ್ಲಿಷ್"),
+    "hi": ("hindi", "हिंदी", "हिन्दी", "ಹಿಂದಿ"),
+    "kn": ("kannada", "kannad", "कन्नड़", "कन्नड", "ಕನ್ನಡ"),
+}
+
+# Unicode script of each language's letters
+_SCRIPTS = {"DEVANAGARI": "hi", "KANNADA": "kn", "LATIN": "en"}
+
+
+MESSAGES = {
+    "en": {
+        # Fixed replies (pre-synthesized)
+        "available_fees": "Available fees are: Tuition, Development, Hostel, and Examination.",
+        "payment_methods": "I support these payment methods: Crypto, UPI, Net Banking, and Cash. Which one would you prefer?",
+        "select_fee_first": "Please select at least one fee to pay first.",
+        "select_fee_before_wallet": "Please select at least one fee to pay before connecting your wallet.",
+        "connect_wallet_first": "Please connect your wallet first. I've opened the connection popup for you.",
+        "no_payment_records": "I can't look up your payment records right now, but your receipts are in the Payments window.",
+        "no_fees_selected": "You haven't selected any fees yet. Would you like me to help you select some fees to pay?",
+        "wallet_popup": "I've opened the wallet connection popup. Please connect your MetaMask or other wallet. You can also scan the QR code with a mobile wallet. Let me know once you're connected.",
+        "continue_offer": "Want me to go on?",
+        # UI actions that didn't apply
+        "notice_select_failed": "Heads up: selecting the {fee} didn't go through on screen, so it's not selected.",
+        "notice_still_selected": "Heads up: the {fee} is still selected on screen.",
+        "notice_method_failed": "Heads up: the payment method didn't change on screen, please pick it there.",
+        "notice_payment_failed": "Heads up: the payment didn't start on screen. Please click Pay to continue.",
+        # Fee lookups
+        "no_pending_fees": "Great news! You have no pending fees. All your fees have been paid.",
+        "pending_fees": "You have {count} pending fees: {fees}. The total pending amount is {total}.",
+        "reminder": "You have {count} pending fees totaling {total} due on {date}. You can pay them on BEC BillDesk.",
+        "reminder_one": "You have 1 pending fee of {total} due on {date}. You can pay it on BEC BillDesk.",
+        "fee_amount": "{fee} of {amount}",
+        "fee_details": "The {fee} is {amount} due on {due}. The breakdown is: {breakdown}.",
+        "fee_not_found": "I couldn't find a fee called '{name}'.",
+        "no_paid_fees": "You haven't paid any fees yet. Would you like to pay any pending fees?",
+        "paid_fees": "You have paid {count} fees: {fees}. The total paid amount is {total}.",
+        "selected_total": "You have selected {count} fees: {fees}. The total amount is {total}.",
+        # Payment history
+        "any_payments": "any payments",
+        "fee_payment": "a payment for the {fee}",
+        "no_payments": "I don't see {subject} on your account yet.",
+        "and": " and ",
+        "paid_on": "You paid the {fees}, {amount}, on {date} via {method}.",
+        "payment_failed": "Your payment of {amount} for the {fees} on {date} via {method} failed, so it doesn't count towards your fees.",
+        "payment_status": "It's still {status}.",
+        "tx_hash": "The transaction hash ends in {suffix}.",
+        "receipt": "Your receipt ID is {receipt}.",
+        # Selection and payment
+        "fee_selected": "I've selected the {fee} for payment. The amount is {amount}. Would you like to select any other fees or proceed to payment?",
+        "fee_deselected": "I've deselected the {fee}.",
+        "all_fees_selected": "I've selected all {count} pending fees. The total amount is {total}. How would you like to pay? You can choose Crypto, UPI, Net Banking, or Cash.",
+        "method_selected": "I've switched to {method}.",
+        "offer_wallet": "Would you like me to connect your wallet?",
+        "ready_to_proceed": "Ready to proceed when you are.",
+        "paying_crypto": "I'm initiating the payment of {total} using Sepolia ETH. Please confirm the transaction in your wallet when the popup appears.",
+        "paying_other": "I'm initiating the payment of {total} using {method}. Please follow the instructions on screen.",
+        # LLM instructions
+        "prompt": "LANGUAGE:\n- Reply in English",
+    },
+    "hi": {
+        "available_fees": "उपलब्ध फीस हैं: Tuition, Development, Hostel और Examination।",
+        "payment_methods": "मैं ये पेमेंट तरीके सपोर्ट करती हूँ: Crypto, UPI, Net Banking और Cash। आप कौन सा चुनना चाहेंगे?",
+        "select_fee_first": "कृपया पहले कम से कम एक फीस चुनें।",
+        "select_fee_before_wallet": "वॉलेट कनेक्ट करने से पहले कृपया कम से कम एक फीस चुनें।",
+        "connect_wallet_first": "कृपया पहले अपना वॉलेट कनेक्ट करें। मैंने आपके लिए कनेक्शन पॉपअप खोल दिया है।",
+        "no_payment_records": "मैं अभी आपके पेमेंट रिकॉर्ड नहीं देख पा रही हूँ, लेकिन आपकी रसीदें Payments विंडो में हैं।",
+        "no_fees_selected": "आपने अभी तक कोई फीस नहीं चुनी है। क्या मैं फीस चुनने में आपकी मदद करूँ?",
+        "wallet_popup": "मैंने वॉलेट कनेक्शन पॉपअप खोल दिया है। कृपया अपना MetaMask या कोई दूसरा वॉलेट कनेक्ट करें। आप मोबाइल वॉलेट से QR कोड भी स्कैन कर सकते हैं। कनेक्ट होने पर मुझे बताइए।",
+        "continue_offer": "क्या मैं आगे बताऊँ?",
+        "notice_select_failed": "ध्यान दें: {fee} स्क्रीन पर सिलेक्ट नहीं हो पाई, इसलिए वह चुनी नहीं गई है।",
+        "notice_still_selected": "ध्यान दें: {fee} अभी भी स्क्रीन पर चुनी हुई है।",
+        "notice_method_failed": "ध्यान दें: स्क्रीन पर पेमेंट का तरीका नहीं बदला, कृपया उसे वहीं चुनें।",
+        "notice_payment_failed": "ध्यान दें: स्क्रीन पर पेमेंट शुरू नहीं हुआ। आगे बढ़ने के लिए कृपया Pay पर क्लिक करें।",
+        "no_pending_fees": "बढ़िया खबर! आपकी कोई फीस बाकी नहीं है। आपकी सारी फीस भरी जा चुकी है।",
+        "pending_fees": "आपकी {count} फीस बाकी हैं: {fees}। कुल बाकी राशि {total} है।",
+        "reminder": "आपकी {count} फीस बाकी हैं, कुल {total}, जिनकी आखिरी तारीख {date} है। आप BEC BillDesk पर पेमेंट कर सकते हैं।",
+        "reminder_one": "आपकी एक फीस बाकी है, {total}, जिसकी आखिरी तारीख {date} है। आप BEC BillDesk पर पेमेंट कर सकते हैं।",
+        "fee_amount": "{fee} {amount}",
+        "fee_details": "{fee} {amount} है, जिसकी आखिरी तारीख {due} है। इसका ब्रेकडाउन है: {breakdown}।",
+        "fee_not_found": "मुझे '{name}' नाम की कोई फीस नहीं मिली।",
+        "no_paid_fees": "आपने अभी तक कोई फीस नहीं भरी है। क्या आप कोई बाकी फीस भरना चाहेंगे?",
+        "paid_fees": "आपने {count} फीस भरी हैं: {fees}। कुल भरी गई राशि {total} है।",
+        "selected_total": "आपने {count} फीस चुनी हैं: {fees}। कुल राशि {total} है।",
+        "any_payments": "कोई पेमेंट",
+        "fee_payment": "{fee} का कोई पेमेंट",
+        "no_payments": "मुझे आपके अकाउंट पर अभी {subject} नहीं दिख रहा।",
+        "and": " और ",
+        "paid_on": "आपने {fees} के {amount} {date} को {method} से भरे।",
+        "payment_failed": "{date} को {method} से {fees} के लिए आपका {amount} का पेमेंट फेल हो गया था, इसलिए वह आपकी फीस में नहीं गिना जाता।",
+        "payment_status": "वह अभी {status} है।",
+        "tx_hash": "ट्रांज़ैक्शन हैश के आखिरी अक्षर {suffix} हैं।",
+        "receipt": "आपकी रसीद ID {receipt} है।",
+        "fee_selected": "मैंने पेमेंट के लिए {fee} चुन ली है। राशि {amount} है। क्या आप कोई और फीस चुनना चाहेंगे या पेमेंट की ओर बढ़ें?",
+        "fee_deselected": "मैंने {fee} हटा दी है।",
+        "all_fees_selected": "मैंने सभी {count} बाकी फीस चुन ली हैं। कुल राशि {total} है। आप कैसे पेमेंट करना चाहेंगे? आप Crypto, UPI, Net Banking या Cash चुन सकते हैं।",
+        "method_selected": "मैंने {method} पर स्विच कर दिया है।",
+        "offer_wallet": "क्या मैं आपका वॉलेट कनेक्ट करूँ?",
+        "ready_to_proceed": "जब आप तैयार हों, आगे बढ़ सकते हैं।",
+        "paying_crypto": "मैं Sepolia ETH से {total} का पेमेंट शुरू कर रही हूँ। पॉपअप आने पर कृपया अपने वॉलेट में ट्रांज़ैक्शन कन्फ़र्म करें।",
+        "paying_other": "मैं {method} से {total} का पेमेंट शुरू कर रही हूँ। कृपया स्क्रीन पर दिए निर्देशों का पालन करें।",
+        "prompt": (
+            "LANGUAGE:\n"
+            "- The student is speaking Hindi. Always reply in simple, everyday Hindi written in Devanagari script\n"
+            "- Keep fee names, payment methods and technical terms (UPI, Crypto, MetaMask, Next.js) in English\n"
+            "- Tool results may already be in Hindi; pass them on naturally"
+        ),
+    },
+    "kn": {
+        "available_fees": "ಲಭ್ಯವಿರುವ ಶುಲ್ಕಗಳು: Tuition, Development, Hostel ಮತ್ತು Examination.",
+        "payment_methods": "ನಾನು ಈ ಪಾವತಿ ವಿಧಾನಗಳನ್ನು ಬೆಂಬಲಿಸುತ್ತೇನೆ: Crypto, UPI, Net Banking ಮತ್ತು Cash. ನೀವು ಯಾವುದನ್ನು ಆಯ್ಕೆ ಮಾಡುತ್ತೀರಿ?",
+        "select_fee_first": "ದಯವಿಟ್ಟು ಮೊದಲು ಕನಿಷ್ಠ ಒಂದು ಶುಲ್ಕವನ್ನು ಆಯ್ಕೆ ಮಾಡಿ.",
+        "select_fee_before_wallet": "ವಾಲೆಟ್ ಕನೆಕ್ಟ್ ಮಾಡುವ ಮೊದಲು ದಯವಿಟ್ಟು ಕನಿಷ್ಠ ಒಂದು ಶುಲ್ಕವನ್ನು ಆಯ್ಕೆ ಮಾಡಿ.",
+        "connect_wallet_first": "ದಯವಿಟ್ಟು ಮೊದಲು ನಿಮ್ಮ ವಾಲೆಟ್ ಕನೆಕ್ಟ್ ಮಾಡಿ. ನಿಮಗಾಗಿ ಕನೆಕ್ಷನ್ ಪಾಪ್‌ಅಪ್ ತೆರೆದಿದ್ದೇನೆ.",
+        "no_payment_records": "ಈಗ ನಿಮ್ಮ ಪಾವತಿ ದಾಖಲೆಗಳನ್ನು ನೋಡಲು ಆಗುತ್ತಿಲ್ಲ, ಆದರೆ ನಿಮ್ಮ ರಸೀದಿಗಳು Payments ವಿಂಡೋದಲ್ಲಿವೆ.",
+        "no_fees_selected": "ನೀವು ಇನ್ನೂ ಯಾವುದೇ ಶುಲ್ಕವನ್ನು ಆಯ್ಕೆ ಮಾಡಿಲ್ಲ. ಶುಲ್ಕಗಳನ್ನು ಆಯ್ಕೆ ಮಾಡಲು ನಾನು ಸಹಾಯ ಮಾಡಲೇ?",
+        "wallet_popup": "ವಾಲೆಟ್ ಕನೆಕ್ಷನ್ ಪಾಪ್‌ಅಪ್ ತೆರೆದಿದ್ದೇನೆ. ದಯವಿಟ್ಟು ನಿಮ್ಮ MetaMask ಅಥವಾ ಬೇರೆ ವಾಲೆಟ್ ಕನೆಕ್ಟ್ ಮಾಡಿ. ಮೊಬೈಲ್ ವಾಲೆಟ್‌ನಿಂದ QR ಕೋಡ್ ಕೂಡ ಸ್ಕ್ಯಾನ್ ಮಾಡಬಹುದು. ಕನೆಕ್ಟ್ ಆದ ಮೇಲೆ ನನಗೆ ತಿಳಿಸಿ.",
+        "continue_offer": "ಮುಂದುವರಿಸಲೇ?",
+        "notice_select_failed": "ಗಮನಿಸಿ: {fee} ಸ್ಕ್ರೀನ್‌ನಲ್ಲಿ ಆಯ್ಕೆ ಆಗಲಿಲ್ಲ, ಹಾಗಾಗಿ ಅದು ಆಯ್ಕೆಯಾಗಿಲ್ಲ.",
+        "notice_still_selected": "ಗಮನಿಸಿ: {fee} ಇನ್ನೂ ಸ್ಕ್ರೀನ್‌ನಲ್ಲಿ ಆಯ್ಕೆಯಾಗಿದೆ.",
+        "notice_method_failed": "ಗಮನಿಸಿ: ಸ್ಕ್ರೀನ್‌ನಲ್ಲಿ ಪಾವತಿ ವಿಧಾನ ಬದಲಾಗಲಿಲ್ಲ, ದಯವಿಟ್ಟು ಅಲ್ಲೇ ಆಯ್ಕೆ ಮಾಡಿ.",
+        "notice_payment_failed": "ಗಮನಿಸಿ: ಸ್ಕ್ರೀನ್‌ನಲ್ಲಿ ಪಾವತಿ ಪ್ರಾರಂಭವಾಗಲಿಲ್ಲ. ಮುಂದುವರಿಯಲು ದಯವಿಟ್ಟು Pay ಕ್ಲಿಕ್ ಮಾಡಿ.",
+        "no_pending_fees": "ಒಳ್ಳೆಯ ಸುದ್ದಿ! ನಿಮಗೆ ಯಾವುದೇ ಬಾಕಿ ಶುಲ್ಕವಿಲ್ಲ. ನಿಮ್ಮ ಎಲ್ಲಾ ಶುಲ್ಕಗಳನ್ನು ಪಾವತಿಸಲಾಗಿದೆ.",
+        "pending_fees": "ನಿಮಗೆ {count} ಬಾಕಿ ಶುಲ್ಕಗಳಿವೆ: {fees}. ಒಟ್ಟು ಬಾಕಿ ಮೊತ್ತ {total}.",
+        "reminder": "ನಿಮಗೆ {count} ಬಾಕಿ ಶುಲ್ಕಗಳಿವೆ, ಒಟ್ಟು {total}, ಕೊನೆಯ ದಿನಾಂಕ {date}. BEC BillDesk ನಲ್ಲಿ ಪಾವತಿಸಬಹುದು.",
+        "reminder_one": "ನಿಮಗೆ ಒಂದು ಬಾಕಿ ಶುಲ್ಕವಿದೆ, {total}, ಕೊನೆಯ ದಿನಾಂಕ {date}. BEC BillDesk ನಲ್ಲಿ ಪಾವತಿಸಬಹುದು.",
+        "fee_amount": "{fee} {amount}",
+        "fee_details": "{fee} {amount}, ಕೊನೆಯ ದಿನಾಂಕ {due}. ಇದರ ವಿವರ: {breakdown}.",
+        "fee_not_found": "'{name}' ಎಂಬ ಶುಲ್ಕ ನನಗೆ ಸಿಗಲಿಲ್ಲ.",
+        "no_paid_fees": "ನೀವು ಇನ್ನೂ ಯಾವುದೇ ಶುಲ್ಕ ಪಾವತಿಸಿಲ್ಲ. ಬಾಕಿ ಶುಲ್ಕವನ್ನು ಪಾವತಿಸಲು ಬಯಸುತ್ತೀರಾ?",
+        "paid_fees": "ನೀವು {count} ಶುಲ್ಕಗಳನ್ನು ಪಾವತಿಸಿದ್ದೀರಿ: {fees}. ಒಟ್ಟು ಪಾವತಿಸಿದ ಮೊತ್ತ {total}.",
+        "selected_total": "ನೀವು {count} ಶುಲ್ಕಗಳನ್ನು ಆಯ್ಕೆ ಮಾಡಿದ್ದೀರಿ: {fees}. ಒಟ್ಟು ಮೊತ್ತ {total}.",
+        "any_payments": "ಯಾವುದೇ ಪಾವತಿ",
+        "fee_payment": "{fee} ಪಾವತಿ",
+        "no_payments": "ನಿಮ್ಮ ಖಾತೆಯಲ್ಲಿ ಇನ್ನೂ {subject} ಕಾಣುತ್ತಿಲ್ಲ.",
+        "and": " ಮತ್ತು ",
+        "paid_on": "ನೀವು {fees} {amount} ಅನ್ನು {date} ರಂದು {method} ಮೂಲಕ ಪಾವತಿಸಿದ್ದೀರಿ.",
+        "payment_failed": "{date} ರಂದು {method} ಮೂಲಕ {fees} ಗಾಗಿ ನೀವು ಮಾಡಿದ {amount} ಪಾವತಿ ವಿಫಲವಾಗಿದೆ, ಹಾಗಾಗಿ ಅದನ್ನು ನಿಮ್ಮ ಶುಲ್ಕಕ್ಕೆ ಲೆಕ್ಕಿಸಲಾಗುವುದಿಲ್ಲ.",
+        "payment_status": "ಅದು ಇನ್ನೂ {status} ಸ್ಥಿತಿಯಲ್ಲಿದೆ.",
+        "tx_hash": "ಟ್ರಾನ್ಸಾಕ್ಷನ್ ಹ್ಯಾಶ್ {suffix} ನಲ್ಲಿ ಕೊನೆಗೊಳ್ಳುತ್ತದೆ.",
+        "receipt": "ನಿಮ್ಮ ರಸೀದಿ ID {receipt}.",
+        "fee_selected": "ಪಾವತಿಗಾಗಿ {fee} ಆಯ್ಕೆ ಮಾಡಿದ್ದೇನೆ. ಮೊತ್ತ {amount}. ಬೇರೆ ಶುಲ್ಕಗಳನ್ನು ಆಯ್ಕೆ ಮಾಡುತ್ತೀರಾ ಅಥವಾ ಪಾವತಿಗೆ ಮುಂದುವರಿಯೋಣವೇ?",
+        "fee_deselected": "{fee} ಆಯ್ಕೆಯನ್ನು ತೆಗೆದಿದ್ದೇನೆ.",
+        "all_fees_selected": "ಎಲ್ಲಾ {count} ಬಾಕಿ ಶುಲ್ಕಗಳನ್ನು ಆಯ್ಕೆ ಮಾಡಿದ್ದೇನೆ. ಒಟ್ಟು ಮೊತ್ತ {total}. ನೀವು ಹೇಗೆ ಪಾವತಿಸಲು ಬಯಸುತ್ತೀರಿ? Crypto, UPI, Net Banking ಅಥವಾ Cash ಆಯ್ಕೆ ಮಾಡಬಹುದು.",
+        "method_selected": "ಪಾವತಿ ವಿಧಾನವನ್ನು {method} ಗೆ ಬದಲಾಯಿಸಿದ್ದೇನೆ.",
+        "offer_wallet": "ನಿಮ್ಮ ವಾಲೆಟ್ ಕನೆಕ್ಟ್ ಮಾಡಲೇ?",
+        "ready_to_proceed": "ನೀವು ಸಿದ್ಧವಾದಾಗ ಮುಂದುವರಿಯಬಹುದು.",
+        "paying_crypto": "Sepolia ETH ಮೂಲಕ {total} ಪಾವತಿಯನ್ನು ಪ್ರಾರಂಭಿಸುತ್ತಿದ್ದೇನೆ. ಪಾಪ್‌ಅಪ್ ಬಂದಾಗ ದಯವಿಟ್ಟು ನಿಮ್ಮ ವಾಲೆಟ್‌ನಲ್ಲಿ ಟ್ರಾನ್ಸಾಕ್ಷನ್ ದೃಢೀಕರಿಸಿ.",
+        "paying_other": "{method} ಮೂಲಕ {total} ಪಾವತಿಯನ್ನು ಪ್ರಾರಂಭಿಸುತ್ತಿದ್ದೇನೆ. ದಯವಿಟ್ಟು ಸ್ಕ್ರೀನ್‌ನಲ್ಲಿರುವ ಸೂಚನೆಗಳನ್ನು ಅನುಸರಿಸಿ.",
+        "prompt": (
+            "LANGUAGE:\n"
+            "- The student is speaking Kannada. Always reply in simple, everyday Kannada written in Kannada script\n"
+            "- Keep fee names, payment methods and technical terms (UPI, Crypto, MetaMask, Next.js) in English\n"
+            "- Tool results may already be in Kannada; pass them on naturally"
+        ),
+    },
+}
+
+# Before the language is known (detection turn)
+DETECTING_PROMPT = (
+    "LANGUAGE:\n"
+    "- Students may speak English, Hindi or Kannada. Reply in the language of the student's last message\n"
+    "- The greeting is in English; mention once that they can also talk to you in Hindi or Kannada"
+)
+
+
+def text(key: str, language: Optional[str] = DEFAULT_LANGUAGE, **values) -> str:
+    """A catalog message in the given language (English when it has no translation)"""
+    messages = MESSAGES.get(language or DEFAULT_LANGUAGE, MESSAGES[DEFAULT_LANGUAGE])
+    template = messages.get(key) or MESSAGES[DEFAULT_LANGUAGE][key]
+    return template.format(**values) if values else template
+
+
+def prompt_instructions(language: Optional[str]) -> str:
+    """System prompt section for a session language (None while detecting)"""
+    return DETECTING_PROMPT if language is None else text("prompt", language)
+
+
+def normalize(value) -> Optional[str]:
+    """A supported language code from a code or name ("kn-IN", "Hindi"), else None"""
+    if not isinstance(value, str) or not value.strip():
+        return None
+    value = value.strip().lower()
+    code = value.replace("_", "-").split("-")[0]
+    if code in LANGUAGES:
+        return code
+    return next((code for code, names in _NAMES.items() if value in names), None)
+
+
+def detection_enabled() -> bool:
+    """Whether sessions without a language detect it (instead of starting in English)"""
+    return os.getenv("LANGUAGE_DETECTION", "0").lower() in ("1", "true", "yes", "on")
+
+
+def session_language(student_data: dict) -> Optional[str]:
+    """The session's language from the room metadata; None means detect it from the first utterance"""
+    requested = student_data.get('language')
+    if isinstance(requested, str) and requested.strip().lower() == AUTO:
+        return None
+    language = normalize(requested)
+    if language is None and requested:
+        logger.warning("Unsupported session language %r, using English", requested)
+        return DEFAULT_LANGUAGE
+    if language is None and detection_enabled():
+        return None
+    return language or DEFAULT_LANGUAGE
+
+
+def _words(text: str) -> list[str]:
+    # Split on spaces and punctuation only: Indic vowel signs aren't word characters to re
+    return re.findall(r"[^\s\d.,!?।:;'\"()-]+", text.lower())
+
+
+def requested_language(text: str) -> Optional[str]:
+    """The language a short utterance asks for ("Kannada please", "हिंदी में बोलो")"""
+    words = _words(text)
+    if not words or len(words) > MAX_REQUEST_WORDS:
+        return None
+    # Prefixes, so inflected forms count too ("ಕನ್ನಡದಲ್ಲಿ", "kannadalli")
+    requested = {code for code, names in _NAMES.items() if any(word.startswith(names) for word in words)}
+    return requested.pop() if len(requested) == 1 else None
+
+
+def script_language(text: str) -> Optional[str]:
+    """The language of the script most of the letters are written in"""
+    counts: dict[str, int] = {}
+    for char in text:
+        if char.isalpha():
+            script = unicodedata.name(char, "").split(" ")[0]
+            if script in _SCRIPTS:
+                counts[_SCRIPTS[script]] = counts.get(_SCRIPTS[script], 0) + 1
+    if not counts:
+        return None
+    language, count = max(counts.items(), key=lambda item: item[1])
+    return language if count * 2 > sum(counts.values()) else None
+
+
+def detect_language(text: str, reported: Optional[str] = None) -> Optional[str]:
+    """Language of a first utterance: an explicit request, then its script, then the STT's guess"""
+    detected = requested_language(text)
+    if detected is None:
+        detected = script_language(text)
+    if detected in (None, DEFAULT_LANGUAGE):
+        # Romanized Hindi is Latin script; the multilingual model still tags it
+        detected = normalize(reported) or detected
+    return detected
+
+
+@dataclass
+class LanguageSelector:
+    """Decides when a session switches language"""
+
+    current: Optional[str] = None  # None while detecting
+    switches: list[tuple[Optional[str], str]] = field(default_factory=list)
+
+    @property
+    def detecting(self) -> bool:
+        return self.current is None
+
+    def observe(self, text: str, reported: Optional[str] = None) -> Optional[str]:
+        """The language to switch to after a student utterance, if any"""
+        if self.detecting:
+            if not _words(text):
+                return None  # noise; detect on the next utterance
+            target = detect_language(text, reported) or DEFAULT_LANGUAGE
+        else:
+            target = requested_language(text)
+        return target if target is not None and self.select(target) else None
+
+    def select(self, language: str) -> bool:
+        """Make a language current; False if it already was"""
+        if language == self.current:
+            return False
+        self.switches.append((self.current, language))
+        self.current = language
+        return True
+
+    def summary(self) -> dict:
+        return {"language": self.current or DETECT, "switches": [f"{a or DETECT}->{b}" for a, b in self.switches]}
+
+
+def deepgram_keywords(model: str, keywords: list[tuple[str, float]]) -> dict:
+    """Keyword boosting options for a Deepgram model (Nova-3 takes key terms instead of keywords)"""
+    if model.startswith("nova-3"):
+        return {"keyterm": [term for term, _ in keywords[:MAX_KEYTERMS]]}
+    return {"keywords": keywords}
+
+
+# Builds the STT of one language from the session's keywords
+STTFactory = Callable[[list[tuple[str, float]]], stt.STT]
+
+
+class MultilingualSTT(stt.STT):
+    """Session STT that sends the audio to the recognizer of the selected language
+
+    Every language's recognizer is created (and prewarmed) with the
+    session, so a switch only opens a stream on an existing client.
+    """
+
+    def __init__(self, factories: dict[str, STTFactory], language: str, keywords: list[tuple[str, float]]):
+        super().__init__(capabilities=stt.STTCapabilities(streaming=True, interim_results=True))
+        self._streams: weakref.WeakSet = weakref.WeakSet()
+        self._instances: dict[str, stt.STT] = {}
+        for code, factory in factories.items():
+            instance = factory(keywords)
+            # The session (metrics, quota, error handling) listens to this STT
+            instance.on("metrics_collected", lambda *args, **kwargs: self.emit("metrics_collected", *args, **kwargs))
+            instance.on("error", lambda *args, **kwargs: self.emit("error", *args, **kwargs))
+            instance.prewarm()
+            self._instances[code] = instance
+        self.language = language
+
+    def instance(self, language: str) -> stt.STT:
+        return self._instances[language]
+
+    @property
+    def wrapped_stt(self) -> stt.STT:
+        return self.instance(self.language)
+
+    @property
+    def model(self) -> str:
+        return self.wrapped_stt.model
+
+    @property
+    def provider(self) -> str:
+        return self.wrapped_stt.provider
+
+    def select(self, language: str):
+        """Move open streams to another language's recognizer"""
+        if language == self.language:
+            return
+        self.language = language
+        for stream in list(self._streams):
+            stream.switch(self.wrapped_stt)
+
+    async def _recognize_impl(
+        self,
+        buffer: utils.AudioBuffer,
+        *,
+        language: NotGivenOr[str] = NOT_GIVEN,
+        conn_options: APIConnectOptions = DEFAULT_API_CONNECT_OPTIONS,
+    ) -> stt.SpeechEvent:
+        return await self.wrapped_stt.recognize(buffer=buffer, language=language, conn_options=conn_options)
+
+    def stream(
+        self,
+        *,
+        language: NotGivenOr[str] = NOT_GIVEN,
+        conn_options: APIConnectOptions = DEFAULT_API_CONNECT_OPTIONS,
+    ) -> "_SwitchingStream":
+        stream = _SwitchingStream(self, conn_options=conn_options)
+        self._streams.add(stream)
+        return stream
+
+    async def aclose(self):
+        for instance in self._instances.values():
+            await instance.aclose()
+
+
+class _SwitchingStream(stt.RecognizeStream):
+    """Forwards audio to the current recognizer's stream; a switch starts a new one"""
+
+    def __init__(self, multilingual: MultilingualSTT, *, conn_options: APIConnectOptions):
+        # Retries happen in the recognizers' own streams
+        super().__init__(stt=multilingual, conn_options=APIConnectOptions(max_retry=0, timeout=conn_options.timeout))
+        self._inner_conn_options = conn_options
+        self._inner: Optional[stt.RecognizeStream] = None
+        self._forwarders: set[asyncio.Task] = set()
+
+    async def _metrics_monitor_task(self, event_aiter):
+        # Recognizers report their own metrics
+        async for _ in event_aiter:
+            pass
+
+    def switch(self, recognizer: stt.STT):
+        previous = self._inner
+        if previous is None:
+            return  # not started yet; _run opens the current recognizer
+        self._inner = recognizer.stream(conn_options=self._inner_conn_options)
+        self._forwarders.add(asyncio.create_task(self._forward_events(self._inner)))
+        if previous is not None:
+            # Switches happen between turns; the old stream finishes whatever it was transcribing
+            with contextlib.suppress(RuntimeError):  # already ended (e.g. it failed)
+                previous.end_input()
+
+    async def _forward_events(self, inner: stt.RecognizeStream):
+        try:
+            async for event in inner:
+                self._event_ch.send_nowait(event)
+        finally:
+            await inner.aclose()
+
+    async def _forward_input(self):
+        async for item in self._input_ch:
+            if isinstance(item, self._FlushSentinel):
+                self._inner.flush()
+            else:
+                self._inner.push_frame(item)
+        self._inner.end_input()
+
+    async def _run(self):
+        self._inner = self._stt.wrapped_stt.stream(conn_options=self._inner_conn_options)
+        self._forwarders.add(asyncio.create_task(self._forward_events(self._inner)))
+        forward_input = asyncio.create_task(self._forward_input())
+        try:
+            pending = {forward_input}
+            while pending or self._forwarders:
+                done, _ = await asyncio.wait(pending | self._forwarders, return_when=asyncio.FIRST_COMPLETED)
+                pending -= done
+                self._forwarders -= done
+                for task in done:
+                    task.result()
+        finally:
+            await utils.aio.cancel_and_wait(forward_input, *self._forwarders)
@@ -0,0 +1,456 @@
+"""
+BEC BillDesk Voice Agent - Local (CPU) Speech-to-Text
+
+Keeps ARIA listening when Deepgram is slow or unreachable:
+
+- WhisperSTT is a LiveKit STT (same interface as deepgram.STT) backed by
+  a quantized Whisper model from faster-whisper, running int8 on CPU.
+  It is non-streaming, so sessions wrap it in stt.StreamAdapter and the
+  VAD cuts the audio into utterances.
+- utterances from every session on a worker are decoded by one
+  BatchedWhisperDecoder thread: requests arriving within MAX_WAIT_MS are
+  encoded and decoded as a single batch, so concurrent sessions share
+  the CPU cost of the encoder instead of each running their own
+- the session vocabulary (vocabulary.build_keywords) is passed as
+  Whisper hotwords, the local equivalent of Deepgram keyword boosting
+
+Engine selection (per session "sttEngine" in the room metadata, else
+STT_ENGINE): "deepgram", "local", or "auto" (the default). In auto mode
+a session starts on local STT when the last Deepgram health check
+failed (checks run in the background, never on session startup), and
+otherwise runs Deepgram with local STT as the fallback the session
+switches to when Deepgram errors or times out mid-call. Without
+faster-whisper installed every engine resolves to Deepgram.
+
+LOCAL_STT_MODEL picks the model (default base.en; models are downloaded
+on first load, so prewarm loads them before any job is assigned).
+
+Benchmark against the cloud path on recorded sessions (recorder.py):
+python local_stt.py recording.zip [...] [--no-cloud] [--out segments.jsonl] [--references segments.jsonl]
+"""
+
+import argparse
+import asyncio
+import concurrent.futures
+import importlib.util
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+import numpy as np
+from livekit import rtc
+from livekit.agents import APIConnectOptions, stt, utils
+from livekit.agents.types import DEFAULT_API_CONNECT_OPTIONS, NOT_GIVEN, NotGivenOr
+
+logger = logging.getLogger("billdesk-agent")
+
+ENGINES = ("deepgram", "local", "auto")
+SAMPLE_RATE = 16000
+MAX_BATCH = 8
+MAX_WAIT_MS = 40.0
+# Utterances are short; Whisper's 30s window caps what one request can hold
+MAX_NEW_TOKENS = 128
+NO_SPEECH_THRESHOLD = 0.6
+
+HEALTH_URL = "https://api.deepgram.com/v1/projects"
+HEALTH_TIMEOUT = 2.0
+HEALTH_TTL = 30.0
+
+
+def available() -> bool:
+    """Whether faster-whisper is installed (it is an optional dependency)"""
+    return importlib.util.find_spec("faster_whisper") is not None
+
+
+def model_name() -> str:
+    return os.getenv("LOCAL_STT_MODEL", "base.en")
+
+
+def configured_engine(student_data: Optional[dict] = None) -> str:
+    """Requested engine for a session: room metadata first, then STT_ENGINE"""
+    engine = (student_data or {}).get("sttEngine") or os.getenv("STT_ENGINE", "auto")
+    if engine not in ENGINES:
+        logger.warning("Unknown STT engine %r, using auto", engine)
+        engine = "auto"
+    if engine != "deepgram" and not available():
+        if engine == "local":
+            logger.warning("Local STT requested but faster-whisper is not installed, using Deepgram")
+        return "deepgram"
+    return engine
+
+
+_health: Optional[tuple[float, bool]] = None
+_health_probe: Optional[asyncio.Task] = None
+
+
+async def deepgram_healthy(timeout: float = HEALTH_TIMEOUT) -> bool:
+    """Cheap authenticated request to Deepgram, cached for HEALTH_TTL seconds"""
+    global _health
+    if _health is not None and time.monotonic() - _health[0] < HEALTH_TTL:
+        return _health[1]
+    import aiohttp
+
+    healthy = False
+    try:
+        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=timeout)) as http:
+            async with http.get(HEALTH_URL, headers={"Authorization": f"Token {os.getenv('DEEPGRAM_API_KEY', '')}"}) as resp:
+                healthy = resp.status == 200
+                if not healthy:
+                    logger.warning("Deepgram health check: HTTP %d", resp.status)
+    except Exception as e:
+        logger.warning("Deepgram health check failed: %s", e or type(e).__name__)
+    _health = (time.monotonic(), healthy)
+    return healthy
+
+
+def deepgram_health() -> Optional[bool]:
+    """Last Deepgram health check result (None before the first), without waiting
+
+    A stale result is refreshed in the background for later sessions, so
+    session startup never waits on the probe.
+    """
+    global _health_probe
+    fresh = _health is not None and time.monotonic() - _health[0] < HEALTH_TTL
+    # (A probe left on a finished job's loop, with pooled jobs as threads, counts as done)
+    if not fresh and (_health_probe is None or _health_probe.done() or _health_probe.get_loop().is_closed()):
+        _health_probe = asyncio.get_running_loop().create_task(deepgram_healthy())
+    return _health[1] if _health is not None else None
+
+
+@dataclass
+class DecodeStats:
+    utterances: int = 0
+    batches: int = 0
+    audio_seconds: float = 0.0
+    decode_seconds: float = 0.0
+    queue_ms: list[float] = field(default_factory=list)
+    max_samples: int = 10_000
+
+    def add(self, audio_seconds: list[float], queue_ms: list[float], decode_seconds: float):
+        self.utterances += len(audio_seconds)
+        self.batches += 1
+        self.audio_seconds += sum(audio_seconds)
+        self.decode_seconds += decode_seconds
+        self.queue_ms.extend(queue_ms)
+        del self.queue_ms[:-self.max_samples]
+
+    def summary(self) -> dict:
+        q = sorted(self.queue_ms)
+        return {
+            "utterances": self.utterances,
+            "batches": self.batches,
+            "avg_batch": self.utterances / self.batches if self.batches else 0.0,
+            "queue_p50_ms": q[len(q) // 2] if q else 0.0,
+            # Decode time per second of audio; below 1.0 keeps up with speech
+            "real_time_factor": self.decode_seconds / self.audio_seconds if self.audio_seconds else 0.0,
+        }
+
+
+@dataclass
+class _Request:
+    audio: np.ndarray
+    language: str
+    hotwords: Optional[str]
+    future: concurrent.futures.Future
+    submitted: float = field(default_factory=time.perf_counter)
+
+
+class BatchedWhisperDecoder:
+    """One decoding thread serving utterances from every session in the process"""
+
+    def __init__(self, model: str, max_batch: int = MAX_BATCH, max_wait_ms: float = MAX_WAIT_MS):
+        from faster_whisper import WhisperModel
+
+        started = time.perf_counter()
+        self.model_name = model
+        self._model = WhisperModel(model, device="cpu", compute_type="int8", cpu_threads=int(os.getenv("LOCAL_STT_THREADS", "0")))
+        self.multilingual = self._model.model.is_multilingual
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.stats = DecodeStats()
+        self._tokenizers: dict[str, object] = {}
+        self._requests: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="whisper-decoder", daemon=True)
+        self._thread.start()
+        logger.info("🗣️ Local STT model %s loaded in %.1fs", model, time.perf_counter() - started)
+
+    def submit(self, audio: np.ndarray, language: str = "en", hotwords: Optional[str] = None) -> concurrent.futures.Future:
+        """Queue 16 kHz mono float32 audio; the future resolves to (text, no_speech_prob)"""
+        future: concurrent.futures.Future = concurrent.futures.Future()
+        self._requests.put(_Request(audio, language, hotwords, future))
+        return future
+
+    def _tokenizer(self, language: str):
+        from faster_whisper.tokenizer import Tokenizer
+
+        if not self.multilingual:
+            language = "en"
+        if language not in self._tokenizers:
+            self._tokenizers[language] = Tokenizer(self._model.hf_tokenizer, self.multilingual, task="transcribe", language=language)
+        return self._tokenizers[language]
+
+    def _collect(self) -> list[_Request]:
+        batch = [self._requests.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._requests.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _decode(self, batch: list[_Request]) -> list[tuple[str, float]]:
+        from faster_whisper.audio import pad_or_trim
+
+        tokenizers = [self._tokenizer(r.language) for r in batch]
+        prompts = [
+            tuple(self._model.get_prompt(tokenizer, previous_tokens=[], without_timestamps=True, hotwords=r.hotwords))
+            for tokenizer, r in zip(tokenizers, batch)
+        ]
+        # Sessions have different hotwords, so prompts differ in length; rather than rely on
+        # generate() aligning them, each distinct prompt is decoded as its own sub-batch
+        groups: dict[tuple, list[int]] = {}
+        for i, prompt in enumerate(prompts):
+            groups.setdefault(prompt, []).append(i)
+        outputs: list[Optional[tuple[str, float]]] = [None] * len(batch)
+        for prompt, indices in groups.items():
+            # Every item is padded to Whisper's 30s window, so one encoder call covers the group
+            features = np.stack([pad_or_trim(self._model.feature_extractor(batch[i].audio)) for i in indices])
+            encoder_output = self._model.encode(features)
+            results = self._model.model.generate(
+                encoder_output,
+                [list(prompt)] * len(indices),
+                beam_size=1,
+                max_length=len(prompt) + MAX_NEW_TOKENS,
+                suppress_blank=True,
+                suppress_tokens=[-1],
+                return_no_speech_prob=True,
+            )
+            for i, result in zip(indices, results):
+                outputs[i] = (tokenizers[i].decode(result.sequences_ids[0]).strip(), result.no_speech_prob)
+        return outputs
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            try:
+                outputs = self._decode(batch)
+            except Exception as e:
+                for r in batch:
+                    r.future.set_exception(e)
+                continue
+            for r, output in zip(batch, outputs):
+                r.future.set_result(output)
+            self.stats.add(
+                [len(r.audio) / SAMPLE_RATE for r in batch],
+                [(started - r.submitted) * 1000 for r in batch],
+                time.perf_counter() - started,
+            )
+
+
+_decoder: Optional[BatchedWhisperDecoder] = None
+_decoder_lock = threading.Lock()
+
+
+def get_decoder() -> BatchedWhisperDecoder:
+    """The process's decoder, loading the model on first use (blocking)"""
+    global _decoder
+    with _decoder_lock:
+        if _decoder is None:
+            _decoder = BatchedWhisperDecoder(model_name())
+        return _decoder
+
+
+def decoder_stats() -> Optional[dict]:
+    return _decoder.stats.summary() if _decoder else None
+
+
+def to_model_input(buffer: utils.AudioBuffer) -> np.ndarray:
+    """Merge LiveKit frames into 16 kHz mono float32 samples"""
+    frame = rtc.combine_audio_frames(buffer)
+    if frame.sample_rate != SAMPLE_RATE:
+        resampler = rtc.AudioResampler(frame.sample_rate, SAMPLE_RATE, num_channels=frame.num_channels)
+        frame = rtc.combine_audio_frames(resampler.push(frame) + resampler.flush())
+    samples = np.frombuffer(frame.data, dtype=np.int16).reshape(-1, frame.num_channels)
+    return samples.mean(axis=1).astype(np.float32) / 32768.0
+
+
+class WhisperSTT(stt.STT):
+    """Whisper on the local CPU, decoded on the shared batched decoder"""
+
+    def __init__(self, *, language: str = "en", keywords: Optional[list[tuple[str, float]]] = None, decoder: Optional[BatchedWhisperDecoder] = None):
+        super().__init__(capabilities=stt.STTCapabilities(streaming=False, interim_results=False))
+        self._language = language
+        # Hotwords go into the decoder prompt, so only the strongest boosts fit
+        self._hotwords = ", ".join(term for term, _ in (keywords or [])[:40]) or None
+        self._decoder = decoder
+
+    @property
+    def model(self) -> str:
+        return model_name()
+
+    @property
+    def provider(self) -> str:
+        return "faster-whisper"
+
+    async def _recognize_impl(
+        self,
+        buffer: utils.AudioBuffer,
+        *,
+        language: NotGivenOr[str] = NOT_GIVEN,
+        conn_options: APIConnectOptions = DEFAULT_API_CONNECT_OPTIONS,
+    ) -> stt.SpeechEvent:
+        if self._decoder is None:
+            # Normally loaded by prewarm; otherwise the first utterance pays for it
+            self._decoder = await asyncio.to_thread(get_decoder)
+        language = language if utils.is_given(language) else self._language
+        audio = to_model_input(buffer)
+        text, no_speech = await asyncio.wrap_future(self._decoder.submit(audio, language, self._hotwords))
+        if no_speech > NO_SPEECH_THRESHOLD:
+            text = ""
+        return stt.SpeechEvent(
+            type=stt.SpeechEventType.FINAL_TRANSCRIPT,
+            alternatives=[stt.SpeechData(language=language, text=text, confidence=1.0 - no_speech)],
+        )
+
+
+# --- Benchmark ---------------------------------------------------------------
+
+
+async def _utterances(frames: list[rtc.AudioFrame]) -> list[list[rtc.AudioFrame]]:
+    """Cut audio into utterances with Silero, as StreamAdapter does live"""
+    from livekit.agents import vad as agents_vad
+    from livekit.plugins import silero
+
+    stream = silero.VAD.load().stream()
+    for frame in frames:
+        stream.push_frame(frame)
+    stream.end_input()
+    utterances = []
+    async for event in stream:
+        if event.type == agents_vad.VADEventType.END_OF_SPEECH and event.frames:
+            utterances.append(list(event.frames))
+    await stream.aclose()
+    return utterances
+
+
+async def _timed(engine: stt.STT, utterance) -> tuple[str, float]:
+    started = time.perf_counter()
+    event = await engine.recognize(utterance)
+    return event.alternatives[0].text if event.alternatives else "", time.perf_counter() - started
+
+
+def _percentile(values: list[float], p: float) -> float:
+    values = sorted(values)
+    return values[min(int(len(values) * p), len(values) - 1)] if values else 0.0
+
+
+async def benchmark(recordings: list[str], cloud: bool = True, out: Optional[str] = None, references: Optional[str] = None):
+    import aiohttp
+
+    from recorder import load_recording, recording_frames
+    from vocabulary import build_keywords, keyword_error_rate, word_error_rate
+
+    keywords = build_keywords()
+    segments = []
+    for path in recordings:
+        events, audio = load_recording(path)
+        for i, utterance in enumerate(await _utterances(recording_frames(events, audio))):
+            duration = sum(f.samples_per_channel / f.sample_rate for f in utterance)
+            segments.append({"recording": os.path.basename(path), "segment": i, "duration": round(duration, 2), "frames": utterance})
+    print(f"Utterances: {len(segments)} ({sum(s['duration'] for s in segments):.0f}s of audio) from {len(recordings)} recordings")
+    if not segments:
+        return
+
+    engines = {"local": WhisperSTT(keywords=keywords, decoder=await asyncio.to_thread(get_decoder))}
+    http = aiohttp.ClientSession() if cloud else None
+    if cloud:
+        from livekit.plugins import deepgram
+
+        engines["deepgram"] = deepgram.STT(model="nova-2", language="en", keywords=keywords, http_session=http)
+    try:
+        # Sequential: per-utterance latency as one session sees it
+        latency: dict[str, list[float]] = {name: [] for name in engines}
+        for segment in segments:
+            for name, engine in engines.items():
+                segment[name], elapsed = await _timed(engine, segment["frames"])
+                latency[name].append(elapsed)
+    finally:
+        if http:
+            await http.close()
+
+    # Concurrent: all utterances at once, as many sessions on one worker would submit them
+    decoder = get_decoder()
+    before = decoder.stats.summary()
+    started = time.perf_counter()
+    await asyncio.gather(*(_timed(engines["local"], s["frames"]) for s in segments))
+    batched_elapsed = time.perf_counter() - started
+    batches = decoder.stats.batches - before["batches"]
+
+    reference_texts = {}
+    if references:
+        with open(references, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    row = json.loads(line)
+                    if row.get("reference"):
+                        reference_texts[(row["recording"], row["segment"])] = row["reference"]
+    if reference_texts:
+        reference_name = f"references ({len(reference_texts)} segments)"
+        scored = [s for s in segments if (s["recording"], s["segment"]) in reference_texts]
+        reference_of = lambda s: reference_texts[(s["recording"], s["segment"])]
+    else:
+        # Without hand-checked references, the cloud transcript is the yardstick
+        reference_name = "deepgram"
+        scored = segments if cloud else []
+        reference_of = lambda s: s["deepgram"]
+
+    audio_seconds = sum(s["duration"] for s in segments)
+    print(f"Accuracy measured against: {reference_name if scored else 'nothing (run with cloud or --references)'}")
+    for name in engines:
+        line = (
+            f"  {name:<9} latency p50 {_percentile(latency[name], 0.5) * 1000:6.0f}ms"
+            f"  p95 {_percentile(latency[name], 0.95) * 1000:6.0f}ms"
+            f"  RTF {sum(latency[name]) / audio_seconds:5.2f}"
+        )
+        if scored and not (name == "deepgram" and reference_name == "deepgram"):
+            pairs = [(reference_of(s), s[name]) for s in scored]
+            line += f"  WER {word_error_rate(pairs):6.2%}  keyword WER {keyword_error_rate(pairs, [k for k, _ in keywords])['keyword_wer']:6.2%}"
+        print(line)
+    print(
+        f"  local batched: {len(segments)} utterances in {batched_elapsed:.1f}s "
+        f"({batches} batches, RTF {batched_elapsed / audio_seconds:.2f})"
+    )
+
+    if out:
+        with open(out, "w", encoding="utf-8") as f:
+            for s in segments:
+                row = {k: v for k, v in s.items() if k != "frames"}
+                row["reference"] = reference_texts.get((s["recording"], s["segment"]), "")
+                f.write(json.dumps(row) + "\n")
+        print(f"Segments written to {out} (fill in \"reference\" and pass it back with --references)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark local STT against Deepgram on recorded sessions")
+    parser.add_argument("recordings", nargs="+")
+    parser.add_argument("--no-cloud", action="store_true", help="skip Deepgram (local latency only, or against --references)")
+    parser.add_argument("--out", help="write per-utterance transcripts to this JSONL file")
+    parser.add_argument("--references", help="JSONL from --out with hand-checked \"reference\" transcripts")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if not args.no_cloud:
+        from dotenv import load_dotenv
+
+        load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".env.local"))
+    asyncio.run(benchmark(args.recordings, cloud=not args.no_cloud, out=args.out, references=args.references))
@@ -0,0 +1,295 @@
+"""
+BEC BillDesk Voice Agent - Per-session Memory Accounting
+
+Attributes worker memory to sessions and components so we know what an
+ARIA session costs and how many fit in a pod:
+
+- each session registers probes for the structures it owns (chat context,
+  student data, recorder events, ...) and samples them periodically
+- with MEMORY_TRACEMALLOC=1, tracemalloc snapshots also break the
+  process's Python allocations down by component (STT, TTS, LLM, VAD,
+  audio, chat context, ...) from the allocating module
+- a session over SESSION_MEMORY_BUDGET_MB runs its trim actions in order
+  (e.g. shorten the LLM chat context)
+- worker_load() reports max(CPU, RSS / WORKER_MEMORY_BUDGET_MB) to
+  LiveKit, so a worker near its memory budget stops taking new jobs
+
+At session end the report includes peak RSS and, with POD_MEMORY_MB
+set, an estimate of how many sessions fit per pod.
+"""
+
+import asyncio
+import inspect
+import logging
+import os
+import sys
+import threading
+import tracemalloc
+import types
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Optional, Union
+
+import psutil
+
+from quality_tiers import current_load
+
+logger = logging.getLogger("billdesk-agent")
+
+MB = 1024 * 1024
+SAMPLE_INTERVAL = float(os.getenv("MEMORY_SAMPLE_INTERVAL", "30"))
+TRACE_FRAMES = 8
+# Objects deep_size visits per probe; sampling runs off the event loop but still holds the GIL
+DEEP_SIZE_LIMIT = 20_000
+
+# Allocating module (path fragment) → component, first match wins
+TRACE_COMPONENTS = [
+    ("livekit/plugins/deepgram", "stt"),
+    ("local_stt.py", "stt"),
+    ("languages.py", "stt"),
+    ("faster_whisper", "stt"),
+    ("ctranslate2", "stt"),
+    ("livekit/plugins/cartesia", "tts"),
+    ("tts_cache.py", "tts_cache"),
+    ("livekit/plugins/openai", "llm"),
+    ("/openai/", "llm"),
+    ("livekit/plugins/silero", "vad"),
+    ("onnxruntime", "vad"),
+    ("audio_pool.py", "vad"),
+    ("livekit/agents/llm", "chat_context"),
+    ("livekit/rtc", "audio"),
+    ("recorder.py", "recorder"),
+    ("payment_history.py", "payment_index"),
+    ("pymongo", "payment_index"),
+    ("livekit/agents", "session"),
+]
+
+_SKIP_TYPES = (type, types.ModuleType, types.FunctionType, types.MethodType, types.BuiltinFunctionType)
+
+
+def budget_bytes(variable: str) -> Optional[int]:
+    value = os.getenv(variable)
+    return int(float(value) * MB) if value else None
+
+
+def deep_size(obj, limit: int = DEEP_SIZE_LIMIT) -> int:
+    """Approximate bytes held by an object graph (containers, __dict__, __slots__)
+
+    Runs in a worker thread while the session keeps mutating the graph, so a
+    container that changes size mid-walk is skipped rather than failing the probe.
+    """
+    seen = set()
+    stack = [obj]
+    total = 0
+    while stack and len(seen) < limit:
+        current = stack.pop()
+        if id(current) in seen or isinstance(current, _SKIP_TYPES):
+            continue
+        seen.add(id(current))
+        total += sys.getsizeof(current, 0)
+        if isinstance(current, (str, bytes, bytearray, int, float, bool)):
+            continue
+        try:
+            if isinstance(current, dict):
+                items = list(current.items())
+                stack.extend(key for key, _ in items)
+                stack.extend(value for _, value in items)
+            elif isinstance(current, (list, tuple, set, frozenset)):
+                stack.extend(list(current))
+            else:
+                if hasattr(current, "__dict__"):
+                    stack.append(vars(current))
+                for slot in getattr(type(current), "__slots__", ()):
+                    if hasattr(current, slot):
+                        stack.append(getattr(current, slot))
+        except RuntimeError:
+            continue
+    return total
+
+
+def start_tracing():
+    """Enable allocation tracing for this process if MEMORY_TRACEMALLOC=1"""
+    if os.getenv("MEMORY_TRACEMALLOC") == "1" and not tracemalloc.is_tracing():
+        tracemalloc.start(TRACE_FRAMES)
+
+
+def traced_components() -> Optional[dict[str, int]]:
+    """Current traced allocations of this process by component (None when not tracing)"""
+    if not tracemalloc.is_tracing():
+        return None
+    by_component: dict[str, int] = {}
+    for stat in tracemalloc.take_snapshot().statistics("traceback"):
+        component = "other"
+        # Most recent frame first: attribute to the innermost known module
+        for frame in reversed(stat.traceback):
+            filename = frame.filename.replace("\\", "/")
+            match = next((name for fragment, name in TRACE_COMPONENTS if fragment in filename), None)
+            if match:
+                component = match
+                break
+        by_component[component] = by_component.get(component, 0) + stat.size
+    return by_component
+
+
+def process_rss(include_children: bool = False) -> int:
+    proc = psutil.Process()
+    rss = proc.memory_info().rss
+    if include_children:
+        for child in proc.children(recursive=True):
+            try:
+                rss += child.memory_info().rss
+            except psutil.Error:
+                pass
+    return rss
+
+
+def worker_load(_server=None) -> float:
+    """Worker load for LiveKit dispatch: CPU, or memory against WORKER_MEMORY_BUDGET_MB if higher"""
+    load = current_load() / 100
+    budget = budget_bytes("WORKER_MEMORY_BUDGET_MB")
+    if budget:
+        # Job processes are children of the worker
+        load = max(load, process_rss(include_children=True) / budget)
+    return min(load, 1.0)
+
+
+TrimAction = Callable[[], Union[None, Awaitable[None]]]
+
+
+@dataclass
+class _Component:
+    probe: Callable[[], int]
+    trim: Optional[TrimAction]
+    trimmed: int = 0
+
+
+@dataclass
+class SessionMemory:
+    """Memory attributed to one session, sampled and kept within a budget"""
+
+    session_id: str
+    budget: Optional[int] = field(default_factory=lambda: budget_bytes("SESSION_MEMORY_BUDGET_MB"))
+    components: dict[str, _Component] = field(default_factory=dict)
+    last: dict[str, int] = field(default_factory=dict)
+    peak_total: int = 0
+    peak_rss: int = 0
+    baseline_rss: int = field(default_factory=process_rss)
+    traced: Optional[dict[str, int]] = None
+    _task: Optional[asyncio.Task] = None
+
+    def track(self, name: str, probe: Callable[[], int], trim: Optional[TrimAction] = None):
+        """Account `probe()` bytes to `name`; trims run in registration order when over budget"""
+        self.components[name] = _Component(probe, trim)
+
+    def measure(self) -> dict[str, int]:
+        sizes = {}
+        for name, component in self.components.items():
+            try:
+                sizes[name] = component.probe()
+            except Exception as e:
+                logger.debug("Memory probe %s failed: %s", name, e)
+        self.last = sizes
+        self.peak_total = max(self.peak_total, sum(sizes.values()))
+        self.peak_rss = max(self.peak_rss, process_rss())
+        return sizes
+
+    async def measure_off_loop(self) -> dict[str, int]:
+        """measure() in a worker thread so walking large graphs doesn't stall audio"""
+        return await asyncio.to_thread(self.measure)
+
+    @property
+    def total(self) -> int:
+        return sum(self.last.values())
+
+    async def enforce(self) -> list[str]:
+        """Run trim actions until the session is back under its budget"""
+        trimmed = []
+        if not self.budget:
+            return trimmed
+        for name, component in self.components.items():
+            if self.total <= self.budget:
+                break
+            if component.trim is None:
+                continue
+            before = self.total
+            result = component.trim()
+            if inspect.isawaitable(result):
+                await result
+            await self.measure_off_loop()
+            if self.total < before:
+                component.trimmed += 1
+                trimmed.append(name)
+                logger.warning("🧠 Session over memory budget: trimmed %s (%.1f → %.1f MB)", name, before / MB, self.total / MB)
+        if self.total > self.budget:
+            logger.warning("🧠 Session still over memory budget (%.1f MB) after trimming", self.total / MB, extra={"sample_every": 10})
+        return trimmed
+
+    async def sample(self):
+        await self.measure_off_loop()
+        self.traced = await asyncio.to_thread(traced_components) if tracemalloc.is_tracing() else None
+        await self.enforce()
+        logger.info("🧠 Session memory: %s", self.summary(), extra={"sample_every": 10})
+
+    def start(self, interval: float = SAMPLE_INTERVAL):
+        async def monitor():
+            await self.measure_off_loop()
+            while True:
+                await asyncio.sleep(interval)
+                await self.sample()
+
+        accountant.register(self)
+        self._task = asyncio.create_task(monitor())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+        await self.measure_off_loop()
+        accountant.unregister(self)
+
+    def summary(self) -> dict:
+        report = {
+            "components_mb": {name: round(size / MB, 2) for name, size in self.last.items()},
+            "attributed_mb": round(self.total / MB, 2),
+            "peak_attributed_mb": round(self.peak_total / MB, 2),
+            "rss_mb": round(process_rss() / MB, 1),
+            "peak_rss_growth_mb": round(max(self.peak_rss - self.baseline_rss, 0) / MB, 1),
+            "trims": {name: c.trimmed for name, c in self.components.items() if c.trimmed},
+        }
+        if self.traced:
+            report["traced_mb"] = {name: round(size / MB, 2) for name, size in sorted(self.traced.items())}
+        return report
+
+
+class MemoryAccountant:
+    """All sessions in this process, for the per-process report and capacity estimate"""
+
+    def __init__(self):
+        # False when jobs run as threads of one process (pooled execution mode)
+        self.process_per_session = True
+        self.sessions: dict[str, SessionMemory] = {}
+        self.peak_session = 0
+        self._lock = threading.Lock()
+
+    def register(self, session: SessionMemory):
+        with self._lock:
+            self.sessions[session.session_id] = session
+
+    def unregister(self, session: SessionMemory):
+        with self._lock:
+            self.sessions.pop(session.session_id, None)
+            if self.process_per_session:
+                # The whole job process exists for this one session
+                cost = session.peak_rss
+            else:
+                cost = max(session.peak_total, session.peak_rss - session.baseline_rss)
+            self.peak_session = max(self.peak_session, cost)
+
+    def sessions_per_pod(self) -> Optional[int]:
+        """How many sessions of the largest size seen fit in POD_MEMORY_MB"""
+        pod = budget_bytes("POD_MEMORY_MB")
+        if not pod or not self.peak_session:
+            return None
+        shared = 0 if self.process_per_session else process_rss()
+        return max(int((pod - shared) // self.peak_session), 0)
+
+
+accountant = MemoryAccountant()
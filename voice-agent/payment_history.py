@@ -0,0 +1,232 @@
+"""
+BEC BillDesk Voice Agent - Payment History Index
+
+Per-worker read-through cache of the `Payment` collection
+(database/models/Payment.ts) so ARIA can answer "when did I pay the
+hostel fee" or "what's my receipt id" without a database round trip:
+
+- a student's payments are loaded on first use (the entrypoint does this
+  while the session starts), after which answers come from memory; they
+  are evicted when the student's last session on the worker ends
+- a background thread keeps every active student fresh: through a change
+  stream when the deployment supports one (Atlas/replica sets), otherwise
+  by polling for documents with createdAt past the newest one seen, plus
+  the payments still pending verification (their status can change)
+
+Works with any pymongo-compatible collection, so a local stand-in such
+as mongomock can be used for offline runs. Enabled when MONGODB_URI is
+set and pymongo is installed.
+
+Print a student's history with: python payment_history.py <USN>
+"""
+
+import asyncio
+import importlib.util
+import logging
+import os
+import sys
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+logger = logging.getLogger("billdesk-agent")
+
+POLL_INTERVAL = 5.0
+FINAL_STATUSES = ("completed", "failed")
+
+
+@dataclass(frozen=True)
+class PaymentRecord:
+    id: str
+    usn: str
+    fee_ids: tuple[str, ...]
+    amount: float
+    method: str
+    channel: str
+    status: str
+    created_at: datetime
+    receipt_id: Optional[str]
+
+    @classmethod
+    def from_document(cls, doc: dict) -> "PaymentRecord":
+        return cls(
+            id=str(doc["_id"]),
+            usn=doc["usn"],
+            fee_ids=tuple(doc.get("feeIds") or ()),
+            amount=doc.get("amount", 0),
+            method=doc.get("paymentMethod", ""),
+            channel=doc.get("channel", "ONLINE"),
+            status=doc.get("status", "completed"),
+            created_at=doc.get("createdAt") or datetime.min,
+            receipt_id=doc.get("transactionHash") or doc.get("challanId") or doc.get("bankReferenceId"),
+        )
+
+
+class PaymentIndex:
+    """Payments by USN, loaded on demand and synced incrementally"""
+
+    def __init__(self, collection, poll_interval: float = POLL_INTERVAL, use_change_stream: bool = True):
+        self.collection = collection
+        self.poll_interval = poll_interval
+        self.use_change_stream = use_change_stream
+        self._by_usn: dict[str, dict[str, PaymentRecord]] = {}
+        # Live sessions per student; a student's entries go when the count drops to zero
+        self._sessions: dict[str, int] = {}
+        self._newest: Optional[datetime] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="payment-sync", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _store(self, doc: dict):
+        record = PaymentRecord.from_document(doc)
+        with self._lock:
+            payments = self._by_usn.get(record.usn)
+            if payments is None:
+                return  # Not a student this worker serves
+            self._add(payments, record)
+
+    def _add(self, payments: dict[str, PaymentRecord], record: PaymentRecord):
+        # Caller holds the lock
+        payments[record.id] = record
+        if self._newest is None or record.created_at > self._newest:
+            self._newest = record.created_at
+
+    def watch(self, usn: str):
+        """Keep a student's payments in the index for the length of a session"""
+        with self._lock:
+            self._sessions[usn] = self._sessions.get(usn, 0) + 1
+
+    def release(self, usn: str):
+        """End a session's hold on a student; the last one evicts their payments"""
+        with self._lock:
+            remaining = self._sessions.get(usn, 0) - 1
+            if remaining > 0:
+                self._sessions[usn] = remaining
+                return
+            self._sessions.pop(usn, None)
+            self._by_usn.pop(usn, None)
+
+    def load(self, usn: str) -> list[PaymentRecord]:
+        """Blocking read of one student's payments into the index
+
+        The student is only cached once the whole read succeeds, so a failed
+        or partial read is retried on the next lookup instead of being served
+        as "no payments".
+        """
+        records = [PaymentRecord.from_document(doc) for doc in self.collection.find({"usn": usn})]
+        with self._lock:
+            payments = self._by_usn.setdefault(usn, {})
+            for record in records:
+                self._add(payments, record)
+        return self.cached(usn)
+
+    def cached(self, usn: str) -> Optional[list[PaymentRecord]]:
+        """A student's payments, oldest first, or None if not loaded yet"""
+        with self._lock:
+            payments = self._by_usn.get(usn)
+            if payments is None:
+                return None
+            return sorted(payments.values(), key=lambda p: p.created_at)
+
+    async def history(self, usn: str) -> list[PaymentRecord]:
+        """Cached payments, loading the student off the event loop on a miss"""
+        payments = self.cached(usn)
+        if payments is None:
+            payments = await asyncio.to_thread(self.load, usn)
+        return payments
+
+    def _poll(self):
+        with self._lock:
+            usns = list(self._by_usn)
+            newest = self._newest
+            unsettled = [p.id for payments in self._by_usn.values() for p in payments.values() if p.status not in FINAL_STATUSES]
+        if not usns:
+            return
+        changed = [{"_id": {"$in": [_object_id(i) for i in unsettled]}}] if unsettled else []
+        if newest is not None:
+            changed.append({"createdAt": {"$gte": newest}})
+        else:
+            changed.append({})
+        for doc in self.collection.find({"usn": {"$in": usns}, "$or": changed}):
+            self._store(doc)
+
+    def _watch(self):
+        with self.collection.watch(
+            [{"$match": {"operationType": {"$in": ["insert", "update", "replace"]}}}],
+            full_document="updateLookup",
+        ) as stream:
+            logger.info("💳 Payment index following the change stream")
+            while not self._stop.is_set():
+                change = stream.try_next()
+                if change is None:
+                    self._stop.wait(0.5)
+                elif change.get("fullDocument"):
+                    self._store(change["fullDocument"])
+
+    def _run(self):
+        if self.use_change_stream:
+            try:
+                self._watch()
+                return
+            except Exception as e:
+                # Standalone servers and stand-ins have no change streams
+                logger.info("💳 Payment index polling every %.0fs (%s)", self.poll_interval, e)
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self._poll()
+            except Exception as e:
+                logger.warning("Payment index sync failed: %s", e)
+
+
+def _object_id(value: str):
+    try:
+        from bson import ObjectId
+    except ImportError:
+        return value
+    return ObjectId(value) if ObjectId.is_valid(value) else value
+
+
+_index: Optional[PaymentIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_payment_index() -> Optional[PaymentIndex]:
+    """The worker's payment index, or None without MONGODB_URI/pymongo"""
+    global _index
+    uri = os.getenv("MONGODB_URI")
+    # pymongo is imported on first use; it adds noticeably to worker import time
+    if not uri or importlib.util.find_spec("pymongo") is None:
+        return None
+    with _index_lock:
+        if _index is None:
+            import pymongo
+
+            client = pymongo.MongoClient(uri, appname="billdesk-voice-agent")
+            # Mongoose's default collection name for the Payment model
+            _index = PaymentIndex(client.get_default_database()["payments"])
+            _index.start()
+        return _index
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Usage: python payment_history.py <USN>")
+        sys.exit(1)
+    from dotenv import load_dotenv
+
+    load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".env.local"))
+    index = get_payment_index()
+    if index is None:
+        print("MONGODB_URI is not set or pymongo is not installed")
+        sys.exit(1)
+    for payment in index.load(sys.argv[1]):
+        print(f"{payment.created_at:%Y-%m-%d %H:%M}  {payment.status:<26} ₹{payment.amount:>10,.0f}  {payment.method:<10} {','.join(payment.fee_ids):<30} {payment.receipt_id or '-'}")
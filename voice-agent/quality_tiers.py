@@ -0,0 +1,196 @@
+"""
+BEC BillDesk Voice Agent - Load-adaptive Quality Tiers
+
+Under peak load ARIA degrades gracefully instead of dropping calls. A
+QualityController samples worker CPU load and moves the session between
+tiers with hysteresis (step down as soon as load crosses a threshold,
+step back up only after it stays low for a few samples).
+
+What each tier controls:
+- noise cancellation and TTS sample rate: fixed when the session starts
+  (RoomIO and Cartesia take them at construction), so they follow the
+  tier chosen at startup
+- VAD window stride, Cartesia model and LLM max tokens: switched live
+
+Latency metrics (EOU delay, LLM TTFT, TTS TTFB) are bucketed per tier
+and logged at the end of the session.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import Optional
+
+import psutil
+
+logger = logging.getLogger("billdesk-agent")
+
+SAMPLE_INTERVAL = 5.0
+CPU_WINDOW = 1.0
+RECOVERY_SAMPLES = 3
+RECOVERY_MARGIN = 10.0
+
+
+@dataclass(frozen=True)
+class QualityTier:
+    name: str
+    max_cpu: float  # highest worker CPU % this tier is used at
+    noise_cancellation: bool
+    vad_stride: int
+    tts_model: str
+    tts_sample_rate: int
+    llm_max_tokens: int
+
+
+TIERS = [
+    QualityTier("full", 70.0, noise_cancellation=True, vad_stride=1, tts_model="sonic-2", tts_sample_rate=24000, llm_max_tokens=300),
+    QualityTier("reduced", 85.0, noise_cancellation=True, vad_stride=2, tts_model="sonic-2", tts_sample_rate=16000, llm_max_tokens=200),
+    QualityTier("minimal", 100.0, noise_cancellation=False, vad_stride=3, tts_model="sonic-turbo", tts_sample_rate=16000, llm_max_tokens=120),
+]
+
+
+def tier_for_load(cpu: float) -> QualityTier:
+    for tier in TIERS:
+        if cpu <= tier.max_cpu:
+            return tier
+    return TIERS[-1]
+
+
+class CpuSampler:
+    """The process's only psutil.cpu_percent caller, measuring in a background thread
+
+    cpu_percent(interval=None) reports usage since the previous call anywhere
+    in the process, so independent callers (every QualityController, the
+    LiveKit load function) would keep resetting each other's baseline.
+    """
+
+    def __init__(self, window: float = CPU_WINDOW):
+        self.window = window
+        self.percent = 0.0
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _run(self):
+        while True:
+            self.percent = psutil.cpu_percent(interval=self.window)
+
+    def read(self) -> float:
+        with self._lock:
+            # Started lazily, and again in a forked job process (threads don't survive fork)
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                threading.Thread(target=self._run, name="cpu-sampler", daemon=True).start()
+        return self.percent
+
+
+cpu_sampler = CpuSampler()
+
+
+def current_load() -> float:
+    """Worker CPU utilisation (%) over the sampler's last window"""
+    return cpu_sampler.read()
+
+
+@dataclass
+class TierLatency:
+    eou_delay: list[float] = field(default_factory=list)
+    llm_ttft: list[float] = field(default_factory=list)
+    tts_ttfb: list[float] = field(default_factory=list)
+
+    @staticmethod
+    def _avg(values: list[float]) -> Optional[float]:
+        return round(sum(values) / len(values), 3) if values else None
+
+    def summary(self) -> dict:
+        return {
+            "turns": len(self.eou_delay),
+            "eou_delay": self._avg(self.eou_delay),
+            "llm_ttft": self._avg(self.llm_ttft),
+            "tts_ttfb": self._avg(self.tts_ttfb),
+        }
+
+
+class QualityController:
+    """Moves one session between quality tiers as worker load changes"""
+
+    def __init__(self, initial: Optional[QualityTier] = None):
+        self.tier = initial or tier_for_load(current_load())
+        self.latency: dict[str, TierLatency] = {}
+        # Tiers that keep the full TTS model use the session's own (e.g. an experiment arm's)
+        self.tts_model = TIERS[0].tts_model
+        # Off for session languages the lighter tier models don't speak
+        self.degrade_tts = True
+        self._tts = None
+        self._vad = None
+        self._low_samples = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def bind(self, tts, vad):
+        """Attach the live plugin instances and apply the current tier to them"""
+        self._tts = tts
+        self._vad = vad
+        self._apply()
+
+    def use_tts_model(self, model: str, degradable: bool = True):
+        """Change the session's own TTS model (e.g. when it switches language)"""
+        self.tts_model = model
+        self.degrade_tts = degradable
+        self._apply()
+
+    def _apply(self):
+        if self._tts is not None:
+            degraded = self.degrade_tts and self.tier.tts_model != TIERS[0].tts_model
+            self._tts.update_options(model=self.tier.tts_model if degraded else self.tts_model)
+        if self._vad is not None and hasattr(self._vad, "stride"):
+            self._vad.stride = self.tier.vad_stride
+
+    def update(self, cpu: float):
+        target = tier_for_load(cpu)
+        current = TIERS.index(self.tier)
+        wanted = TIERS.index(target)
+        if wanted > current:
+            self._switch(target, cpu)
+        elif wanted < current:
+            # Only step back up once load has stayed well below the threshold
+            if cpu <= TIERS[current - 1].max_cpu - RECOVERY_MARGIN:
+                self._low_samples += 1
+            else:
+                self._low_samples = 0
+            if self._low_samples >= RECOVERY_SAMPLES:
+                self._switch(TIERS[current - 1], cpu)
+        else:
+            self._low_samples = 0
+
+    def _switch(self, tier: QualityTier, cpu: float):
+        logger.info("🎚️ Quality tier %s → %s (cpu %.0f%%)", self.tier.name, tier.name, cpu)
+        self.tier = tier
+        self._low_samples = 0
+        self._apply()
+
+    def attach(self, session):
+        """Bucket latency metrics by the tier active when they were produced"""
+
+        @session.on("metrics_collected")
+        def _on_metrics(ev):
+            m = ev.metrics
+            bucket = self.latency.setdefault(self.tier.name, TierLatency())
+            kind = type(m).__name__
+            if kind == "EOUMetrics":
+                bucket.eou_delay.append(m.end_of_utterance_delay)
+            elif kind == "LLMMetrics" and m.ttft >= 0:
+                bucket.llm_ttft.append(m.ttft)
+            elif kind == "TTSMetrics" and m.ttfb >= 0:
+                bucket.tts_ttfb.append(m.ttfb)
+
+        self._task = asyncio.create_task(self._monitor())
+        session.on("close", lambda _: self._task.cancel())
+
+    async def _monitor(self):
+        while True:
+            await asyncio.sleep(SAMPLE_INTERVAL)
+            self.update(current_load())
+
+    def summary(self) -> dict:
+        return {name: bucket.summary() for name, bucket in self.latency.items()}
@@ -0,0 +1,314 @@
+"""
+BEC BillDesk Voice Agent - Provider Quota Scheduler
+
+Every session calls Cerebras, Deepgram and Cartesia on its own, so at the
+fee deadline a 429 from one provider spread to every live call. All
+provider calls on a worker now go through one QuotaScheduler:
+
+- each provider has token buckets for requests/minute and tokens/minute
+  (LLM tokens for Cerebras, characters for Cartesia)
+- calls that don't fit the budget are queued instead of failing; the
+  queue is ordered by priority, so in-progress turns go before new
+  greetings, and greetings before background work (TTS cache warmup)
+- a 429 from a provider drains its request bucket, so every session on
+  the worker backs off instead of hitting the same limit
+- queue depth, wait times and usage are tracked per provider
+
+Set QUOTA_SHARED_FILE to share the bucket state between the worker
+processes on one host (a JSON file guarded by flock; its reads and
+writes run in a thread, never on the event loop). Limits can be
+overridden with QUOTA_<PROVIDER>_RPM / QUOTA_<PROVIDER>_TPM.
+"""
+
+import asyncio
+import contextlib
+import enum
+import heapq
+import itertools
+import json
+import logging
+import os
+import pathlib
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger("billdesk-agent")
+
+POLL_INTERVAL = 0.05
+# Longest the head of a queue sleeps on the store's own estimate before checking again
+MAX_HEAD_WAIT = 1.0
+RATE_LIMIT_BACKOFF = 10.0
+
+
+class Priority(enum.IntEnum):
+    TURN = 0
+    GREETING = 1
+    BACKGROUND = 2
+
+
+@dataclass(frozen=True)
+class ProviderLimits:
+    requests_per_minute: float
+    tokens_per_minute: float = 0.0  # 0 = only requests are limited
+
+
+DEFAULT_LIMITS = {
+    "cerebras": ProviderLimits(30, 60_000),
+    "deepgram": ProviderLimits(100),
+    "cartesia": ProviderLimits(60, 50_000),
+}
+
+
+def limits_from_env() -> dict[str, ProviderLimits]:
+    limits = {}
+    for provider, default in DEFAULT_LIMITS.items():
+        prefix = f"QUOTA_{provider.upper()}"
+        limits[provider] = ProviderLimits(
+            float(os.getenv(f"{prefix}_RPM", default.requests_per_minute)),
+            float(os.getenv(f"{prefix}_TPM", default.tokens_per_minute)),
+        )
+    return limits
+
+
+@dataclass
+class BucketState:
+    requests: float
+    tokens: float
+    updated: float
+
+
+class BucketStore:
+    """Token buckets for every provider, kept in this process"""
+
+    # Whether operations block on I/O (and so must stay off the event loop)
+    blocking = False
+
+    def __init__(self, limits: dict[str, ProviderLimits]):
+        self.limits = limits
+        self._states: dict[str, BucketState] = {}
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def _locked(self):
+        with self._lock:
+            yield self._states
+
+    def _refilled(self, states: dict[str, BucketState], provider: str, now: float) -> BucketState:
+        limits = self.limits[provider]
+        state = states.get(provider)
+        if state is None:
+            state = states[provider] = BucketState(limits.requests_per_minute, limits.tokens_per_minute, now)
+        elapsed = max(now - state.updated, 0.0)
+        # Buckets hold at most one minute's worth of budget
+        state.requests = min(limits.requests_per_minute, state.requests + elapsed * limits.requests_per_minute / 60)
+        state.tokens = min(limits.tokens_per_minute, state.tokens + elapsed * limits.tokens_per_minute / 60)
+        state.updated = now
+        return state
+
+    def take(self, provider: str, tokens: float, now: float) -> float:
+        """Debit one request and `tokens`; returns 0, or the seconds until they would fit"""
+        limits = self.limits[provider]
+        with self._locked() as states:
+            state = self._refilled(states, provider, now)
+            wait = 0.0
+            if state.requests < 1:
+                wait = (1 - state.requests) * 60 / limits.requests_per_minute
+            if limits.tokens_per_minute:
+                # A call bigger than the whole bucket only needs a full bucket
+                needed = min(tokens, limits.tokens_per_minute)
+                if state.tokens < needed:
+                    wait = max(wait, (needed - state.tokens) * 60 / limits.tokens_per_minute)
+            if wait > 0:
+                return wait
+            state.requests -= 1
+            state.tokens -= tokens if limits.tokens_per_minute else 0
+            return 0.0
+
+    def charge(self, provider: str, tokens: float, now: float):
+        """Correct the token debit once the real usage is known (may go negative)"""
+        if not self.limits[provider].tokens_per_minute:
+            return
+        with self._locked() as states:
+            self._refilled(states, provider, now).tokens -= tokens
+
+    def drain(self, provider: str, seconds: float, now: float):
+        """Empty the request bucket so nothing is sent for about `seconds`"""
+        limits = self.limits[provider]
+        with self._locked() as states:
+            state = self._refilled(states, provider, now)
+            state.requests = min(state.requests, 1 - seconds * limits.requests_per_minute / 60)
+
+
+class SharedBucketStore(BucketStore):
+    """Bucket state in a locked JSON file, shared by the worker processes on a host"""
+
+    blocking = True
+
+    def __init__(self, limits: dict[str, ProviderLimits], path: str):
+        super().__init__(limits)
+        self.path = pathlib.Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.touch(exist_ok=True)
+
+    @contextlib.contextmanager
+    def _locked(self):
+        with self._lock, open(self.path, "r+", encoding="utf-8") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                try:
+                    states = {name: BucketState(**s) for name, s in json.loads(f.read() or "{}").items()}
+                except (ValueError, TypeError):
+                    states = {}
+                yield states
+                f.seek(0)
+                f.truncate()
+                json.dump({name: asdict(s) for name, s in states.items()}, f)
+                f.flush()
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+@dataclass
+class ProviderStats:
+    depth: int = 0
+    max_depth: int = 0
+    requests: int = 0
+    tokens: float = 0.0
+    queued: int = 0
+    rate_limited: int = 0
+    waits_ms: list[float] = field(default_factory=list)
+    max_samples: int = 10_000
+
+    def summary(self) -> dict:
+        waits = sorted(self.waits_ms)
+        return {
+            "requests": self.requests,
+            "tokens": round(self.tokens),
+            "queued": self.queued,
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+            "wait_p50_ms": waits[len(waits) // 2] if waits else 0.0,
+            "wait_p99_ms": waits[int(len(waits) * 0.99)] if waits else 0.0,
+            "rate_limited": self.rate_limited,
+        }
+
+
+class QuotaScheduler:
+    """Priority queue in front of each provider's token buckets
+
+    Safe to share between jobs running as threads of one process: waiters
+    poll the buckets, so no future is bound to a particular event loop.
+    """
+
+    def __init__(self, store: BucketStore):
+        self.store = store
+        self.stats = {provider: ProviderStats() for provider in store.limits}
+        self._queues: dict[str, list] = {provider: [] for provider in store.limits}
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    async def _store(self, operation, *args):
+        if self.store.blocking:
+            return await asyncio.to_thread(operation, *args)
+        return operation(*args)
+
+    def _store_soon(self, operation, *args):
+        """Run a store update without waiting for it (in a thread for a blocking store)"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if self.store.blocking and loop is not None:
+            loop.run_in_executor(None, operation, *args)
+        else:
+            operation(*args)
+
+    async def acquire(self, provider: str, tokens: float = 0, priority: Priority = Priority.TURN):
+        """Wait until the provider has budget for one call of `tokens`"""
+        stats = self.stats[provider]
+        queue = self._queues[provider]
+        started = time.monotonic()
+        entry = (int(priority), next(self._seq))
+        with self._lock:
+            heapq.heappush(queue, entry)
+            stats.depth = len(queue)
+            stats.max_depth = max(stats.max_depth, stats.depth)
+        queued = False
+        try:
+            while True:
+                # Only the head of the queue touches the store; the rest wait their turn in memory
+                with self._lock:
+                    head = queue[0] == entry
+                wait = POLL_INTERVAL
+                if head:
+                    wait = await self._store(self.store.take, provider, tokens, time.time())
+                    if wait == 0:
+                        break
+                    wait = min(wait, MAX_HEAD_WAIT)
+                if not queued:
+                    queued = True
+                    stats.queued += 1
+                await asyncio.sleep(wait)
+        finally:
+            with self._lock:
+                queue.remove(entry)
+                heapq.heapify(queue)
+                stats.depth = len(queue)
+        stats.requests += 1
+        stats.tokens += tokens
+        stats.waits_ms.append((time.monotonic() - started) * 1000)
+        del stats.waits_ms[:-stats.max_samples]
+
+    def charge(self, provider: str, tokens: float):
+        """Account for tokens used beyond (or short of, if negative) what was acquired"""
+        self._store_soon(self.store.charge, provider, tokens, time.time())
+        self.stats[provider].tokens += tokens
+
+    def backoff(self, provider: str, seconds: float = RATE_LIMIT_BACKOFF):
+        logger.warning("🚦 %s rate limited, pausing new calls for %.0fs", provider, seconds)
+        self._store_soon(self.store.drain, provider, seconds, time.time())
+        self.stats[provider].rate_limited += 1
+
+    def watch(self, provider: str, plugin):
+        """Back off when a plugin (LLM/STT/TTS instance) reports a 429"""
+
+        @plugin.on("error")
+        def _on_error(ev):
+            if getattr(ev.error, "status_code", None) == 429:
+                self.backoff(provider)
+
+    def summary(self) -> dict:
+        return {provider: stats.summary() for provider, stats in self.stats.items() if stats.requests or stats.depth}
+
+
+_scheduler: Optional[QuotaScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> QuotaScheduler:
+    """The worker's scheduler, shared by every session in the process"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            limits = limits_from_env()
+            shared = os.getenv("QUOTA_SHARED_FILE")
+            if shared and fcntl is not None:
+                _scheduler = QuotaScheduler(SharedBucketStore(limits, shared))
+                logger.info("🚦 Provider quotas shared via %s", shared)
+            else:
+                if shared:
+                    logger.warning("QUOTA_SHARED_FILE needs flock; using per-process quotas")
+                _scheduler = QuotaScheduler(BucketStore(limits))
+        return _scheduler
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough LLM token count (about 4 characters per token)"""
+    return len(text) // 4 + 1
@@ -0,0 +1,187 @@
+"""
+BEC BillDesk Voice Agent - Session Recorder
+
+Opt-in capture of an ARIA session for offline latency investigation.
+Enable it by setting RECORD_SESSIONS_DIR; each session is written to
+<dir>/<room name>.zip containing:
+
+- events.jsonl: room metadata, transcripts, LLM requests/responses,
+  tool calls, provider metrics and agent state changes, each stamped
+  with seconds since the session started
+- audio.pcm: the student's input audio (int16), referenced from
+  "audio" events by byte offset; final transcripts carry the offset the
+  audio had reached, so replay can cut out each turn's utterance
+
+Input audio is spooled to <dir>/<room name>.pcm.part while the session
+runs (not held in memory) and moved into the zip when it is saved.
+
+Replay a recording with: python replay.py <recording.zip>
+"""
+
+import json
+import logging
+import os
+import pathlib
+import time
+import zipfile
+from typing import AsyncIterable, Optional
+
+from livekit import rtc
+
+logger = logging.getLogger("billdesk-agent")
+
+RECORDING_VERSION = 1
+# Write buffer for the audio spool (~2 s of 16 kHz mono), so frames don't each hit the disk
+SPOOL_BUFFER = 64 * 1024
+
+
+def recording_dir() -> Optional[pathlib.Path]:
+    """Directory to record sessions into, or None when recording is disabled"""
+    path = os.getenv("RECORD_SESSIONS_DIR")
+    return pathlib.Path(path) if path else None
+
+
+def _dump(obj) -> dict:
+    """Best-effort conversion of LiveKit event/metric objects to JSON"""
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump(mode="json")
+    return {k: v for k, v in vars(obj).items() if not k.startswith("_")}
+
+
+def _message_text(item) -> str:
+    text = getattr(item, "text_content", None)
+    if text is not None:
+        return text
+    return str(getattr(item, "content", ""))
+
+
+class SessionRecorder:
+    """Collects session events in memory, spools input audio to disk, and writes both out on close"""
+
+    def __init__(self, path: pathlib.Path):
+        self.path = path
+        self.spool_path = path.with_suffix(".pcm.part")
+        self.events: list[dict] = []
+        self.audio_bytes = 0
+        self._spool = None
+        self._t0 = time.monotonic()
+        self._audio_format: Optional[tuple[int, int]] = None
+
+    def now(self) -> float:
+        return round(time.monotonic() - self._t0, 4)
+
+    def event(self, kind: str, **data):
+        self.events.append({"t": self.now(), "kind": kind, **data})
+
+    def record_metadata(self, room_name: str, metadata: str):
+        self.event("metadata", room=room_name, metadata=metadata)
+
+    def record_audio_frame(self, frame):
+        if self._spool is None:
+            self.spool_path.parent.mkdir(parents=True, exist_ok=True)
+            self._spool = open(self.spool_path, "wb", buffering=SPOOL_BUFFER)
+        fmt = (frame.sample_rate, frame.num_channels)
+        if fmt != self._audio_format:
+            self._audio_format = fmt
+            self.event("audio", offset=self.audio_bytes, sample_rate=fmt[0], num_channels=fmt[1])
+        data = bytes(frame.data)
+        self._spool.write(data)
+        self.audio_bytes += len(data)
+
+    async def tee_audio(self, frames: AsyncIterable) -> AsyncIterable:
+        """Pass input audio through while recording it"""
+        async for frame in frames:
+            if hasattr(frame, "data"):
+                self.record_audio_frame(frame)
+            yield frame
+
+    async def tee_llm(self, chat_ctx, stream: AsyncIterable) -> AsyncIterable:
+        """Pass an LLM stream through, recording the request and the full response"""
+        messages = [
+            {"role": item.role, "content": _message_text(item)}
+            for item in chat_ctx.items
+            if getattr(item, "type", "message") == "message"
+        ]
+        self.event("llm_request", messages=messages)
+        started = time.monotonic()
+        ttft = None
+        text = []
+        try:
+            async for chunk in stream:
+                delta = chunk if isinstance(chunk, str) else getattr(getattr(chunk, "delta", None), "content", None)
+                if delta:
+                    if ttft is None:
+                        ttft = time.monotonic() - started
+                    text.append(delta)
+                yield chunk
+        finally:
+            self.event(
+                "llm_response",
+                text="".join(text),
+                ttft=round(ttft, 4) if ttft is not None else None,
+                duration=round(time.monotonic() - started, 4),
+            )
+
+    def attach(self, session):
+        """Subscribe to AgentSession events"""
+
+        @session.on("user_input_transcribed")
+        def _on_transcript(ev):
+            if ev.is_final:
+                self.event("transcript", text=ev.transcript, audio_offset=self.audio_bytes)
+
+        @session.on("function_tools_executed")
+        def _on_tools(ev):
+            for call, output in zip(ev.function_calls, ev.function_call_outputs):
+                self.event(
+                    "tool_call",
+                    name=call.name,
+                    arguments=call.arguments,
+                    output=getattr(output, "output", None),
+                )
+
+        @session.on("metrics_collected")
+        def _on_metrics(ev):
+            self.event("metrics", type=type(ev.metrics).__name__, data=_dump(ev.metrics))
+
+        @session.on("agent_state_changed")
+        def _on_state(ev):
+            self.event("agent_state", state=ev.new_state)
+
+    def save(self):
+        """Write the recording (blocking file I/O; run it off the event loop)"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self._spool is not None:
+            self._spool.close()
+        with zipfile.ZipFile(self.path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr("version", str(RECORDING_VERSION))
+            zf.writestr("events.jsonl", "\n".join(json.dumps(e, default=str) for e in self.events))
+            if self._spool is not None:
+                zf.write(self.spool_path, "audio.pcm")
+            else:
+                zf.writestr("audio.pcm", b"")
+        if self._spool is not None:
+            self.spool_path.unlink(missing_ok=True)
+        logger.info("💾 Session recorded to %s (%d events, %d audio bytes)", self.path, len(self.events), self.audio_bytes)
+
+
+def load_recording(path: str) -> tuple[list[dict], bytes]:
+    """Read a recording written by SessionRecorder.save"""
+    with zipfile.ZipFile(path) as zf:
+        events = [json.loads(line) for line in zf.read("events.jsonl").decode("utf-8").splitlines() if line]
+        audio = zf.read("audio.pcm")
+    return events, audio
+
+
+def recording_frames(events: list[dict], audio: bytes, start: int = 0, end: Optional[int] = None, frame_ms: int = 10) -> list[rtc.AudioFrame]:
+    """Rebuild recorded input audio between two byte offsets as LiveKit frames"""
+    end = len(audio) if end is None else min(end, len(audio))
+    formats = [e for e in events if e["kind"] == "audio"]
+    frames = []
+    for i, fmt in enumerate(formats):
+        fmt_end = formats[i + 1]["offset"] if i + 1 < len(formats) else len(audio)
+        rate, channels = fmt["sample_rate"], fmt["num_channels"]
+        step = rate * frame_ms // 1000 * channels * 2
+        for offset in range(max(fmt["offset"], start), min(fmt_end, end) - step + 1, step):
+            frames.append(rtc.AudioFrame(audio[offset:offset + step], rate, channels, step // (channels * 2)))
+    return frames
@@ -0,0 +1,406 @@
+"""
+BEC BillDesk Voice Agent - Fee Reminder Voice Notes
+
+Offline batch job that renders a short ARIA voice note for every student
+with fees due on a date in FEE_STRUCTURE, e.g. "You have 2 pending fees
+totaling ₹90,000 due on 30 January", worded by the same message catalog
+and ₹ formatting as the get_pending_fees tool. Sending the notes is left
+to the delivery side: the job writes the audio and a manifest of which
+note goes to which student.
+
+- students are streamed from the `students` collection (or a JSONL
+  export of it) in chunks, sorted by USN, so memory stays flat however
+  many students there are
+- notes are deduplicated: students with the same unpaid fees get the
+  same text, so each distinct (language, voice, text) is synthesized
+  once and shared
+- Cartesia is called with bounded concurrency, at background quota
+  priority so a job running next to live sessions yields to them
+- after each chunk the manifest and a checkpoint (last USN, manifest
+  length) are written, so a stopped job resumes where it left off and
+  notes already on disk are never synthesized twice
+
+Output (default .reminders/<due date>/): notes/<key>.wav, manifest.jsonl
+(one line per student), checkpoint.json. Throughput is reported as notes
+per minute.
+
+Run with: python reminders.py [--due 2025-01-30] [--students students.jsonl]
+[--concurrency 4] [--chunk-size 500] [--mock-tts] [--restart]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import hashlib
+import itertools
+import json
+import logging
+import os
+import pathlib
+import sys
+import time
+import wave
+from dataclasses import asdict, dataclass
+from datetime import date
+from types import SimpleNamespace
+from typing import Callable, Iterable, Iterator, Optional
+
+from livekit import rtc
+
+from experiments import CONTROL
+from functions import FEE_STRUCTURE, reminder_text, unpaid_fees
+from languages import DEFAULT_LANGUAGE, LANGUAGES, normalize
+from quota import Priority
+
+logger = logging.getLogger("billdesk-agent")
+
+DEFAULT_OUT_DIR = pathlib.Path(__file__).parent.absolute() / ".reminders"
+CHUNK_SIZE = 500
+CONCURRENCY = 4
+SYNTHESIS_ATTEMPTS = 3
+
+# Mock TTS audio (same shape as the replay harness's mock voice)
+MOCK_SAMPLE_RATE = 24000
+MOCK_FRAME_MS = 20
+MOCK_CHARS_PER_SECOND = 15
+
+
+@dataclass(frozen=True)
+class Note:
+    """The reminder one student gets"""
+
+    usn: str
+    name: str
+    language: str
+    fee_ids: tuple[str, ...]
+    text: str
+    key: str
+
+
+@dataclass
+class JobStats:
+    students: int = 0
+    notes: int = 0
+    synthesized: int = 0  # distinct messages sent to TTS
+    reused: int = 0  # notes served by audio synthesized earlier (this run or a previous one)
+    audio_seconds: float = 0.0
+    elapsed: float = 0.0
+
+    @property
+    def notes_per_minute(self) -> float:
+        return self.notes / self.elapsed * 60 if self.elapsed else 0.0
+
+    def summary(self) -> dict:
+        return {**asdict(self), "elapsed": round(self.elapsed, 1), "audio_seconds": round(self.audio_seconds, 1),
+                "notes_per_minute": round(self.notes_per_minute, 1)}
+
+
+class MockTTS:
+    """Offline stand-in for Cartesia: silence as long as the text would take to say, after a fixed latency"""
+
+    def __init__(self, latency: float = 0.2, sample_rate: int = MOCK_SAMPLE_RATE):
+        self.latency = latency
+        self.sample_rate = sample_rate
+        self.calls: list[str] = []
+
+    @contextlib.asynccontextmanager
+    async def synthesize(self, text: str):
+        self.calls.append(text)
+        await asyncio.sleep(self.latency)
+        yield self._frames(text)
+
+    async def _frames(self, text: str):
+        samples = self.sample_rate * MOCK_FRAME_MS // 1000
+        frames = max(1, int(len(text) / MOCK_CHARS_PER_SECOND * 1000 / MOCK_FRAME_MS))
+        for _ in range(frames):
+            yield SimpleNamespace(frame=rtc.AudioFrame(bytes(samples * 2), self.sample_rate, 1, samples))
+
+    async def aclose(self):
+        pass
+
+
+def due_dates() -> list[str]:
+    return sorted({f["dueDate"] for f in FEE_STRUCTURE})
+
+
+def next_due_date(today: Optional[date] = None) -> Optional[str]:
+    today = (today or date.today()).isoformat()
+    return next((due for due in due_dates() if due >= today), None)
+
+
+def student_query(due_date: str, after_usn: Optional[str] = None) -> dict:
+    """Students who haven't paid every fee due on the date (paidFees lacks at least one of them)"""
+    query: dict = {"$or": [{"paidFees": {"$ne": f["id"]}} for f in unpaid_fees(due_date=due_date)]}
+    if after_usn is not None:
+        query["usn"] = {"$gt": after_usn}
+    return query
+
+
+def _chunked(students: Iterable[dict], size: int) -> Iterator[list[dict]]:
+    students = iter(students)
+    while chunk := list(itertools.islice(students, size)):
+        yield chunk
+
+
+def mongo_students(collection, due_date: str, after_usn: Optional[str] = None, chunk_size: int = CHUNK_SIZE) -> Iterator[list[dict]]:
+    """Chunks of student documents from a pymongo-compatible `students` collection, by USN"""
+    cursor = collection.find(
+        student_query(due_date, after_usn),
+        {"_id": 0, "usn": 1, "studentName": 1, "paidFees": 1, "language": 1},
+        batch_size=chunk_size,
+    ).sort("usn", 1)
+    return _chunked(cursor, chunk_size)
+
+
+def file_students(path: str, after_usn: Optional[str] = None, chunk_size: int = CHUNK_SIZE) -> Iterator[list[dict]]:
+    """Chunks of student documents from a JSONL export sorted by USN (mongoexport --sort '{"usn": 1}')"""
+
+    def read():
+        previous = None
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                student = json.loads(line)
+                if previous is not None and student["usn"] <= previous:
+                    raise ValueError(f"{path} is not sorted by USN ({student['usn']} after {previous}); resuming needs USN order")
+                previous = student["usn"]
+                if after_usn is None or student["usn"] > after_usn:
+                    yield student
+
+    return _chunked(read(), chunk_size)
+
+
+def get_students_collection():
+    """The `students` collection (Mongoose's name for the Student model), or None without MONGODB_URI/pymongo"""
+    uri = os.getenv("MONGODB_URI")
+    try:
+        import pymongo
+    except ImportError:
+        return None
+    if not uri:
+        return None
+    client = pymongo.MongoClient(uri, appname="billdesk-reminders")
+    return client.get_default_database()["students"]
+
+
+def note_key(voice: str, language: str, text: str) -> str:
+    return hashlib.sha256(f"{voice}|{language}|{text}".encode("utf-8")).hexdigest()[:24]
+
+
+def write_wav(path: pathlib.Path, frames: list[rtc.AudioFrame]) -> float:
+    """Write frames as 16-bit PCM WAV (atomically, so a half-written note is never taken as done); returns seconds"""
+    audio = rtc.combine_audio_frames(frames)
+    tmp = path.with_suffix(".tmp")
+    with wave.open(str(tmp), "wb") as f:
+        f.setnchannels(audio.num_channels)
+        f.setsampwidth(2)
+        f.setframerate(audio.sample_rate)
+        f.writeframes(bytes(audio.data))
+    os.replace(tmp, path)
+    return audio.samples_per_channel / audio.sample_rate
+
+
+class ReminderJob:
+    """Renders the reminder notes for one due date into `out_dir`
+
+    `voice(language)` returns the TTS to use for a language and a string
+    identifying its model and voice (part of the note key, so notes from
+    a different voice, or the mock, are never mistaken for each other).
+    """
+
+    def __init__(
+        self,
+        due_date: str,
+        out_dir: pathlib.Path,
+        voice: Callable[[str], tuple[object, str]],
+        language: str = DEFAULT_LANGUAGE,
+        concurrency: int = CONCURRENCY,
+        quota=None,
+    ):
+        if not unpaid_fees(due_date=due_date):
+            raise ValueError(f"No fee is due on {due_date} (due dates: {', '.join(due_dates())})")
+        self.due_date = due_date
+        self.out_dir = out_dir
+        self.notes_dir = out_dir / "notes"
+        self.manifest_path = out_dir / "manifest.jsonl"
+        self.checkpoint_path = out_dir / "checkpoint.json"
+        self.voice = voice
+        self.language = language
+        self.quota = quota
+        self.stats = JobStats()
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._ready: set[str] = set()
+
+    def resume(self, restart: bool = False) -> Optional[str]:
+        """Prepare the output directory; returns the last USN already done (None: start from the top)"""
+        self.notes_dir.mkdir(parents=True, exist_ok=True)
+        checkpoint = None
+        if not restart and self.checkpoint_path.exists():
+            checkpoint = json.loads(self.checkpoint_path.read_text(encoding="utf-8"))
+        if checkpoint is None:
+            self.manifest_path.write_bytes(b"")
+            return None
+        # Drop manifest lines written after the last checkpoint; their chunk is redone
+        with open(self.manifest_path, "ab") as f:
+            f.truncate(checkpoint["manifest_bytes"])
+        logger.info("⏯️ Resuming reminders for %s after %s", self.due_date, checkpoint["last_usn"])
+        return checkpoint["last_usn"]
+
+    def note_for(self, student: dict) -> Optional[Note]:
+        fees = unpaid_fees(student.get("paidFees") or (), self.due_date)
+        if not fees:
+            return None
+        language = normalize(student.get("language")) or self.language
+        text = reminder_text(fees, language)
+        _, voice_id = self.voice(language)
+        return Note(
+            usn=student["usn"],
+            name=student.get("studentName", ""),
+            language=language,
+            fee_ids=tuple(f["id"] for f in fees),
+            text=text,
+            key=note_key(voice_id, language, text),
+        )
+
+    def _note_path(self, key: str) -> pathlib.Path:
+        return self.notes_dir / f"{key}.wav"
+
+    async def _synthesize(self, note: Note):
+        tts, _ = self.voice(note.language)
+        async with self._semaphore:
+            for attempt in range(1, SYNTHESIS_ATTEMPTS + 1):
+                try:
+                    if self.quota is not None:
+                        await self.quota.acquire("cartesia", len(note.text), Priority.BACKGROUND)
+                    frames = []
+                    async with tts.synthesize(note.text) as stream:
+                        async for ev in stream:
+                            frames.append(ev.frame)
+                    self.stats.audio_seconds += write_wav(self._note_path(note.key), frames)
+                    self.stats.synthesized += 1
+                    self._ready.add(note.key)
+                    return
+                except Exception as e:
+                    if attempt == SYNTHESIS_ATTEMPTS:
+                        raise
+                    logger.warning("Reminder synthesis failed (attempt %d): %s", attempt, e)
+                    await asyncio.sleep(attempt)
+
+    async def process(self, students: list[dict]):
+        """Synthesize the chunk's new messages, then record its notes and checkpoint"""
+        notes = [note for note in map(self.note_for, students) if note is not None]
+        missing: dict[str, Note] = {}
+        for note in notes:
+            if note.key in self._ready or note.key in missing:
+                continue
+            if self._note_path(note.key).exists():
+                self._ready.add(note.key)
+            else:
+                missing[note.key] = note
+        # A failed message stops the job before the checkpoint, so a resume redoes this chunk
+        await asyncio.gather(*map(self._synthesize, missing.values()))
+
+        with open(self.manifest_path, "a", encoding="utf-8") as f:
+            for note in notes:
+                row = {"usn": note.usn, "name": note.name, "language": note.language, "due": self.due_date,
+                       "fees": list(note.fee_ids), "text": note.text, "note": f"notes/{note.key}.wav"}
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+            manifest_bytes = f.tell()
+        self.stats.students += len(students)
+        self.stats.notes += len(notes)
+        self.stats.reused += len(notes) - len(missing)
+        self._checkpoint(students[-1]["usn"], manifest_bytes)
+
+    def _checkpoint(self, last_usn: str, manifest_bytes: int):
+        tmp = self.checkpoint_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"due": self.due_date, "last_usn": last_usn, "manifest_bytes": manifest_bytes}), encoding="utf-8")
+        os.replace(tmp, self.checkpoint_path)
+
+    async def run(self, chunks: Iterator[list[dict]]) -> JobStats:
+        started = time.perf_counter()
+        # The next chunk is read while the current one is being synthesized
+        next_chunk = asyncio.create_task(asyncio.to_thread(next, chunks, None))
+        while (chunk := await next_chunk) is not None:
+            next_chunk = asyncio.create_task(asyncio.to_thread(next, chunks, None))
+            await self.process(chunk)
+            self.stats.elapsed = time.perf_counter() - started
+            logger.info(
+                "📨 %d notes for %d students (%d synthesized), %.0f notes/min",
+                self.stats.notes, self.stats.students, self.stats.synthesized, self.stats.notes_per_minute,
+            )
+        self.stats.elapsed = time.perf_counter() - started
+        return self.stats
+
+
+async def main(args):
+    due = args.due or next_due_date()
+    if due is None:
+        print(f"Every due date in FEE_STRUCTURE has passed ({', '.join(due_dates())}); pass --due")
+        sys.exit(1)
+    out_dir = pathlib.Path(args.out or DEFAULT_OUT_DIR / due)
+
+    http = None
+    if args.mock_tts:
+        mock = MockTTS(latency=args.mock_latency)
+        voice = lambda language: (mock, "mock")
+        quota = None
+    else:
+        import aiohttp
+        from livekit.plugins import cartesia
+
+        from quota import get_scheduler
+
+        http = aiohttp.ClientSession()
+        engines: dict[str, tuple[object, str]] = {}
+
+        def voice(language: str):
+            # Same model/voice a live session in the control arm speaks the language with
+            if language not in engines:
+                config = LANGUAGES[language]
+                model, voice_id = config.tts_model or CONTROL.tts_model, config.tts_voice or CONTROL.tts_voice
+                tts = cartesia.TTS(model=model, voice=voice_id, language=config.tts_language, http_session=http)
+                engines[language] = (tts, f"{model}/{voice_id}")
+            return engines[language]
+
+        quota = get_scheduler()
+
+    job = ReminderJob(due, out_dir, voice, language=args.language, concurrency=args.concurrency, quota=quota)
+    after = job.resume(restart=args.restart)
+    if args.students:
+        chunks = file_students(args.students, after, args.chunk_size)
+    else:
+        collection = get_students_collection()
+        if collection is None:
+            print("MONGODB_URI is not set or pymongo is not installed (or pass --students)")
+            sys.exit(1)
+        chunks = mongo_students(collection, due, after, args.chunk_size)
+    try:
+        stats = await job.run(chunks)
+    finally:
+        if http:
+            await http.close()
+
+    print(f"Reminders for fees due {due} -> {out_dir}")
+    print(f"  students {stats.students}, notes {stats.notes}, synthesized {stats.synthesized}, reused {stats.reused}")
+    print(f"  {stats.audio_seconds:.0f}s of audio in {stats.elapsed:.1f}s: {stats.notes_per_minute:.0f} notes/min")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render fee reminder voice notes for a due date")
+    parser.add_argument("--due", help=f"due date (default: the next of {', '.join(due_dates())})")
+    parser.add_argument("--students", help="JSONL export of the students collection, sorted by USN (default: MongoDB)")
+    parser.add_argument("--out", help="output directory (default: .reminders/<due date>)")
+    parser.add_argument("--language", default=DEFAULT_LANGUAGE, choices=sorted(LANGUAGES), help="for students without a language")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY, help="TTS requests in flight")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--mock-tts", action="store_true", help="silent audio instead of Cartesia (offline runs)")
+    parser.add_argument("--mock-latency", type=float, default=0.2, help="seconds per mock synthesis")
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint and start over")
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+
+    load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".env.local"))
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    asyncio.run(main(args))
@@ -0,0 +1,248 @@
+"""
+BEC BillDesk Voice Agent - Recording Replay
+
+Feeds a session recorded by recorder.py back through ARIA's pipeline
+with mocked providers and prints a per-turn timing diff.
+
+Providers are replaced by mocks that reproduce the recorded behaviour:
+- STT: emits the recorded final transcripts; with --stt local|deepgram
+  each turn's recorded audio is also recognized by that engine, and its
+  latency and any transcript mismatch are reported alongside the diff
+- LLM: streams the recorded response using the recorded TTFT and duration
+- TTS: waits the recorded TTFB, then yields silent frames
+
+Tool calls are executed for real against BillDeskFunctions (with a room
+stub that acks every UI action), and TTS goes through the phrase cache, so the diff shows the
+latency of our own code on top of the recorded provider timings.
+
+Run with: python replay.py recording.zip [--speed 1.0] [--no-tts-cache] [--stt local|deepgram]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from contextlib import aclosing
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+from typing import AsyncIterator, Optional
+
+from livekit import rtc
+
+from actions import ACK_TYPE
+from functions import FIXED_REPLIES, BillDeskFunctions
+from recorder import load_recording, recording_frames
+from tts_cache import TTSCache, split_sentences
+
+MOCK_SAMPLE_RATE = 24000
+MOCK_FRAME_MS = 20
+
+
+@dataclass
+class Turn:
+    """One student utterance and everything ARIA did in response"""
+    transcript: str
+    started: float
+    events: list[dict] = field(default_factory=list)
+    recorded_latency: Optional[float] = None
+    tts_ttfb: float = 0.0
+    # Byte range of the student's audio for this utterance (None in recordings without offsets)
+    audio: Optional[tuple[int, int]] = None
+
+
+def split_turns(events: list[dict]) -> list[Turn]:
+    turns: list[Turn] = []
+    audio_start = 0
+    for event in events:
+        if event["kind"] == "transcript":
+            turn = Turn(transcript=event["text"], started=event["t"])
+            if event.get("audio_offset") is not None:
+                turn.audio = (audio_start, event["audio_offset"])
+                audio_start = event["audio_offset"]
+            turns.append(turn)
+            continue
+        if not turns:
+            continue
+        turn = turns[-1]
+        if event["kind"] in ("llm_response", "tool_call"):
+            turn.events.append(event)
+        elif event["kind"] == "metrics" and event["type"] == "TTSMetrics" and not turn.tts_ttfb:
+            turn.tts_ttfb = event["data"].get("ttfb", 0.0)
+        elif event["kind"] == "agent_state" and event["state"] == "speaking" and turn.recorded_latency is None:
+            turn.recorded_latency = event["t"] - turn.started
+    return turns
+
+
+class _StubParticipant:
+    def __init__(self, room: "_StubRoom"):
+        self.room = room
+
+    async def publish_data(self, data, reliable=True, **kwargs):
+        # Ack every action straight away, like a UI that applied it
+        message = json.loads(data)
+        ack = {"type": ACK_TYPE, "seq": message["seq"], "key": message["key"], "ok": True}
+        packet = SimpleNamespace(data=json.dumps(ack).encode("utf-8"))
+        for handler in self.room.handlers.get("data_received", []):
+            asyncio.get_running_loop().call_soon(handler, packet)
+
+
+class _StubRoom:
+    def __init__(self):
+        self.handlers: dict[str, list] = {}
+        self.local_participant = _StubParticipant(self)
+
+    def on(self, event: str, handler):
+        self.handlers.setdefault(event, []).append(handler)
+
+
+class MockLLM:
+    """Streams recorded responses with recorded timing"""
+
+    def __init__(self, speed: float):
+        self.speed = speed
+
+    async def stream(self, event: dict) -> AsyncIterator[str]:
+        words = event["text"].split(" ")
+        ttft = (event.get("ttft") or 0.0) * self.speed
+        rest = max((event.get("duration") or 0.0) * self.speed - ttft, 0.0)
+        await asyncio.sleep(ttft)
+        for i, word in enumerate(words):
+            yield word if i == 0 else " " + word
+            await asyncio.sleep(rest / max(len(words), 1))
+
+
+class MockTTS:
+    """Waits the recorded TTFB, then yields silence"""
+
+    def __init__(self, ttfb: float, speed: float):
+        self.ttfb = ttfb
+        self.speed = speed
+
+    async def synthesize(self, text) -> AsyncIterator[rtc.AudioFrame]:
+        first = True
+        async for chunk in text:
+            if first:
+                await asyncio.sleep(self.ttfb * self.speed)
+                first = False
+            # Roughly 15 characters of speech per second
+            for frame in _silence(max(len(chunk) / 15, MOCK_FRAME_MS / 1000)):
+                yield frame
+
+
+async def recognize_turn(turn: Turn, events: list[dict], audio: bytes, engine) -> Optional[tuple[str, float]]:
+    """Run the turn's recorded audio through a real STT engine: (transcript, seconds)"""
+    frames = recording_frames(events, audio, *turn.audio) if turn.audio else []
+    if not frames:
+        return None
+    started = time.monotonic()
+    event = await engine.recognize(frames)
+    return (event.alternatives[0].text if event.alternatives else ""), time.monotonic() - started
+
+
+def _stt_engine(name: str, http):
+    from vocabulary import build_keywords
+
+    if name == "local":
+        import local_stt
+
+        return local_stt.WhisperSTT(keywords=build_keywords())
+    from livekit.plugins import deepgram
+
+    return deepgram.STT(model="nova-2", language="en", keywords=build_keywords(), http_session=http)
+
+
+async def replay_turn(turn: Turn, functions: BillDeskFunctions, tts_cache: Optional[TTSCache], speed: float) -> float:
+    """Replay one turn and return seconds until the first audio frame"""
+    llm = MockLLM(speed)
+    tts = MockTTS(turn.tts_ttfb, speed)
+    started = time.monotonic()
+    responses = [e for e in turn.events if e["kind"] == "llm_response"]
+    final = responses[-1] if responses else {"text": ""}
+
+    # Tool rounds run to completion; the final response streams straight into TTS
+    for event in turn.events:
+        if event is final:
+            break
+        if event["kind"] == "tool_call":
+            if hasattr(functions, event["name"]):
+                await functions.call(event["name"], json.loads(event.get("arguments") or "{}"))
+        else:
+            async for _ in llm.stream(event):
+                pass
+
+    text = llm.stream(final)
+    frames = tts_cache.speak(text, tts.synthesize) if tts_cache else tts.synthesize(text)
+    async with aclosing(frames) as stream:
+        async for _ in stream:
+            break
+    return time.monotonic() - started
+
+
+def _silence(seconds: float) -> list[rtc.AudioFrame]:
+    samples = MOCK_SAMPLE_RATE * MOCK_FRAME_MS // 1000
+    return [
+        rtc.AudioFrame(data=bytes(samples * 2), sample_rate=MOCK_SAMPLE_RATE, num_channels=1, samples_per_channel=samples)
+        for _ in range(int(seconds * 1000 / MOCK_FRAME_MS))
+    ]
+
+
+def _warm_cache() -> TTSCache:
+    """A phrase cache filled the way prewarm fills it in production"""
+    tts_cache = TTSCache(voice="replay", model="replay", cache_dir=tempfile.mkdtemp(prefix="replay_tts_"))
+    for reply in FIXED_REPLIES:
+        for sentence in split_sentences(reply):
+            tts_cache.put(sentence, _silence(1.0))
+    tts_cache.load_disk(FIXED_REPLIES)
+    return tts_cache
+
+
+async def replay(path: str, speed: float, use_tts_cache: bool, stt_engine: Optional[str] = None):
+    events, audio = load_recording(path)
+    turns = split_turns(events)
+    functions = BillDeskFunctions(_StubRoom())
+    tts_cache = _warm_cache() if use_tts_cache else None
+    http = None
+    engine = None
+    if stt_engine:
+        import aiohttp
+
+        http = aiohttp.ClientSession() if stt_engine == "deepgram" else None
+        engine = _stt_engine(stt_engine, http)
+
+    print(f"Recording: {path} ({len(events)} events, {len(audio):,} audio bytes, {len(turns)} turns)")
+    stt_header = f"  {stt_engine:>9}" if engine else ""
+    print(f"{'turn':>4}  {'recorded':>9}  {'replayed':>9}  {'delta':>8}{stt_header}  transcript")
+    try:
+        for i, turn in enumerate(turns, 1):
+            recognized = await recognize_turn(turn, events, audio, engine) if engine else None
+            replayed = await replay_turn(turn, functions, tts_cache, speed)
+            recorded = turn.recorded_latency
+            stt_column = ""
+            transcript = turn.transcript[:50]
+            if engine:
+                stt_column = f"  {recognized[1]:>8.3f}s" if recognized else f"  {'-':>9}"
+                if recognized and recognized[0].strip().lower() != turn.transcript.strip().lower():
+                    transcript += f"  [{stt_engine}: {recognized[0][:50]}]"
+            if recorded is None:
+                print(f"{i:>4}  {'-':>9}  {replayed:>8.3f}s  {'-':>8}{stt_column}  {transcript}")
+            else:
+                print(f"{i:>4}  {recorded:>8.3f}s  {replayed:>8.3f}s  {replayed - recorded:>+7.3f}s{stt_column}  {transcript}")
+    finally:
+        if http:
+            await http.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a recorded ARIA session")
+    parser.add_argument("recording")
+    parser.add_argument("--speed", type=float, default=1.0, help="scale recorded provider delays (0 = no delays)")
+    parser.add_argument("--no-tts-cache", action="store_true", help="bypass the phrase TTS cache")
+    parser.add_argument("--stt", choices=("local", "deepgram"), help="also recognize each turn's recorded audio with this engine")
+    args = parser.parse_args()
+    if args.stt == "deepgram":
+        from dotenv import load_dotenv
+
+        load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".env.local"))
+    asyncio.run(replay(args.recording, args.speed, not args.no_tts_cache, args.stt))
@@ -0,0 +1,210 @@
+"""
+BEC BillDesk Voice Agent - Response Budgets
+
+The system prompt asks ARIA for 2-3 sentences; this enforces it per turn.
+Each student turn is classified (fee lookup, confirmation, explanation,
+chat) and gets a budget: a max_tokens for the Cerebras call and a spoken
+length target in seconds.
+
+- the LLM text is passed on a sentence at a time; once the target is
+  reached and the model is still going, the reply ends at that sentence
+  boundary with a short offer to continue, and the stream is closed
+- if the student takes the offer ("yes", "go on", "tell me more"), the
+  next turn gets a follow-up budget and the LLM is told to continue
+  where it stopped rather than start over
+
+Completion tokens, words and TTS seconds are tracked per turn and
+summarized by intent at the end of the session.
+"""
+
+import logging
+import re
+from contextlib import aclosing
+from dataclasses import dataclass, field
+from typing import AsyncIterable, Optional
+
+from languages import DEFAULT_LANGUAGE, text as message
+from tts_cache import _SENTENCE_END
+
+logger = logging.getLogger("billdesk-agent")
+
+# Average speaking rate of the Cartesia voice (~150 words per minute)
+WORDS_PER_SECOND = 2.5
+
+CONTINUE_INSTRUCTIONS = (
+    "The student asked you to continue. Pick up your previous answer exactly where it stopped, "
+    "without repeating what you already said."
+)
+
+
+@dataclass(frozen=True)
+class Budget:
+    intent: str
+    max_tokens: int  # completion cap, with room for a tool call
+    spoken_seconds: float
+
+    @property
+    def target_words(self) -> int:
+        return int(self.spoken_seconds * WORDS_PER_SECOND)
+
+
+BUDGETS = {
+    "greeting": Budget("greeting", 90, 12.0),
+    "confirmation": Budget("confirmation", 80, 5.0),
+    "lookup": Budget("lookup", 100, 9.0),
+    "chat": Budget("chat", 120, 10.0),
+    "explanation": Budget("explanation", 220, 25.0),
+    "follow_up": Budget("follow_up", 220, 25.0),
+}
+
+# Grammar intents (intent_router.GRAMMAR) by budget
+_INTENT_BUDGETS = {
+    "get_pending_fees": "lookup",
+    "get_fee_details": "lookup",
+    "get_paid_fees": "lookup",
+    "get_total_selected": "lookup",
+    "get_payment_history": "lookup",
+    "select_fee": "confirmation",
+    "select_all_fees": "confirmation",
+    "deselect_fee": "confirmation",
+    "select_payment_method": "confirmation",
+    "connect_wallet": "confirmation",
+    "initiate_payment": "confirmation",
+}
+
+_EXPLANATION = re.compile(
+    r"\b(how (does|do|is|are|was|can)|explain|why|tell me about|tech(nology)? stack|built|architecture|"
+    r"what (is|are) (the )?(platform|billdesk|livekit|cerebras|deepgram|cartesia|next|mongo|crypto|sepolia))\b"
+)
+# Only a bare acceptance takes the offer; "okay, what is my hostel fee" is a new question
+_ACCEPT = r"(yes|yeah|yep|sure|ok|okay|please|please do|go on|go ahead|continue|keep going|tell me more|more details?)"
+_FOLLOW_UP = re.compile(rf"^({_ACCEPT}[\s,.!]*)+$")
+# Hindi and Kannada (\b doesn't work after Indic vowel signs, so the utterance must be only these words)
+_FOLLOW_UP_WORDS = {"haan", "haudu", "aage", "bataiye", "हाँ", "हां", "जी", "बताओ", "बताइए", "आगे", "ಹೌದು", "ಮುಂದುವರಿಸಿ", "ಹೇಳಿ"}
+
+
+def _text(chunk) -> Optional[str]:
+    if isinstance(chunk, str):
+        return chunk
+    delta = getattr(chunk, "delta", None)
+    if delta is None or delta.tool_calls:
+        return None
+    return delta.content or None
+
+
+@dataclass
+class TurnUsage:
+    intent: str
+    max_tokens: int
+    target_words: int
+    tokens: int = 0
+    words: int = 0
+    tts_seconds: float = 0.0
+    truncated: bool = False
+
+
+@dataclass
+class ResponseBudget:
+    """Per-session budget selection, sentence-boundary truncation and usage tracking"""
+
+    router: Optional[object] = None
+    # Language of the offer to continue
+    language: str = DEFAULT_LANGUAGE
+    current: Budget = BUDGETS["greeting"]
+    turns: dict[str, TurnUsage] = field(default_factory=dict)
+    follow_ups: int = 0
+    _offered: bool = False
+    # max_tokens actually sent for the current turn (the budget, capped by the quality tier)
+    _requested: Optional[int] = None
+
+    def classify(self, text: str) -> str:
+        text = text.lower().strip()
+        words = [word for word in re.split(r"[\s,.!?।]+", text) if word]
+        if self._offered and (_FOLLOW_UP.match(text) or (words and _FOLLOW_UP_WORDS.issuperset(words))):
+            return "follow_up"
+        if _EXPLANATION.search(text):
+            return "explanation"
+        intent = self.router.classify(text) if self.router is not None else None
+        return _INTENT_BUDGETS.get(intent, "chat")
+
+    def begin_turn(self, text: str, turn_ctx=None) -> Budget:
+        """Pick the budget for the reply to a student utterance"""
+        self.current = BUDGETS[self.classify(text)]
+        if self.current.intent == "follow_up":
+            self.follow_ups += 1
+            if turn_ctx is not None:
+                turn_ctx.add_message(role="system", content=CONTINUE_INSTRUCTIONS)
+        self._offered = False
+        self._requested = None
+        return self.current
+
+    def max_tokens(self, ceiling: int) -> int:
+        self._requested = min(self.current.max_tokens, ceiling)
+        return self._requested
+
+    def _usage(self, speech_id: Optional[str]) -> TurnUsage:
+        key = speech_id or "unknown"
+        if key not in self.turns:
+            self.turns[key] = TurnUsage(self.current.intent, self.current.max_tokens, self.current.target_words)
+        return self.turns[key]
+
+    async def limit(self, speech_id: Optional[str], stream: AsyncIterable) -> AsyncIterable:
+        """Pass LLM output through a sentence at a time, ending the reply at the spoken-length target"""
+        usage = self._usage(speech_id)
+        buffer = ""
+        cut = False
+        completion_tokens = None
+        async with aclosing(stream) as chunks:
+            async for chunk in chunks:
+                if getattr(chunk, "usage", None):
+                    completion_tokens = chunk.usage.completion_tokens
+                content = _text(chunk)
+                if content is None:
+                    # Tool calls and usage pass straight through
+                    yield chunk
+                    continue
+                buffer += content
+                *sentences, buffer = _SENTENCE_END.split(buffer)
+                for sentence in sentences:
+                    if usage.words >= usage.target_words:
+                        cut = True
+                        break
+                    usage.words += len(sentence.split())
+                    yield sentence + " "
+                # Past the target with more text coming: end the reply here (closing the stream)
+                if cut or (usage.words >= usage.target_words and buffer.strip()):
+                    cut = True
+                    break
+        if self._requested is not None:
+            usage.max_tokens = self._requested
+        if cut:
+            usage.truncated = True
+            self._offered = True
+            logger.info("✂️ Reply cut at %d words (%s budget)", usage.words, usage.intent)
+            yield message("continue_offer", self.language)
+        elif buffer.strip() and not (completion_tokens is not None and completion_tokens >= usage.max_tokens):
+            # A tail cut off by max_tokens is dropped rather than spoken half-finished
+            usage.words += len(buffer.split())
+            yield buffer
+        usage.tokens += completion_tokens if completion_tokens is not None else usage.words * 4 // 3
+
+    async def track_tts(self, speech_id: Optional[str], frames: AsyncIterable) -> AsyncIterable:
+        """Pass TTS frames through, adding up the seconds of audio per turn"""
+        usage = self._usage(speech_id)
+        async with aclosing(frames) as stream:
+            async for frame in stream:
+                usage.tts_seconds += frame.samples_per_channel / frame.sample_rate
+                yield frame
+
+    def summary(self) -> dict:
+        by_intent: dict[str, dict] = {}
+        for usage in self.turns.values():
+            bucket = by_intent.setdefault(usage.intent, {"turns": 0, "tokens": 0, "tts_seconds": 0.0, "truncated": 0})
+            bucket["turns"] += 1
+            bucket["tokens"] += usage.tokens
+            bucket["tts_seconds"] += usage.tts_seconds
+            bucket["truncated"] += usage.truncated
+        for bucket in by_intent.values():
+            bucket["avg_tokens"] = round(bucket.pop("tokens") / bucket["turns"], 1)
+            bucket["avg_tts_seconds"] = round(bucket.pop("tts_seconds") / bucket["turns"], 2)
+        return {"follow_ups": self.follow_ups, "by_intent": by_intent}
@@ -0,0 +1,114 @@
+"""
+BEC BillDesk Voice Agent - Job Startup Graph
+
+Runs the per-job startup stages (room connect, metadata parsing, plugin
+construction, session start, greeting) as a dependency graph instead of
+one after another. Each stage starts as soon as the stages it depends on
+have finished, and every stage records a timing span so we can see the
+critical path from dispatch to first audio.
+"""
+
+import asyncio
+import inspect
+import logging
+import time
+from typing import AsyncIterable, AsyncIterator, Callable, Optional
+
+logger = logging.getLogger("billdesk-agent")
+
+
+class StartupGraph:
+    """Minimal async DAG runner with per-stage timing spans"""
+
+    def __init__(self):
+        self._stages: dict[str, tuple[Callable, tuple[str, ...]]] = {}
+        self._tasks: dict[str, asyncio.Task] = {}
+        self._t0: Optional[float] = None
+        self.spans: dict[str, tuple[float, float]] = {}
+
+    def add(self, name: str, fn: Callable, deps: tuple[str, ...] = ()):
+        """Register a stage; `fn` receives the results of `deps` as positional args"""
+        for dep in deps:
+            if dep not in self._stages:
+                raise ValueError(f"Stage '{name}' depends on unknown stage '{dep}'")
+        self._stages[name] = (fn, tuple(deps))
+
+    async def _run_stage(self, name: str):
+        fn, deps = self._stages[name]
+        args = [await self._tasks[dep] for dep in deps]
+        started = time.monotonic()
+        result = fn(*args)
+        if inspect.isawaitable(result):
+            result = await result
+        self.spans[name] = (started - self._t0, time.monotonic() - started)
+        return result
+
+    async def run(self) -> dict:
+        """Run every stage and return their results by name"""
+        self._t0 = time.monotonic()
+        for name in self._stages:
+            self._tasks[name] = asyncio.create_task(self._run_stage(name), name=f"startup:{name}")
+        try:
+            results = await asyncio.gather(*self._tasks.values())
+        except BaseException:
+            for task in self._tasks.values():
+                task.cancel()
+            raise
+        finally:
+            self.log_spans()
+        return dict(zip(self._tasks, results))
+
+    def critical_path(self) -> list[str]:
+        """The chain of stages that determined the total startup time"""
+        path = []
+        name = max(self.spans, key=lambda n: sum(self.spans[n]), default=None)
+        while name is not None:
+            path.append(name)
+            deps = [d for d in self._stages[name][1] if d in self.spans]
+            name = max(deps, key=lambda d: sum(self.spans[d]), default=None)
+        return list(reversed(path))
+
+    def log_spans(self):
+        for name, (start, duration) in sorted(self.spans.items(), key=lambda kv: kv[1][0]):
+            logger.info("⏱️ startup stage %-10s +%6.0fms  %6.0fms", name, start * 1000, duration * 1000)
+        if self.spans:
+            total = max(start + duration for start, duration in self.spans.values())
+            logger.info("⏱️ startup total %.0fms, critical path: %s", total * 1000, " → ".join(self.critical_path()))
+
+
+async def prefetch(stream: AsyncIterable[str]) -> Optional[AsyncIterator[str]]:
+    """Start consuming a text stream now and replay it later
+
+    Waits for the first chunk so failures surface here (returns None)
+    rather than half-way through speech.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+    iterator = stream.__aiter__()
+    try:
+        first = await iterator.__anext__()
+    except StopAsyncIteration:
+        return None
+    except Exception as e:
+        logger.warning("Prefetch failed: %s", e)
+        return None
+
+    async def pump():
+        try:
+            async for chunk in iterator:
+                await queue.put(chunk)
+        except Exception as e:
+            logger.warning("Prefetched stream ended early: %s", e)
+        finally:
+            await queue.put(None)
+
+    task = asyncio.create_task(pump())
+
+    async def replay():
+        try:
+            yield first
+            while (chunk := await queue.get()) is not None:
+                yield chunk
+        finally:
+            task.cancel()
+
+    return replay()
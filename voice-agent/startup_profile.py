@@ -0,0 +1,91 @@
+"""
+BEC BillDesk Voice Agent - Worker Startup Profiling
+
+Worker autoscaling is bounded by cold start, so `python agent.py start
+--profile-startup` (or dev) breaks down the time from process start to
+ready-for-dispatch:
+
+- phases marked with mark(): interpreter boot, module imports, config,
+  plugin imports, worker registration with LiveKit. Job processes inherit
+  PROFILE_STARTUP and report their own import and prewarm phases.
+- an -X importtime report of the agent's imports (taken in a fresh
+  interpreter, so nothing is already cached), top modules by cumulative
+  and by self time
+
+Kept free of heavy imports so it can be imported first.
+"""
+
+import logging
+import os
+import re
+import subprocess
+import sys
+import time
+
+import psutil
+
+logger = logging.getLogger("billdesk-agent")
+
+ENV_FLAG = "PROFILE_STARTUP"
+PROCESS_START = psutil.Process().create_time()
+
+_marks: list[tuple[str, float]] = []
+_IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( +)(\S+)")
+
+
+def enabled() -> bool:
+    return os.getenv(ENV_FLAG) == "1"
+
+
+def enable_from_argv() -> bool:
+    """Consume --profile-startup from the command line (the CLI would reject it)"""
+    if "--profile-startup" not in sys.argv:
+        return enabled()
+    sys.argv.remove("--profile-startup")
+    # Inherited by the job processes the worker spawns
+    os.environ[ENV_FLAG] = "1"
+    return True
+
+
+def mark(phase: str):
+    """End a startup phase (it started at the previous mark, or at process start)"""
+    _marks.append((phase, time.time()))
+
+
+def report(title: str) -> str:
+    lines = [f"⏱️ {title} (pid {os.getpid()}), since process start:"]
+    previous = PROCESS_START
+    for phase, at in _marks:
+        lines.append(f"    {phase:<22} {(at - previous) * 1000:7.0f}ms   at {(at - PROCESS_START) * 1000:7.0f}ms")
+        previous = at
+    return "\n".join(lines)
+
+
+def import_report(statement: str = "import agent; agent.load_plugins()", top: int = 15) -> str:
+    """Run `statement` under -X importtime in a fresh interpreter and summarize it"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env={**os.environ, ENV_FLAG: "0"},
+        capture_output=True,
+        text=True,
+    )
+    entries = []
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            entries.append((name, len(indent) // 2, int(self_us) / 1000, int(cumulative_us) / 1000))
+    if not entries:
+        return f"⏱️ import report failed: {result.stderr.strip()[-500:]}"
+
+    total = sum(e[3] for e in entries if e[1] == 0)
+    # What the agent module and the statement import directly
+    direct = sorted((e for e in entries if e[1] == 1 or (e[1] == 0 and e[0] != "agent")), key=lambda e: e[3], reverse=True)
+    by_self = sorted(entries, key=lambda e: e[2], reverse=True)
+    lines = [f"⏱️ Imports for `{statement}`: {total:.0f}ms total"]
+    lines.append("    direct imports by cumulative time:")
+    lines += [f"      {cumulative:8.1f}ms  {name}" for name, _, _, cumulative in direct[:top]]
+    lines.append("    modules by self time:")
+    lines += [f"      {own:8.1f}ms  {name}" for name, _, own, _ in by_self[:top]]
+    return "\n".join(lines)
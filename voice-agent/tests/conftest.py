@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The agent modules are imported top-level (python agent.py runs from voice-agent/)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,53 @@
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+
+from actions import ActionChannel
+
+
+class FakeRoom:
+    """Room whose data channel publishes into a list and never acks"""
+
+    def __init__(self):
+        self.published = []
+        self.handlers = {}
+        self.local_participant = SimpleNamespace(publish_data=self.publish_data)
+
+    def on(self, event, handler):
+        self.handlers[event] = handler
+
+    async def publish_data(self, data, reliable=True):
+        self.published.append(json.loads(data))
+
+    def ack(self, message, ok=True):
+        ack = {"type": "VOICE_ACTION_ACK", "seq": message["seq"], "key": message["key"], "ok": ok}
+        self.handlers["data_received"](SimpleNamespace(data=json.dumps(ack).encode()))
+
+
+def test_flush_gives_up_after_its_timeout():
+    async def run():
+        room = FakeRoom()
+        channel = ActionChannel(room)
+        pending = channel.send("SELECT_FEE", {"feeId": "tuition"})
+        started = time.monotonic()
+        flushed = await channel.flush(timeout=0.05)
+        return flushed, time.monotonic() - started, pending.done.done()
+
+    flushed, waited, settled = asyncio.run(run())
+    assert flushed is False
+    assert waited < 0.5
+    # The action itself keeps retrying in the background
+    assert not settled
+
+
+def test_flush_succeeds_once_everything_is_acked():
+    async def run():
+        room = FakeRoom()
+        channel = ActionChannel(room)
+        channel.send("SELECT_FEE", {"feeId": "tuition"})
+        await asyncio.sleep(0)
+        room.ack(room.published[0])
+        return await channel.flush(timeout=0.05)
+
+    assert asyncio.run(run()) is True
@@ -0,0 +1,38 @@
+import logging
+import queue
+
+from agent_logging import SamplingFilter, SnapshotQueueHandler
+
+
+def _logger(name: str, handler: logging.Handler) -> logging.Logger:
+    logger = logging.getLogger(name)
+    logger.handlers = [handler]
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    return logger
+
+
+def test_sampled_info_events_keep_one_in_n():
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    handler = SnapshotQueueHandler(records)
+    handler.addFilter(SamplingFilter())
+    logger = _logger("test-sampling", handler)
+
+    for i in range(45):
+        logger.info("metrics %d", i, extra={"sample_every": 20})
+
+    kept = [records.get().msg for _ in range(records.qsize())]
+    assert kept == ["metrics 0", "metrics 20", "metrics 40"]
+
+
+def test_message_is_rendered_before_args_change():
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    logger = _logger("test-snapshot", SnapshotQueueHandler(records))
+    fees = ["tuition"]
+
+    logger.info("selected %s", fees)
+    fees.append("hostel")
+
+    record = records.get()
+    assert record.getMessage() == "selected ['tuition']"
+    assert record.args is None
@@ -0,0 +1,40 @@
+import json
+
+import pytest
+
+from experiments import report, welch_p
+
+
+def test_welch_uses_the_t_distribution_for_small_samples():
+    # t = 3.67 on ~4 degrees of freedom; the normal approximation gives 0.0002
+    assert welch_p([1, 2, 3], [4, 5, 6]) == pytest.approx(0.0213, abs=1e-3)
+
+
+def test_welch_approaches_the_normal_test_for_large_samples():
+    a = [0.0, 1.0] * 5000
+    b = [0.02, 1.02] * 5000
+    # z = 2.83, two-sided normal p = 0.0047
+    assert welch_p(a, b) == pytest.approx(0.0047, abs=2e-4)
+
+
+def _session(arm, room, latencies):
+    turns = [{"latency": latency, "interrupted": False} for latency in latencies]
+    return {"experiment": "exp", "arm": arm, "room": room, "cost": 0.01, "turns": turns}
+
+
+def test_report_compares_against_control_per_session(tmp_path, capsys):
+    path = tmp_path / "results.jsonl"
+    sessions = [
+        _session("turbo", "r1", [0.5] * 50),
+        _session("control", "r2", [1.0, 1.1]),
+        _session("control", "r3", [1.2]),
+        _session("turbo", "r4", [0.6]),
+    ]
+    path.write_text("".join(json.dumps(s) + "\n" for s in sessions))
+
+    report(str(path))
+
+    out = capsys.readouterr().out
+    assert "p-values vs control" in out
+    # Two sessions per arm, however many turns one of them had (pooled turns give p < 1e-9)
+    assert "turbo            latency  0.121" in out
@@ -0,0 +1,53 @@
+import pytest
+
+from intent_router import IntentRouter
+
+ROUTES = [
+    # Commands
+    ("select all fees", "select_all_fees", {}),
+    ("please pay all my fees", "select_all_fees", {}),
+    ("select the hostel fee", "select_fee", {"fee_name": "hostel"}),
+    ("can you select tuition", "select_fee", {"fee_name": "tuition"}),
+    ("pay the exam fee", "select_fee", {"fee_name": "examination"}),
+    ("select the hostal fee", "select_fee", {"fee_name": "hostel"}),
+    ("deselect hostel", "deselect_fee", {"fee_name": "hostel"}),
+    ("remove the tuition fee", "deselect_fee", {"fee_name": "tuition"}),
+    ("pay with UPI", "select_payment_method", {"method": "upi"}),
+    ("I'll pay using net banking", "select_payment_method", {"method": "netbanking"}),
+    ("connect my wallet", "connect_wallet", {}),
+    ("proceed to payment", "initiate_payment", {}),
+    # Lookups
+    ("what's my total", "get_total_selected", {}),
+    ("what is the total amount selected", "get_total_selected", {}),
+    ("what are my pending fees", "get_pending_fees", {}),
+    ("give me the breakdown of the hostel fee", "get_fee_details", {"fee_name": "hostel"}),
+    ("when did I pay the hostel fee", "get_payment_history", {"fee_name": "hostel"}),
+    # Left to the LLM: deselect verbs with "all", questions, statements, several fees, ambiguous verbs
+    ("deselect all fees", None, None),
+    ("remove all fees", None, None),
+    ("are all my fees paid", None, None),
+    ("I already paid all the fees", None, None),
+    ("I already paid the hostel fee", None, None),
+    ("did I pay for the hostel", None, None),
+    ("select tuition and hostel", None, None),
+    ("remove tuition and hostel", None, None),
+    ("check hostel", None, None),
+    ("don't select the hostel fee", None, None),
+    ("pay all fees with UPI", None, None),
+    ("how do I pay with UPI", None, None),
+    # Totals of what is owed, not of the selection
+    ("what is the total pending amount", None, None),
+    ("what is the total fee", None, None),
+    ("whats the total of all my fees", None, None),
+    ("what's the total amount due", None, None),
+]
+
+
+@pytest.mark.parametrize("utterance,name,arguments", ROUTES)
+def test_route(utterance, name, arguments):
+    match = IntentRouter().route(utterance)
+    if name is None:
+        assert match is None, f"{utterance!r} routed to {match}"
+    else:
+        assert match is not None, f"{utterance!r} fell through"
+        assert (match.name, match.arguments) == (name, arguments)
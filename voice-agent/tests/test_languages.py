@@ -0,0 +1,60 @@
+import pytest
+from livekit.agents import stt
+
+from languages import DETECT, MultilingualSTT, session_language
+
+
+@pytest.mark.parametrize("metadata,language", [
+    ({}, "en"),
+    ({"language": "kn-IN"}, "kn"),
+    ({"language": "Hindi"}, "hi"),
+    ({"language": "auto"}, None),
+    ({"language": "fr"}, "en"),
+])
+def test_session_language_defaults_to_english(monkeypatch, metadata, language):
+    monkeypatch.delenv("LANGUAGE_DETECTION", raising=False)
+    assert session_language(metadata) == language
+
+
+def test_detection_can_be_enabled_for_sessions_without_language(monkeypatch):
+    monkeypatch.setenv("LANGUAGE_DETECTION", "1")
+    assert session_language({}) is None
+    assert session_language({"language": "en"}) == "en"
+
+
+class FakeSTT(stt.STT):
+    def __init__(self, code):
+        super().__init__(capabilities=stt.STTCapabilities(streaming=True, interim_results=True))
+        self.code = code
+        self.prewarmed = False
+
+    @property
+    def provider(self) -> str:
+        return "Cartesia" if self.code == "kn" else "Deepgram"
+
+    def prewarm(self):
+        self.prewarmed = True
+
+    async def _recognize_impl(self, buffer, *, language, conn_options):
+        raise NotImplementedError
+
+
+def test_recognizers_are_created_with_the_session():
+    created = []
+
+    def factory(code):
+        def make(_keywords):
+            created.append(code)
+            return FakeSTT(code)
+        return make
+
+    multilingual = MultilingualSTT({code: factory(code) for code in (DETECT, "en", "hi", "kn")}, "en", [])
+    assert sorted(created) == sorted([DETECT, "en", "hi", "kn"])
+    assert all(multilingual.instance(code).prewarmed for code in created)
+
+    assert multilingual.provider == "Deepgram"
+    multilingual.select("kn")
+    assert multilingual.wrapped_stt.code == "kn"
+    # Kannada audio is charged to Cartesia's quota, not Deepgram's
+    assert multilingual.provider == "Cartesia"
+    assert len(created) == 4
@@ -0,0 +1,77 @@
+import asyncio
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+pytest.importorskip("faster_whisper")
+
+import local_stt
+from local_stt import BatchedWhisperDecoder, _Request
+
+
+class FakeWhisper:
+    """Records each generate() call; prompts are [hotwords..., language]"""
+
+    def __init__(self):
+        self.generate_calls = []
+        self.model = SimpleNamespace(generate=self.generate)
+
+    def feature_extractor(self, audio):
+        return np.zeros((80, 100), dtype=np.float32)
+
+    def encode(self, features):
+        return features
+
+    def get_prompt(self, tokenizer, previous_tokens, without_timestamps, hotwords):
+        return [len(word) for word in (hotwords or "").split(", ") if word] + [tokenizer.language]
+
+    def generate(self, encoder_output, prompts, **options):
+        assert len(encoder_output) == len(prompts)
+        self.generate_calls.append(prompts)
+        return [SimpleNamespace(sequences_ids=[prompt], no_speech_prob=0.1) for prompt in prompts]
+
+
+def _decoder() -> BatchedWhisperDecoder:
+    decoder = object.__new__(BatchedWhisperDecoder)
+    decoder._model = FakeWhisper()
+    decoder._tokenizer = lambda language: SimpleNamespace(language=language, decode=lambda ids: f"{language}:{ids}")
+    return decoder
+
+
+def _request(hotwords=None, language="en") -> _Request:
+    return _Request(np.zeros(16000, dtype=np.float32), language, hotwords, None)
+
+
+def test_batch_with_different_hotwords_decodes_each_prompt_together():
+    decoder = _decoder()
+    batch = [_request("tuition, hostel"), _request(), _request("tuition, hostel"), _request("mechanical")]
+    outputs = decoder._decode(batch)
+
+    # One generate() per distinct prompt, each with identical prompts, and results back in order
+    calls = decoder._model.generate_calls
+    assert len(calls) == 3
+    assert all(len(set(map(tuple, prompts))) == 1 for prompts in calls)
+    assert [text for text, _ in outputs] == ["en:[7, 6, 'en']", "en:['en']", "en:[7, 6, 'en']", "en:[10, 'en']"]
+
+
+def test_health_check_never_blocks_startup(monkeypatch):
+    probes = []
+
+    async def slow_probe():
+        probes.append(True)
+        await asyncio.sleep(10)
+
+    monkeypatch.setattr(local_stt, "_health", None)
+    monkeypatch.setattr(local_stt, "_health_probe", None)
+    monkeypatch.setattr(local_stt, "deepgram_healthy", slow_probe)
+
+    async def run():
+        first = local_stt.deepgram_health()
+        second = local_stt.deepgram_health()
+        await asyncio.sleep(0)
+        local_stt._health_probe.cancel()
+        return first, second
+
+    assert asyncio.run(run()) == (None, None)
+    assert probes == [True]
@@ -0,0 +1,45 @@
+import asyncio
+import threading
+import time
+
+import psutil
+
+import memory_accounting
+import quality_tiers
+from memory_accounting import SessionMemory, deep_size
+
+
+def test_deep_size_stops_at_the_object_limit():
+    graph = [[i] for i in range(1000)]
+    assert deep_size(graph, limit=10) < deep_size(graph)
+
+
+def test_probes_run_off_the_event_loop():
+    threads = []
+    memory = SessionMemory("room", budget=None)
+    memory.track("probe", lambda: threads.append(threading.current_thread()) or 1)
+
+    asyncio.run(memory.sample())
+
+    assert threads and threading.main_thread() not in threads
+    assert memory.last == {"probe": 1}
+
+
+def test_cpu_readers_share_one_sampler(monkeypatch):
+    calls = []
+
+    def cpu_percent(interval=None):
+        calls.append(interval)
+        time.sleep(interval or 0)
+        return 42.0
+
+    monkeypatch.setattr(psutil, "cpu_percent", cpu_percent)
+    monkeypatch.setattr(quality_tiers.cpu_sampler, "window", 0.01)
+    deadline = time.monotonic() + 2
+    while quality_tiers.current_load() != 42.0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert quality_tiers.current_load() == 42.0
+    assert memory_accounting.worker_load() == 0.42
+    # Readers never take their own non-blocking sample
+    assert None not in calls
@@ -0,0 +1,91 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from functions import _describe_payment
+from payment_history import PaymentIndex, PaymentRecord
+
+mongomock = pytest.importorskip("mongomock")
+
+USN = "1BE22CS001"
+
+
+def _payment(usn=USN, status="completed", minutes=0, **fields) -> dict:
+    return {
+        "usn": usn,
+        "feeIds": ["hostel"],
+        "amount": 45000,
+        "paymentMethod": "upi",
+        "status": status,
+        "createdAt": datetime(2025, 1, 10) + timedelta(minutes=minutes),
+        **fields,
+    }
+
+
+@pytest.fixture
+def payments():
+    return mongomock.MongoClient().db.payments
+
+
+def test_load_and_poll_picks_up_new_and_settled_payments(payments):
+    pending_id = payments.insert_one(_payment(status="pending_verification")).inserted_id
+    index = PaymentIndex(payments, use_change_stream=False)
+    index.watch(USN)
+    assert [p.status for p in index.load(USN)] == ["pending_verification"]
+
+    payments.update_one({"_id": pending_id}, {"$set": {"status": "completed"}})
+    payments.insert_one(_payment(minutes=5, feeIds=["tuition"]))
+    payments.insert_one(_payment(usn="1BE22CS999", minutes=6))
+    index._poll()
+
+    history = index.cached(USN)
+    assert [(p.fee_ids, p.status) for p in history] == [(("hostel",), "completed"), (("tuition",), "completed")]
+    # Students with no session on this worker are not indexed
+    assert index.cached("1BE22CS999") is None
+
+
+def test_last_session_evicts_the_student(payments):
+    payments.insert_one(_payment())
+    index = PaymentIndex(payments, use_change_stream=False)
+    index.watch(USN)
+    index.watch(USN)
+    index.load(USN)
+
+    index.release(USN)
+    assert index.cached(USN) is not None
+    index.release(USN)
+    assert index.cached(USN) is None
+
+    # Nothing left to poll for
+    payments.insert_one(_payment(minutes=5))
+    index._poll()
+    assert index.cached(USN) is None
+
+
+def test_failed_payment_is_not_described_as_paid(payments):
+    record = PaymentRecord.from_document({"_id": "x", **_payment(status="failed")})
+    described = _describe_payment(record)
+
+    assert not described.startswith("You paid")
+    assert "failed" in described
+    assert "₹45,000" in described
+
+
+def test_failed_load_caches_nothing(payments):
+    payments.insert_one(_payment())
+    index = PaymentIndex(payments, use_change_stream=False)
+    index.watch(USN)
+
+    class FailingCursor:
+        def __iter__(self):
+            yield _payment(minutes=1, _id="partial")
+            raise TimeoutError("mongo read timed out")
+
+    real_find = payments.find
+    payments.find = lambda *args, **kwargs: FailingCursor()
+    with pytest.raises(TimeoutError):
+        index.load(USN)
+    assert index.cached(USN) is None
+
+    payments.find = real_find
+    assert len(index.load(USN)) == 1
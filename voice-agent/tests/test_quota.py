@@ -0,0 +1,110 @@
+import asyncio
+import threading
+
+from quota import BucketStore, Priority, ProviderLimits, QuotaScheduler, SharedBucketStore
+
+LIMITS = {"cartesia": ProviderLimits(60, 50_000)}
+
+
+class RecordingStore(SharedBucketStore):
+    """Shared store that notes which threads touched the file"""
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.threads = set()
+
+    def take(self, *args):
+        self.threads.add(threading.current_thread())
+        return super().take(*args)
+
+    def charge(self, *args):
+        self.threads.add(threading.current_thread())
+        return super().charge(*args)
+
+
+def test_shared_store_io_stays_off_the_event_loop(tmp_path):
+    store = RecordingStore(LIMITS, str(tmp_path / "quota.json"))
+    scheduler = QuotaScheduler(store)
+
+    async def run():
+        await scheduler.acquire("cartesia", 100)
+        scheduler.charge("cartesia", 50)
+        await asyncio.sleep(0.1)
+        return threading.current_thread()
+
+    loop_thread = asyncio.run(run())
+    assert store.threads and loop_thread not in store.threads
+    assert scheduler.stats["cartesia"].tokens == 150
+
+
+def test_queue_is_served_by_priority():
+    scheduler = QuotaScheduler(BucketStore({"cartesia": ProviderLimits(600)}))
+    order = []
+
+    async def call(name, priority):
+        await scheduler.acquire("cartesia", priority=priority)
+        order.append(name)
+
+    async def run():
+        # Use up the bucket so the next calls queue
+        for _ in range(600):
+            await scheduler.acquire("cartesia")
+        background = asyncio.create_task(call("background", Priority.BACKGROUND))
+        await asyncio.sleep(0.01)
+        turn = asyncio.create_task(call("turn", Priority.TURN))
+        await asyncio.gather(background, turn)
+
+    asyncio.run(run())
+    assert order == ["turn", "background"]
+    assert scheduler.stats["cartesia"].depth == 0
+
+
+def test_greeting_waits_for_quota_before_sending_and_charges_usage(monkeypatch):
+    from types import SimpleNamespace
+
+    from livekit.agents import ChatContext
+
+    import agent
+
+    events = []
+
+    class FakeScheduler:
+        async def acquire(self, provider, tokens=0, priority=Priority.TURN):
+            events.append(("acquire", provider, priority))
+
+        def charge(self, provider, tokens):
+            events.append(("charge", provider, tokens))
+
+    class FakeStream:
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            return False
+
+        def __aiter__(self):
+            return self._chunks()
+
+        async def _chunks(self):
+            yield SimpleNamespace(delta=SimpleNamespace(content="Hello"), usage=None)
+            yield SimpleNamespace(delta=None, usage=SimpleNamespace(total_tokens=1000))
+
+    class FakeLLM:
+        def chat(self, chat_ctx):
+            events.append(("request",))
+            return FakeStream()
+
+    monkeypatch.setattr(agent, "get_scheduler", lambda: FakeScheduler())
+    chat_ctx = ChatContext.empty()
+    chat_ctx.add_message(role="system", content="Greet the student")
+    estimate = agent.chat_tokens(chat_ctx) + agent.DEFAULT_MAX_TOKENS
+
+    async def run():
+        return [text async for text in agent._greeting_text(FakeLLM(), chat_ctx)]
+
+    assert asyncio.run(run()) == ["Hello"]
+    assert events == [
+        ("acquire", "cerebras", Priority.GREETING),
+        ("request",),
+        ("charge", "cerebras", 1000 - estimate),
+    ]
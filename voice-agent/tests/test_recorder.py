@@ -0,0 +1,54 @@
+import asyncio
+from types import SimpleNamespace
+
+from livekit import rtc
+
+from recorder import SessionRecorder, load_recording
+from replay import recognize_turn, split_turns
+
+RATE = 16000
+
+
+def _frame(value: int, ms: int = 10) -> rtc.AudioFrame:
+    samples = RATE * ms // 1000
+    return rtc.AudioFrame(bytes([value]) * samples * 2, RATE, 1, samples)
+
+
+class FakeSTT:
+    def __init__(self):
+        self.heard = []
+
+    async def recognize(self, frames):
+        self.heard.append(frames)
+        return SimpleNamespace(alternatives=[SimpleNamespace(text="pay my fees")])
+
+
+def test_audio_is_spooled_to_disk_and_saved(tmp_path):
+    recorder = SessionRecorder(tmp_path / "room.zip")
+    for value in (1, 2, 3):
+        recorder.record_audio_frame(_frame(value))
+
+    assert recorder.spool_path.exists()
+    assert not hasattr(recorder, "audio")
+    recorder.save()
+
+    events, audio = load_recording(str(recorder.path))
+    assert len(audio) == recorder.audio_bytes == 3 * 320
+    assert audio[:1] == b"\x01" and audio[-1:] == b"\x03"
+    assert not recorder.spool_path.exists()
+
+
+def test_replay_recognizes_each_turns_audio():
+    events = [
+        {"t": 0.0, "kind": "audio", "offset": 0, "sample_rate": RATE, "num_channels": 1},
+        {"t": 0.5, "kind": "transcript", "text": "hello", "audio_offset": 640},
+        {"t": 0.9, "kind": "transcript", "text": "pay my fees", "audio_offset": 960},
+    ]
+    audio = b"\x01" * 640 + b"\x02" * 320
+    turns = split_turns(events)
+    assert [turn.audio for turn in turns] == [(0, 640), (640, 960)]
+
+    engine = FakeSTT()
+    text, _ = asyncio.run(recognize_turn(turns[1], events, audio, engine))
+    assert text == "pay my fees"
+    assert [bytes(f.data) for f in engine.heard[0]] == [b"\x02" * 320]
@@ -0,0 +1,77 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from intent_router import IntentRouter
+from languages import text
+from response_budget import BUDGETS, ResponseBudget
+
+
+async def _stream(chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+def _reply(budget: ResponseBudget, chunks) -> list[str]:
+    async def collect():
+        return [chunk async for chunk in budget.limit("speech", _stream(chunks))]
+
+    return asyncio.run(collect())
+
+
+def test_reply_past_target_ends_with_continue_offer():
+    budget = ResponseBudget()
+    budget.current = BUDGETS["confirmation"]
+    sentence = "Your tuition fee is seventy five thousand rupees and it is due at the end of January. "
+    out = _reply(budget, [sentence] * 6)
+
+    assert out[-1] == text("continue_offer")
+    assert len(out) < 7
+    assert budget.turns["speech"].truncated
+    assert budget.classify("yes") == "follow_up"
+
+
+def test_continue_offer_in_session_language():
+    budget = ResponseBudget(language="hi")
+    budget.current = BUDGETS["confirmation"]
+    out = _reply(budget, ["आपकी ट्यूशन फीस पचहत्तर हजार रुपये है और यह जनवरी के अंत तक देनी है। "] * 6)
+
+    assert out[-1] == text("continue_offer", "hi")
+
+
+def test_short_reply_passes_through():
+    budget = ResponseBudget()
+    budget.current = BUDGETS["lookup"]
+    out = _reply(budget, ["You have two ", "pending fees. ", "Anything else?"])
+
+    assert "".join(out) == "You have two pending fees. Anything else?"
+    assert not budget.turns["speech"].truncated
+
+
+def test_tail_cut_by_tier_cap_is_dropped():
+    budget = ResponseBudget()
+    budget.begin_turn("why is the development fee charged")
+    assert budget.max_tokens(120) == 120
+    usage_chunk = SimpleNamespace(delta=None, usage=SimpleNamespace(completion_tokens=120))
+    out = _reply(budget, ["It pays for campus infrastructure. ", "It also covers the", usage_chunk])
+
+    assert "".join(c for c in out if isinstance(c, str)) == "It pays for campus infrastructure. "
+    assert budget.turns["speech"].max_tokens == 120
+
+
+@pytest.mark.parametrize("utterance,intent", [
+    ("yes", "follow_up"),
+    ("yes please", "follow_up"),
+    ("okay, go on", "follow_up"),
+    ("Sure. Tell me more.", "follow_up"),
+    ("हाँ बताइए", "follow_up"),
+    ("ಹೌದು", "follow_up"),
+    ("okay what is my hostel fee", "chat"),
+    ("please show my pending fees", "lookup"),
+    ("sure, how do I pay by UPI", "explanation"),
+])
+def test_only_bare_acceptance_takes_the_offer(utterance, intent):
+    budget = ResponseBudget(router=IntentRouter())
+    budget._offered = True
+    assert budget.classify(utterance) == intent
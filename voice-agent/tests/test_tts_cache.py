@@ -0,0 +1,70 @@
+import asyncio
+
+from livekit import rtc
+
+from tts_cache import TTSCache
+
+PHRASE = "Please select a fee first. Which one would you like?"
+
+
+def _frames(count: int) -> list[rtc.AudioFrame]:
+    return [rtc.AudioFrame(bytes(960), 24000, 1, 480) for _ in range(count)]
+
+
+async def _stream(chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+def _speak(cache: TTSCache, chunks) -> tuple[int, list[str]]:
+    requests = []
+
+    async def synthesize(text):
+        requests.append("".join([chunk async for chunk in text]))
+        for frame in _frames(1):
+            yield frame
+
+    async def run():
+        return len([frame async for frame in cache.speak(_stream(chunks), synthesize)])
+
+    return asyncio.run(run()), requests
+
+
+def _cache(tmp_path) -> TTSCache:
+    cache = TTSCache(voice="voice", model="model", cache_dir=tmp_path)
+    cache.put("Please select a fee first.", _frames(2))
+    cache.put("Which one would you like?", _frames(3))
+    cache.load_disk([PHRASE])
+    return cache
+
+
+def test_known_phrase_is_served_from_cache(tmp_path):
+    frames, requests = _speak(_cache(tmp_path), [PHRASE])
+
+    assert requests == []
+    assert frames == 5
+
+
+def test_llm_reply_is_one_streaming_request(tmp_path):
+    chunks = ["Your hostel fee ", "is ₹45,000. ", "Please select a fee first. ", "Anything else?"]
+    frames, requests = _speak(_cache(tmp_path), chunks)
+
+    assert requests == ["".join(chunks)]
+    assert frames == 1
+
+
+def test_known_prefix_that_diverges_is_synthesized_whole(tmp_path):
+    chunks = ["Please select ", "the hostel fee for me."]
+    _, requests = _speak(_cache(tmp_path), chunks)
+
+    assert requests == ["".join(chunks)]
+
+
+def test_partly_cached_phrase_is_synthesized(tmp_path):
+    cache = TTSCache(voice="voice", model="model", cache_dir=tmp_path)
+    cache.put("Please select a fee first.", _frames(2))
+    cache.load_disk([PHRASE])
+    _, requests = _speak(cache, [PHRASE])
+
+    assert requests == [PHRASE]
+    assert cache.misses == 1
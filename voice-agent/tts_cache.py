@@ -0,0 +1,306 @@
+"""
+BEC BillDesk Voice Agent - Phrase-level TTS Cache
+
+Content-addressed cache of synthesized audio for sentences ARIA speaks
+verbatim (the fixed replies in functions.py). Entries are keyed on
+(voice id, model, normalized text) and kept in two tiers:
+
+- memory: LRU bounded by total PCM bytes, shared by all sessions in a process
+- disk: one file per entry under TTS_CACHE_DIR, evicted oldest-first
+  once the directory exceeds its size budget
+
+The disk tier is loaded into memory in prewarm, missing phrases are
+synthesized in the background at job start, and when a reply is exactly
+one of the known phrases Cartesia is bypassed entirely. Any other text
+(LLM replies) streams straight through to Cartesia as one request, only
+held back while it could still turn out to be a known phrase.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import pathlib
+import re
+import struct
+from collections import OrderedDict
+from typing import AsyncIterable, AsyncIterator, Callable, Iterable, Optional
+
+from livekit import rtc
+
+from quota import Priority
+
+logger = logging.getLogger("billdesk-agent")
+
+DEFAULT_CACHE_DIR = pathlib.Path(__file__).parent.absolute() / ".tts_cache"
+MEMORY_BUDGET_BYTES = 32 * 1024 * 1024
+DISK_BUDGET_BYTES = 256 * 1024 * 1024
+
+# Cached audio is replayed in 20ms frames
+FRAME_MS = 20
+
+_MAGIC = b"BDTC"
+_HEADER = struct.Struct("<4sIH")  # magic, sample rate, channels
+# Includes the Devanagari danda (Hindi full stop)
+_SENTENCE_END = re.compile(r"(?<=[.!?।])\s+")
+
+
+def normalize(text: str) -> str:
+    """Normalize text so trivially different renderings share an entry"""
+    return " ".join(text.lower().split())
+
+
+def split_sentences(text: str) -> list[str]:
+    return [s for s in _SENTENCE_END.split(text.strip()) if s]
+
+
+class CachedAudio:
+    """Raw int16 PCM for one phrase"""
+
+    def __init__(self, pcm: bytes, sample_rate: int, num_channels: int):
+        self.pcm = pcm
+        self.sample_rate = sample_rate
+        self.num_channels = num_channels
+
+    def frames(self) -> Iterable[rtc.AudioFrame]:
+        samples = self.sample_rate * FRAME_MS // 1000
+        step = samples * self.num_channels * 2
+        for start in range(0, len(self.pcm), step):
+            chunk = self.pcm[start:start + step]
+            yield rtc.AudioFrame(
+                data=chunk,
+                sample_rate=self.sample_rate,
+                num_channels=self.num_channels,
+                samples_per_channel=len(chunk) // (2 * self.num_channels),
+            )
+
+    def to_bytes(self) -> bytes:
+        return _HEADER.pack(_MAGIC, self.sample_rate, self.num_channels) + self.pcm
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> Optional["CachedAudio"]:
+        if len(data) < _HEADER.size:
+            return None
+        magic, sample_rate, num_channels = _HEADER.unpack_from(data)
+        if magic != _MAGIC:
+            return None
+        return cls(data[_HEADER.size:], sample_rate, num_channels)
+
+
+class TTSCache:
+    """Two-tier (memory + disk) phrase cache for one voice/model"""
+
+    def __init__(
+        self,
+        voice: str,
+        model: str,
+        cache_dir: Optional[pathlib.Path] = None,
+        memory_budget: int = MEMORY_BUDGET_BYTES,
+        disk_budget: int = DISK_BUDGET_BYTES,
+    ):
+        self.voice = voice
+        self.model = model
+        self.cache_dir = pathlib.Path(cache_dir or os.getenv("TTS_CACHE_DIR") or DEFAULT_CACHE_DIR)
+        self.memory_budget = memory_budget
+        self.disk_budget = disk_budget
+        self._memory: OrderedDict[str, CachedAudio] = OrderedDict()
+        self._memory_bytes = 0
+        # Normalized full phrases served from the cache
+        self._known: set[str] = set()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, text: str) -> str:
+        raw = f"{self.voice}|{self.model}|{normalize(text)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> pathlib.Path:
+        return self.cache_dir / f"{key}.pcm"
+
+    # --- memory tier ---
+
+    def _remember(self, key: str, audio: CachedAudio):
+        if key in self._memory:
+            self._memory_bytes -= len(self._memory.pop(key).pcm)
+        self._memory[key] = audio
+        self._memory_bytes += len(audio.pcm)
+        while self._memory_bytes > self.memory_budget and len(self._memory) > 1:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted.pcm)
+
+    # --- disk tier ---
+
+    def _read_disk(self, key: str) -> Optional[CachedAudio]:
+        path = self._path(key)
+        try:
+            audio = CachedAudio.from_bytes(path.read_bytes())
+            os.utime(path)  # mark as recently used for eviction
+            return audio
+        except OSError:
+            return None
+
+    def _write_disk(self, key: str, audio: CachedAudio):
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp = self._path(key).with_suffix(".tmp")
+            tmp.write_bytes(audio.to_bytes())
+            tmp.replace(self._path(key))
+            self._evict_disk()
+        except OSError as e:
+            logger.warning("Could not write TTS cache entry: %s", e)
+
+    def _evict_disk(self):
+        entries = []
+        for path in self.cache_dir.glob("*.pcm"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.disk_budget:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+    # --- public API ---
+
+    async def get(self, text: str) -> Optional[CachedAudio]:
+        key = self.key(text)
+        audio = self._memory.get(key)
+        if audio is not None:
+            self._memory.move_to_end(key)
+            return audio
+        audio = await asyncio.to_thread(self._read_disk, key)
+        if audio is not None:
+            self._remember(key, audio)
+        return audio
+
+    def is_known(self, text: str) -> bool:
+        return normalize(text) in self._known
+
+    def _could_be_known(self, prefix: str) -> bool:
+        prefix = normalize(prefix)
+        return any(phrase.startswith(prefix) for phrase in self._known)
+
+    def _learn(self, phrases: Iterable[str]):
+        self._known.update(normalize(phrase) for phrase in phrases)
+
+    async def lookup(self, text: str) -> Optional[list[CachedAudio]]:
+        """Audio for every sentence of a known phrase, or None unless all of it is cached"""
+        if not self.is_known(text):
+            return None
+        audio = []
+        for sentence in split_sentences(text):
+            cached = await self.get(sentence)
+            if cached is None:
+                self.misses += 1
+                return None
+            audio.append(cached)
+        self.hits += 1
+        return audio
+
+    def _audio(self, frames: Iterable[rtc.AudioFrame]) -> Optional[CachedAudio]:
+        frames = list(frames)
+        if not frames:
+            return None
+        return CachedAudio(
+            b"".join(bytes(f.data) for f in frames),
+            frames[0].sample_rate,
+            frames[0].num_channels,
+        )
+
+    def put(self, text: str, frames: Iterable[rtc.AudioFrame]):
+        """Store one sentence's audio (blocking; outside the event loop)"""
+        audio = self._audio(frames)
+        if audio is None:
+            return
+        key = self.key(text)
+        self._remember(key, audio)
+        self._write_disk(key, audio)
+
+    def load_disk(self, phrases: Iterable[str]) -> int:
+        """Pull the given phrases from disk into memory (used in prewarm)"""
+        self._learn(phrases)
+        loaded = 0
+        for sentence in _sentences(phrases):
+            key = self.key(sentence)
+            audio = self._read_disk(key)
+            if audio is not None:
+                self._remember(key, audio)
+                loaded += 1
+        return loaded
+
+    async def warm(self, tts, phrases: Iterable[str], quota=None) -> int:
+        """Synthesize any phrases that aren't cached yet (at background quota priority)
+
+        `tts` must speak with this cache's voice and model, since that is what
+        the entries are keyed on; a session TTS may be degraded by its quality tier.
+        """
+        phrases = list(phrases)
+        self._learn(phrases)
+        synthesized = 0
+        for sentence in _sentences(phrases):
+            key = self.key(sentence)
+            if key in self._memory or await asyncio.to_thread(self._path(key).exists):
+                continue
+            try:
+                if quota is not None:
+                    await quota.acquire("cartesia", len(sentence), Priority.BACKGROUND)
+                frames = []
+                async with tts.synthesize(sentence) as stream:
+                    async for ev in stream:
+                        frames.append(ev.frame)
+                audio = self._audio(frames)
+                if audio is None:
+                    continue
+                self._remember(key, audio)
+                await asyncio.to_thread(self._write_disk, key, audio)
+                synthesized += 1
+            except Exception as e:
+                logger.warning("TTS cache warmup failed for '%s': %s", sentence, e)
+        return synthesized
+
+    async def speak(
+        self,
+        text: AsyncIterable[str],
+        synthesize: Callable[[AsyncIterable[str]], AsyncIterable[rtc.AudioFrame]],
+    ) -> AsyncIterator[rtc.AudioFrame]:
+        """Speak a reply, from the cache when the whole text is a known phrase
+
+        Text is held back only while it is still a prefix of some known phrase;
+        as soon as it diverges (any LLM reply, usually on the first chunk) it is
+        passed on with the rest of the stream to `synthesize` (the regular
+        Cartesia tts_node), so the reply keeps a single streaming context.
+        """
+        chunks = aiter(text)
+        held: list[str] = []
+        diverged = False
+        async for chunk in chunks:
+            held.append(chunk)
+            if not self._could_be_known("".join(held)):
+                diverged = True
+                break
+
+        if not diverged:
+            cached = await self.lookup("".join(held))
+            if cached is not None:
+                for audio in cached:
+                    for frame in audio.frames():
+                        yield frame
+                return
+
+        async def replay_held():
+            for chunk in held:
+                yield chunk
+            if diverged:
+                async for chunk in chunks:
+                    yield chunk
+
+        async for frame in synthesize(replay_held()):
+            yield frame
+
+
+def _sentences(phrases: Iterable[str]) -> list[str]:
+    return [s for phrase in phrases for s in split_sentences(phrase)]
@@ -0,0 +1,170 @@
+"""
+BEC BillDesk Voice Agent - STT Vocabulary
+
+Builds the per-session keyword boost list passed to Deepgram STT so that
+domain words (fee names, payment methods, "USN", "Sepolia", "MetaMask",
+"challan", ...) are not misheard. Also provides a keyword error rate
+helper (and a plain word error rate) for scoring recorded transcripts
+offline.
+
+Run offline scoring with: python vocabulary.py replay.jsonl
+where each line is {"reference": "...", "hypothesis": "..."}
+"""
+
+import json
+import re
+import sys
+from typing import Iterable, Optional
+
+from functions import FEE_STRUCTURE, PAYMENT_METHOD_ALIASES
+
+# Boost weights (Deepgram accepts roughly -10..10, small positive values work best)
+FEE_BOOST = 2.0
+PAYMENT_BOOST = 1.5
+DOMAIN_BOOST = 1.5
+DEPARTMENT_BOOST = 1.0
+
+# Words that are always part of the conversation but not in any catalog
+DOMAIN_TERMS = [
+    "USN",
+    "BillDesk",
+    "ARIA",
+    "Sepolia",
+    "MetaMask",
+    "WalletConnect",
+    "challan",
+    "net banking",
+    "UPI",
+    "receipt",
+    "rupees",
+]
+
+# Spoken forms for aliases that are stored without spaces
+_ALIAS_SPOKEN_FORMS = {
+    "netbanking": "net banking",
+    "metamask": "MetaMask",
+    "upi": "UPI",
+    "eth": "ETH",
+}
+
+
+def _add(keywords: dict[str, tuple[str, float]], term: str, boost: float):
+    """Add a term keeping the highest boost seen for it"""
+    term = term.strip()
+    if not term:
+        return
+    key = term.lower()
+    current = keywords.get(key)
+    if current is None or boost > current[1]:
+        keywords[key] = (term, boost)
+
+
+def build_keywords(student_data: Optional[dict] = None) -> list[tuple[str, float]]:
+    """Build the (keyword, boost) list for a session
+
+    Combines the fee catalog, the payment method aliases accepted by
+    select_payment_method, fixed domain terms and the student's department.
+    """
+    keywords: dict[str, tuple[str, float]] = {}
+
+    for fee in FEE_STRUCTURE:
+        _add(keywords, fee["name"], FEE_BOOST)
+        _add(keywords, fee["id"], FEE_BOOST)
+        for item in fee["breakdown"]:
+            _add(keywords, item["category"], FEE_BOOST / 2)
+
+    for alias in PAYMENT_METHOD_ALIASES:
+        _add(keywords, _ALIAS_SPOKEN_FORMS.get(alias, alias), PAYMENT_BOOST)
+
+    for term in DOMAIN_TERMS:
+        _add(keywords, term, DOMAIN_BOOST)
+
+    department = (student_data or {}).get("department")
+    if department:
+        _add(keywords, department, DEPARTMENT_BOOST)
+
+    return sorted(keywords.values(), key=lambda kw: (-kw[1], kw[0].lower()))
+
+
+def _tokenize(text: str) -> list[str]:
+    return re.findall(r"[a-z0-9₹]+", text.lower())
+
+
+def keyword_error_rate(pairs: Iterable[tuple[str, str]], keywords: Iterable[str]) -> dict:
+    """Word error rate restricted to vocabulary keywords
+
+    For every (reference, hypothesis) transcript pair, counts how many
+    keyword occurrences in the reference are missing from the hypothesis.
+    Multi-word keywords are matched as whole phrases.
+    """
+    phrases = [_tokenize(k) for k in keywords]
+    phrases = [p for p in phrases if p]
+    expected = 0
+    missed = 0
+    per_keyword: dict[str, list[int]] = {}
+
+    for reference, hypothesis in pairs:
+        ref = " ".join(_tokenize(reference))
+        hyp = " ".join(_tokenize(hypothesis))
+        for phrase in phrases:
+            needle = " ".join(phrase)
+            pattern = rf"\b{re.escape(needle)}\b"
+            ref_count = len(re.findall(pattern, ref))
+            if not ref_count:
+                continue
+            hyp_count = len(re.findall(pattern, hyp))
+            miss = max(ref_count - hyp_count, 0)
+            expected += ref_count
+            missed += miss
+            stats = per_keyword.setdefault(needle, [0, 0])
+            stats[0] += ref_count
+            stats[1] += miss
+
+    return {
+        "expected": expected,
+        "missed": missed,
+        "keyword_wer": (missed / expected) if expected else 0.0,
+        "per_keyword": {k: v[1] / v[0] for k, v in per_keyword.items()},
+    }
+
+
+def word_error_rate(pairs: Iterable[tuple[str, str]]) -> float:
+    """Word-level edit distance over all (reference, hypothesis) pairs, per reference word"""
+    errors = 0
+    words = 0
+    for reference, hypothesis in pairs:
+        ref = _tokenize(reference)
+        hyp = _tokenize(hypothesis)
+        previous = list(range(len(hyp) + 1))
+        for i, word in enumerate(ref, 1):
+            current = [i]
+            for j, other in enumerate(hyp, 1):
+                current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (word != other)))
+            previous = current
+        errors += previous[-1]
+        words += len(ref)
+    return errors / words if words else 0.0
+
+
+def main(path: str):
+    pairs = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                pairs.append((row["reference"], row["hypothesis"]))
+
+    result = keyword_error_rate(pairs, [k for k, _ in build_keywords()])
+    print(f"Utterances: {len(pairs)}")
+    print(f"Keyword occurrences: {result['expected']}, missed: {result['missed']}")
+    print(f"Keyword WER: {result['keyword_wer']:.2%}")
+    for keyword, rate in sorted(result["per_keyword"].items(), key=lambda kv: -kv[1]):
+        if rate:
+            print(f"  {keyword}: {rate:.2%}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Usage: python vocabulary.py <replay.jsonl>")
+        sys.exit(1)
+    main(sys.argv[1])